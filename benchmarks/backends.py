@@ -0,0 +1,54 @@
+"""
+    Compare the file (JSON decisions, YAML admin settings) and SQLite persistence backends
+    at several campaign sizes.
+
+    Run from the repository root:
+        python -m benchmarks.backends [count ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from file_persistence import file_persistence
+from model.decision import DecisionState
+from sqlite_persistence import SqlitePersistence
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def published_lookup(backend):
+    if isinstance(backend, SqlitePersistence):
+        return backend.get_decisions(DecisionState.PUBLISHED)
+    return [d for d in backend.get_state()['decisions'] if d.state == DecisionState.PUBLISHED]
+
+def run(name, make_backend, campaign):
+    backend = make_backend()
+    results = {'write_state': timed(lambda: backend.write_state(campaign))}
+    # A fresh instance has nothing resident and has to read the whole store
+    backend = make_backend()
+    results['cold get_state'] = timed(backend.get_state)
+    results['published lookup'] = timed(lambda: published_lookup(backend))
+    # What the decision chooser reads for its third page of a title filter
+    results['chooser page'] = timed(lambda: backend.page_decisions(DecisionState.PREPARATION, 'Decision 1', 20, 11))
+    decision = campaign['decisions'][len(campaign['decisions']) // 2]
+    decision.title = 'Updated title'
+    results['update_decision'] = timed(lambda: backend.update_decision(decision))
+    for operation, ms in results.items():
+        print(f'{name:>8} {len(campaign["decisions"]):>8} {operation:>18} {ms:>12.2f} ms')
+
+def main(counts):
+    print(f'{"backend":>8} {"count":>8} {"operation":>18} {"time":>15}')
+    for count in counts:
+        campaign = generate_campaign(count)
+        with tempfile.TemporaryDirectory() as tmp:
+            run('file', lambda: file_persistence(
+                admin_state_file=os.path.join(tmp, 'admin.yaml'),
+                decision_state_file=os.path.join(tmp, 'decisions.json')), campaign)
+            run('sqlite', lambda: SqlitePersistence(os.path.join(tmp, 'cyoa.db')), campaign)
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or [100, 10000, 100000])
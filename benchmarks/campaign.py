@@ -0,0 +1,63 @@
+"""
+    Generate synthetic campaigns for the benchmarks.
+"""
+import datetime
+import random
+
+from model.decision import Action, Decision, DecisionState
+
+GLYPHS = ['\U0001F638', '\U0001FA9F', '\U0001F9FB', '\U0001F483', '\U0001F6CC', '\U0001F4DC']
+
+def generate_campaign(decision_count, actions_per_decision=3, seed=0, state_mix=None, branching=0):
+    """
+    Build a decision state dict shaped like the state file_persistence returns.
+    params:
+        decision_count: The number of Decisions to generate.
+        actions_per_decision: The number of Actions attached to each Decision.
+        seed: Seed for the random state mix, so runs are comparable.
+        state_mix: DecisionState -> relative weight, every state equally likely if None.
+        branching: Link the Decisions into a story tree where each Decision leads to this
+            many others through its first Actions, breadth first. 1 makes one long chain,
+            0 leaves every Action unlinked.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    branching = min(branching, actions_per_decision)
+    if state_mix:
+        states, weights = zip(*state_mix.items())
+    decisions = []
+    for i in range(decision_count):
+        decision = Decision(f'Decision {i}', f'Body of decision {i}. ' * 10, actions=[], id_=None)
+        for j in range(actions_per_decision):
+            decision.actions.append(Action(glyph=GLYPHS[j % len(GLYPHS)],
+                                           description=f'Action {j} of decision {i}',
+                                           previous_decision_id=decision.id_))
+        if state_mix:
+            decision.state = rng.choices(states, weights)[0]
+        else:
+            decision.state = rng.choice(list(DecisionState))
+        if decision.state != DecisionState.PREPARATION:
+            decision.publish_time = str(now)
+            decision.resolve_time = now + datetime.timedelta(minutes=rng.randint(-60, 60))
+            decision.guild_id = 1
+            decision.message_id = i
+        decisions.append(decision)
+    for i, decision in enumerate(decisions):
+        for j, action in enumerate(decision.actions[:branching]):
+            child = i * branching + j + 1
+            if child < decision_count:
+                action.next_decision_id = decisions[child].id_
+    return {'decisions': decisions}
+
+def campaign_depth(decision_count, branching):
+    """ The number of Decisions on the longest path of a campaign generated with branching. """
+    if branching <= 0:
+        return min(decision_count, 1)
+    if branching == 1:
+        return decision_count
+    depth, reached, level = 0, 0, 1
+    while reached < decision_count:
+        reached += level
+        level *= branching
+        depth += 1
+    return depth
@@ -0,0 +1,54 @@
+"""
+    Measure the per-command overhead of the DM channel command check, reading admin.yaml
+    on every command (before) against the Channels allow table (after).
+
+    Run from the repository root:
+        python -m benchmarks.command_gate
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import yaml
+
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.channels import Channels
+from file_persistence import file_persistence
+from partitioned_persistence import GuildPartitionedPersistence
+
+def disk_check(state_management, ctx):
+    """ The check as it was: parse admin.yaml (and print it) on every command """
+    with open(state_management.admin_state_file) as f:
+        admin_state = yaml.load(f.read(), Loader=yaml.Loader)
+        print(admin_state)
+    if admin_state and admin_state['channels']['dm']:
+        return ctx.channel.id == admin_state['channels']['dm']
+    return True
+
+def per_call_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1_000_000
+
+def main():
+    dm_channel = FakeChannel('dm')
+    guild = FakeGuild([FakeChannel('publish'), dm_channel])
+    bot = FakeBot([guild])
+    ctx = SimpleNamespace(guild=guild, channel=dm_channel)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        state_management = file_persistence(
+            admin_state_file=os.path.join(tmp, 'admin.yaml'),
+            decision_state_file=os.path.join(tmp, 'decisions.json'))
+        state_management.write_admin_state({'channels': {'dm': dm_channel.id, 'publish': None}})
+        channels = Channels(bot, GuildPartitionedPersistence(lambda guild_id: state_management))
+        before = per_call_us(lambda: disk_check(state_management, ctx), 2000)
+        after = per_call_us(lambda: channels.allows(ctx), 200000)
+    print(f'before: {before:8.2f} us per command')
+    print(f'after:  {after:8.2f} us per command')
+
+if __name__ == '__main__':
+    main()
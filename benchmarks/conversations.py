@@ -0,0 +1,102 @@
+"""
+    Run hundreds of wizard sessions at once in the shared DM channel, each user answering
+    a mix of option and free-text prompts while the others talk, and compare routing the
+    answers through bot.wait_for predicates (before) with the UserInteraction router
+    (after): time spent routing per message, and answers lost or given to the wrong prompt.
+
+    Run from the repository root:
+        python -m benchmarks.conversations [sessions ...]
+"""
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeBot, FakeChannel, FakeMessage, FakeUser
+from cogs.user_interaction import UserInteraction
+
+PROMPTS = 10
+TIMEOUT = 2
+
+class WaitForInteraction:
+    """ await_response as it was: a wait_for predicate per prompt, none for free text. """
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def await_response(self, ctx, valid_options = [], timeout = 30):
+        def check(msg):
+            return msg.channel == ctx.channel \
+                and msg.author == ctx.author \
+                and msg.content.lower() in valid_options
+        try:
+            if valid_options:
+                response = await self.bot.wait_for("message", timeout=timeout, check=check)
+            else:
+                response = await self.bot.wait_for("message", timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        return response.content
+
+async def scenario(sessions, make_interaction, route):
+    bot = FakeBot()
+    channel = FakeChannel('dm')
+    interaction = make_interaction(bot)
+    stats = SimpleNamespace(messages=0, routing=0.0, correct=0, wrong=0, lost=0)
+
+    async def send(author, content):
+        message = FakeMessage(channel, content=content, author=author)
+        start = time.perf_counter()
+        await route(bot, interaction, message)
+        stats.routing += time.perf_counter() - start
+        stats.messages += 1
+        # Let the prompt that got the message run
+        await asyncio.sleep(0)
+
+    async def session(number):
+        rng = random.Random(number)
+        user = FakeUser(f'user{number}')
+        ctx = SimpleNamespace(channel=channel, author=user, send=channel.send)
+        for prompt in range(PROMPTS):
+            if prompt % 2:
+                options, answer = ['1', '2', '3', 'c'], rng.choice('123')
+            else:
+                options, answer = [], f'{user} answer {prompt}'
+            waiting = asyncio.create_task(interaction.await_response(ctx, options, timeout=TIMEOUT))
+            await asyncio.sleep(rng.random() * 0.05)
+            if options:
+                # Chatter the prompt has to ignore
+                await send(user, 'not an option')
+            await send(user, answer)
+            response = await waiting
+            if response is None:
+                stats.lost += 1
+            elif response == answer:
+                stats.correct += 1
+            else:
+                stats.wrong += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(number) for number in range(sessions)))
+    return stats, time.perf_counter() - start
+
+async def route_wait_for(bot, interaction, message):
+    bot.dispatch('message', message)
+
+async def route_router(bot, interaction, message):
+    await interaction.on_message(message)
+
+def main(counts):
+    print(f'{"sessions":>9} {"routing":>10} {"us/message":>11} {"correct":>8} {"wrong":>6} {"lost":>6} {"total s":>8}')
+    for sessions in counts:
+        for name, make_interaction, route in [('wait_for', WaitForInteraction, route_wait_for),
+                                              ('router', UserInteraction, route_router)]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats, total = asyncio.run(scenario(sessions, make_interaction, route))
+            print(f'{sessions:>9} {name:>10} {stats.routing / stats.messages * 1_000_000:>11.1f} '
+                  f'{stats.correct:>8} {stats.wrong:>6} {stats.lost:>6} {total:>8.2f}')
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [100, 300, 1000])
@@ -0,0 +1,68 @@
+"""
+    Send a burst of wizard prompts and resolution announcements to one rate-limited fake
+    channel, directly and through the outbound dispatcher, and compare the 429s taken,
+    the messages sent and how long the announcements wait.
+
+    Run from the repository root:
+        python -m benchmarks.dispatch
+"""
+import asyncio
+import contextlib
+import io
+import time
+
+import discord
+
+from benchmarks.fakes import FakeChannel
+from utils.dispatch import ANNOUNCEMENT, PROMPT, OutboundDispatcher
+from utils.embeds import DefaultEmbed
+
+LATENCY = 0.02
+# Discord allows 5 messages per 5 seconds per channel, scaled down to keep the run short
+RATE_LIMIT = (5, 0.5)
+WIZARDS = 3
+PROMPTS = 10
+ANNOUNCEMENTS = 10
+
+async def send_directly(channel, embed, priority):
+    """ What the display helpers did before: send, and wait out any 429 like discord.py. """
+    while True:
+        try:
+            return await channel.send(embed=embed)
+        except discord.RateLimited as error:
+            await asyncio.sleep(error.retry_after)
+
+async def scenario(send):
+    channel = FakeChannel('dm', LATENCY, RATE_LIMIT)
+    start = time.perf_counter()
+
+    async def wizard(number):
+        for prompt in range(PROMPTS):
+            await send(channel, DefaultEmbed(title=f'Wizard {number}', description=f'Prompt {prompt}'), PROMPT)
+
+    async def announce(number):
+        await send(channel, DefaultEmbed(title='A fate is drawn.', description=f'Decision {number}'), ANNOUNCEMENT)
+        return time.perf_counter()
+
+    async def resolutions():
+        # Resolutions come due while the wizards are running
+        await asyncio.sleep(0.2)
+        queued = time.perf_counter()
+        delivered = await asyncio.gather(*(announce(i) for i in range(ANNOUNCEMENTS)))
+        return max(delivered) - queued
+
+    results = await asyncio.gather(resolutions(), *(wizard(i) for i in range(WIZARDS)))
+    return time.perf_counter() - start, results[0], len(channel.messages), channel.rate_limited
+
+def main():
+    print(f'{WIZARDS} wizards x {PROMPTS} prompts and {ANNOUNCEMENTS} announcements to one channel, '
+          f'{RATE_LIMIT[0]} messages per {RATE_LIMIT[1]} s allowed.')
+    print(f'{"":>10} {"total s":>8} {"announce s":>11} {"messages":>9} {"429s":>6}')
+    dispatcher = OutboundDispatcher(rate=RATE_LIMIT[0], per=RATE_LIMIT[1])
+    for name, send in [('direct', send_directly), ('dispatcher', dispatcher.send)]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            total, announce, messages, rate_limited = asyncio.run(scenario(send))
+        print(f'{name:>10} {total:>8.2f} {announce:>11.2f} {messages:>9} {rate_limited:>6}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+    In-process stand-ins for the discord.py objects the cogs talk to: guilds, channels,
+    messages, reactions, and a bot that loads cogs, invokes their commands and feeds them
+    gateway events.
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+_ids = itertools.count(1)
+
+class FakeReaction:
+    def __init__(self, emoji, count=1, me=False):
+        self.emoji = emoji
+        self.count = count
+        # Whether the bot is one of the reactors
+        self.me = me
+
+class FakeUser:
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+class FakeMessage:
+    def __init__(self, channel, embed=None, content=None, embeds=None, author=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.author = author
+        self.embed = embed
+        self.embeds = embeds or ([embed] if embed else [])
+        self.content = content
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        """ The bot reacting, after the channel's latency. """
+        await asyncio.sleep(self.channel.latency)
+        self.react(emoji, me=True)
+
+    def react(self, emoji, me=False):
+        """ Count a reaction, from the bot when me is set. """
+        for reaction in self.reactions:
+            if reaction.emoji == emoji:
+                reaction.count += 1
+                reaction.me = reaction.me or me
+                return
+        self.reactions.append(FakeReaction(emoji, me=me))
+
+class FakeChannel:
+    """
+    A text channel answering every API call after a fixed latency.
+    params:
+        name: The channel name.
+        latency: Seconds each simulated API round-trip takes.
+        rate_limit: (rate, per), answer sends beyond rate per per seconds with a 429,
+            raised as discord.RateLimited like discord.py does. None to accept everything.
+    """
+    def __init__(self, name, latency=0.0, rate_limit=None):
+        self.id = next(_ids)
+        self.name = name
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.sent = deque()
+        self.rate_limited = 0
+        self.messages = {}
+
+    async def send(self, content=None, embed=None, embeds=None):
+        await asyncio.sleep(self.latency)
+        if self.rate_limit:
+            rate, per = self.rate_limit
+            now = time.monotonic()
+            while self.sent and self.sent[0] <= now - per:
+                self.sent.popleft()
+            if len(self.sent) >= rate:
+                self.rate_limited += 1
+                raise discord.RateLimited(self.sent[0] + per - now)
+            self.sent.append(now)
+        message = FakeMessage(self, embed=embed, content=content, embeds=embeds)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id):
+        await asyncio.sleep(self.latency)
+        return self.messages[message_id]
+
+    def __str__(self):
+        return self.name
+
+class FakeGuild:
+    def __init__(self, channels, name='guild'):
+        self.id = next(_ids)
+        self.name = name
+        self.channels = channels
+
+    def get_channel(self, channel_id):
+        return next((channel for channel in self.channels if channel.id == channel_id), None)
+
+class FakeContext:
+    """ The context of a command invoked by author in channel. """
+    def __init__(self, bot, guild, channel, author):
+        self.bot = bot
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.command = None
+        self.cog = None
+
+    async def send(self, content=None, embed=None, embeds=None):
+        return await self.channel.send(content, embed=embed, embeds=embeds)
+
+class FakeBot:
+    """
+    Just enough of commands.Bot for cogs to look up guilds and each other, wait for events
+    and receive them. Events are delivered to cog listeners as tasks, like discord.py does.
+    """
+    def __init__(self, guilds=()):
+        self.guilds = list(guilds)
+        self.cogs = {}
+        self.user = FakeUser('bot')
+        # event name -> [(future, check)], as discord.py keeps them for wait_for
+        self.listeners = {}
+        # 'on_<event>' -> listener methods of the loaded cogs
+        self.extra_events = {}
+        # command name -> (cog, command)
+        self.commands = {}
+        self.tasks = set()
+
+    async def add_cog(self, cog):
+        """ Load a cog: run its cog_load, then register its listeners and commands. """
+        await discord.utils.maybe_coroutine(cog.cog_load)
+        self.cogs[cog.qualified_name] = cog
+        for name, method in cog.get_listeners():
+            self.extra_events.setdefault(name, []).append(method)
+        for command in cog.get_commands():
+            self.commands[command.name] = (cog, command)
+
+    async def close(self):
+        """ Unload every cog and cancel the listener tasks still running. """
+        for cog in self.cogs.values():
+            await discord.utils.maybe_coroutine(cog.cog_unload)
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def invoke(self, name, ctx, *args):
+        """
+        Run a command's callback with already converted arguments, skipping the checks.
+        The command, command_completion and command_error events go out as discord.py sends them.
+        """
+        cog, command = self.commands[name]
+        ctx.command = command
+        self.dispatch('command', ctx)
+        try:
+            result = await command.callback(cog, ctx, *args)
+        except Exception as error:
+            self.dispatch('command_error', ctx, commands.CommandInvokeError(error))
+            raise
+        self.dispatch('command_completion', ctx)
+        return result
+
+    async def say(self, channel, author, content):
+        """ A user sending a message: it arrives in the channel and goes out as a gateway event. """
+        await asyncio.sleep(channel.latency)
+        message = FakeMessage(channel, content=content, author=author)
+        channel.messages[message.id] = message
+        self.dispatch('message', message)
+        return message
+
+    async def react(self, message, user, emoji):
+        """ A user adding a reaction to a message, delivered as a raw_reaction_add event. """
+        await asyncio.sleep(message.channel.latency)
+        message.react(emoji)
+        self.dispatch('raw_reaction_add', SimpleNamespace(message_id=message.id, channel_id=message.channel.id,
+                                                          user_id=user.id, emoji=emoji))
+
+    async def wait_for(self, event, timeout=None, check=None):
+        future = asyncio.get_running_loop().create_future()
+        self.listeners.setdefault(event, []).append((future, check or (lambda *args: True)))
+        return await asyncio.wait_for(future, timeout)
+
+    def dispatch(self, event, *args):
+        """
+        Run the cog listeners of an event as tasks, and resolve the wait_for futures whose
+        check passes, testing every one like discord.py.
+        """
+        for method in self.extra_events.get('on_' + event, []):
+            task = asyncio.create_task(method(*args))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        listeners = self.listeners.get(event, [])
+        remaining = []
+        for future, check in listeners:
+            if future.done():
+                continue
+            if check(*args):
+                future.set_result(args[0] if len(args) == 1 else args)
+            else:
+                remaining.append((future, check))
+        listeners[:] = remaining
+
+    def get_guild(self, guild_id):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
@@ -0,0 +1,213 @@
+"""
+    Load generator: N admins run decision wizards in their DMs while M players react to the
+    published decisions, all against the real cogs on the fake Discord of benchmarks/fakes.py.
+    Reports command latency percentiles (user think time excluded), throughput, whether the
+    live tally counted every vote, and how long resolving everything published takes.
+
+    Outbound messages are paced by the real dispatcher (5 per 5 s per channel), so prompt
+    heavy commands are bound by Discord's rate limits rather than by the bot.
+
+    Run from the repository root:
+        python -m benchmarks.load [--wizards N] [--players N] [--duration S]
+                                  [--vote-rate R] [--think S] [--latency S]
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.fakes import FakeBot, FakeChannel, FakeContext, FakeGuild, FakeUser
+from cogs.actions import Actions
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from cogs.error_handler import CommandErrorHandler
+from cogs.scheduler import Scheduler
+from cogs.search import Search
+from cogs.storymap import StoryMap
+from cogs.tally import Tally
+from cogs.user_interaction import UserInteraction
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+from utils.dispatch import dispatcher
+from write_behind import WriteBehindPersistence
+
+GLYPHS = ['\U0001F5E1', '\U0001F6E1']
+
+def percentile(values, p):
+    """ Nearest-rank percentile of a sorted list. """
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+class Harness:
+    """
+    A guild with a publish channel, an admin DM channel and one DM channel per wizard,
+    served by the cogs bot.py loads, on state kept in a temporary directory.
+    """
+    def __init__(self, root, wizards, latency):
+        self.publish_channel = FakeChannel('publish', latency)
+        self.dm_channel = FakeChannel('dm', latency)
+        self.wizard_channels = [FakeChannel(f'wizard-{n}', latency) for n in range(wizards)]
+        self.guild = FakeGuild([self.dm_channel, self.publish_channel] + self.wizard_channels)
+        self.bot = FakeBot([self.guild])
+        options = GlobalOptions()
+        backend = file_persistence(os.path.join(root, 'admin.yaml'), os.path.join(root, 'decisions.json'))
+        backend.write_admin_state({'channels': {'dm': self.dm_channel.id, 'publish': self.publish_channel.id}})
+        self.state_management = GuildPartitionedPersistence(
+            lambda guild_id: WriteBehindPersistence(backend, flush_delay=options.write_flush_delay),
+            lambda: [self.guild.id])
+        self.options = options
+
+    async def start(self):
+        bot, state_management = self.bot, self.state_management
+        for cog in [UserInteraction(bot),
+                    Channels(bot, state_management),
+                    Tally(bot),
+                    StoryMap(bot, state_management),
+                    Search(bot, state_management),
+                    Decisions(bot, state_management, self.options),
+                    Actions(bot, state_management),
+                    Scheduler(bot),
+                    CommandErrorHandler(bot)]:
+            await bot.add_cog(cog)
+        bot.dispatch('ready')
+
+    async def stop(self):
+        await self.bot.close()
+        self.state_management.flush()
+
+    async def command(self, ctx, name, args, replies, think, rng):
+        """
+        Invoke a command and answer each of its prompts after a think time.
+        returns: The seconds the command took, less the time spent thinking.
+        """
+        user_interaction = self.bot.get_cog('UserInteraction')
+        key = (ctx.channel.id, ctx.author.id)
+        start = time.perf_counter()
+        thinking = 0.0
+        task = asyncio.create_task(self.bot.invoke(name, ctx, *args))
+        answered = None
+        for reply in replies:
+            # Wait for the next prompt, the one answered last may not have taken its reply yet
+            while not task.done():
+                waiter = user_interaction.waiting.get(key)
+                if waiter and waiter[0] is not answered and not waiter[0].done():
+                    answered = waiter[0]
+                    break
+                await asyncio.sleep(0.001)
+            delay = rng.expovariate(1 / think) if think else 0.0
+            await asyncio.sleep(delay)
+            thinking += delay
+            await self.bot.say(ctx.channel, ctx.author, reply)
+        await task
+        return time.perf_counter() - start - thinking
+
+async def wizard(harness, number, deadline, think, latencies):
+    """ Prepare, give two actions to and publish decisions until the deadline. """
+    rng = random.Random(number)
+    ctx = FakeContext(harness.bot, harness.guild, harness.wizard_channels[number], FakeUser(f'wizard{number}'))
+    round_ = 0
+    while time.perf_counter() < deadline:
+        title = f'w{number:04d}-{round_:04d}'
+        round_ += 1
+        steps = [('preparedecision', [title, f'What does {title} do next?'], []),
+                 ('createaction', [], ['f', title, '1', f'Fight for {title}', GLYPHS[0]]),
+                 ('createaction', [], ['f', title, '1', f'Defend {title}', GLYPHS[1]]),
+                 ('publishdecision', [], ['f', title, '1', 'y', '1', 'y'])]
+        for name, args, replies in steps:
+            latencies[name].append(await harness.command(ctx, name, args, replies, think, rng))
+
+async def player(harness, number, deadline, vote_rate, votes_sent):
+    """ React to a random published decision at vote_rate reactions a second. """
+    rng = random.Random(-number)
+    user = FakeUser(f'player{number}')
+    tally = harness.bot.get_cog('Tally')
+    while True:
+        await asyncio.sleep(rng.expovariate(vote_rate))
+        if time.perf_counter() >= deadline:
+            return
+        if not tally.messages:
+            continue
+        message_id = rng.choice(list(tally.messages))
+        decision_id = tally.messages[message_id]
+        message = harness.publish_channel.messages.get(message_id)
+        if message is None:
+            continue
+        votes_sent[decision_id] += 1
+        await harness.bot.react(message, user, rng.choice(list(tally.glyphs[decision_id])))
+
+async def run(wizards, players, duration, vote_rate, think, latency):
+    latencies = defaultdict(list)
+    votes_sent = Counter()
+    with tempfile.TemporaryDirectory() as root:
+        harness = Harness(root, wizards, latency)
+        await harness.start()
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(wizard(harness, n, deadline, think, latencies) for n in range(wizards)),
+                             *(player(harness, n, deadline, vote_rate, votes_sent) for n in range(players)))
+        elapsed = time.perf_counter() - start
+        # Let the last reaction events reach the tally
+        await asyncio.gather(*harness.bot.tasks, return_exceptions=True)
+
+        tally = harness.bot.get_cog('Tally')
+        miscounted = sum(1 for decision_id, sent in votes_sent.items()
+                         if sum(tally.votes.get(decision_id, {}).values()) != sent)
+
+        decisions = harness.bot.get_cog('Decisions')
+        due = decisions.find_decisions(harness.guild.id, decision_state=DecisionState.PUBLISHED)
+        for decision in due:
+            decision.resolve_time = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        resolve_start = time.perf_counter()
+        results = await decisions.resolve_decisions(due)
+        resolution = time.perf_counter() - resolve_start
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        await harness.stop()
+    return {
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'votes': sum(votes_sent.values()),
+        'miscounted': miscounted,
+        'resolved': len(due) - failed,
+        'failed': failed,
+        'resolution': resolution,
+    }
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--wizards', type=int, default=20, help='admins running wizards at once, each in a DM')
+    parser.add_argument('--players', type=int, default=200, help='players reacting to published decisions')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to generate load for')
+    parser.add_argument('--vote-rate', type=float, default=0.5, help='reactions per second per player')
+    parser.add_argument('--think', type=float, default=0.5, help='mean seconds a wizard takes to answer a prompt')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds each simulated API call takes')
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = asyncio.run(run(args.wizards, args.players, args.duration, args.vote_rate, args.think, args.latency))
+
+    print(f'{args.wizards} wizards, {args.players} players at {args.vote_rate}/s, {args.duration:.0f}s, '
+          f'{args.latency * 1000:.0f} ms API latency, {args.think:.1f}s mean think time')
+    print(f'{"command":>16} {"count":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    commands = 0
+    for name, values in report['latencies'].items():
+        values = sorted(value * 1000 for value in values)
+        commands += len(values)
+        print(f'{name:>16} {len(values):>6} {percentile(values, 50):>8.0f} {percentile(values, 95):>8.0f} '
+              f'{percentile(values, 99):>8.0f} {values[-1]:>8.0f}')
+    elapsed = report['elapsed']
+    print(f'commands: {commands / elapsed:.1f}/s, votes: {report["votes"] / elapsed:.1f}/s '
+          f'({report["votes"]} cast, {report["miscounted"]} decisions miscounted)')
+    print(f'resolved {report["resolved"]} decisions ({report["failed"]} failed) in {report["resolution"]:.2f}s')
+    print(f'dispatcher: {dispatcher.messages_sent} messages for {dispatcher.embeds_sent} embeds, '
+          f'{dispatcher.rate_limits} rate limits')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+"""
+    Measure the memory held by Decisions and Actions, comparing the slotted, id-referenced
+    models against the previous __dict__ based models whose Actions held the Decisions
+    they link to.
+
+    Run from the repository root:
+        python -m benchmarks.model_memory [count ...]
+"""
+import sys
+import tracemalloc
+
+from benchmarks.campaign import generate_campaign
+from model.decision import Action, Decision, new_id
+
+class LegacyDecision:
+    """ Replica of the previous Decision model. """
+    def __init__(self, title, body, actions, id_):
+        self.id_ = id_ or new_id()
+        self.title = title
+        self.body = body
+        self.actions = actions
+        self.voted_action = None
+        self.state = None
+        self.timeout = None
+        self.publish_time = None
+        self.resolve_time = None
+        self.guild_id = None
+        self.message_id = None
+        self.votes = {}
+
+class LegacyAction:
+    """ Replica of the previous Action model. """
+    def __init__(self, glyph, description, next_decision=None, previous_decision=None, id_=None):
+        self.id_ = id_ or new_id()
+        self.glyph = glyph
+        self.description = description
+        self.next_decision = next_decision
+        self.previous_decision = previous_decision
+
+def build_slotted(decisions):
+    built = []
+    for decision in decisions:
+        slotted = Decision(decision.title, decision.body, [], decision.id_)
+        slotted.state = decision.state
+        slotted.publish_time = decision.publish_time
+        slotted.resolve_time = decision.resolve_time
+        for action in decision.actions:
+            slotted.actions.append(Action(action.glyph, action.description, action.next_decision_id,
+                                          decision.id_, action.id_))
+        built.append(slotted)
+    return built
+
+def build_legacy(decisions):
+    by_id = {}
+    for decision in decisions:
+        legacy = by_id[decision.id_] = LegacyDecision(decision.title, decision.body, [], decision.id_)
+        legacy.state = decision.state
+        legacy.publish_time = decision.publish_time
+        legacy.resolve_time = decision.resolve_time
+        for action in decision.actions:
+            legacy.actions.append(LegacyAction(action.glyph, action.description, action.next_decision_id,
+                                               legacy, action.id_))
+    for legacy in by_id.values():
+        for action in legacy.actions:
+            action.next_decision = by_id.get(action.next_decision)
+    return list(by_id.values())
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+def main(counts):
+    print(f'{"model":>8} {"decisions":>10} {"MiB":>8} {"bytes/decision":>15}')
+    for count in counts:
+        # Strings are shared by both builds, so only the model objects are compared
+        campaign = generate_campaign(count)['decisions']
+        for name, build in [('slotted', lambda: build_slotted(campaign)),
+                            ('legacy', lambda: build_legacy(campaign))]:
+            _, used = measure(build)
+            print(f'{name:>8} {count:>10} {used / 2 ** 20:>8.2f} {used / count:>15.0f}')
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10000])
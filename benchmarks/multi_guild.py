@@ -0,0 +1,64 @@
+"""
+    Load test of guild-partitioned state: the cost of one guild's lookups and writes
+    should not grow with the number of guilds hosted.
+
+    Run from the repository root:
+        python -m benchmarks.multi_guild
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.decisions import Decisions
+from file_persistence import file_persistence
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+
+DECISIONS_PER_GUILD = 50
+OPERATIONS = 2000
+
+def open_partition(root):
+    def open_guild_state(guild_id):
+        directory = os.path.join(root, str(guild_id))
+        os.makedirs(directory, exist_ok=True)
+        return file_persistence(os.path.join(directory, 'admin.yaml'), os.path.join(directory, 'decisions.json'))
+    return open_guild_state
+
+def run(root, guild_count):
+    guilds = [FakeGuild([FakeChannel('dm'), FakeChannel('publish')]) for _ in range(guild_count)]
+    bot = FakeBot(guilds)
+    state_management = GuildPartitionedPersistence(open_partition(root))
+    decisions = Decisions(bot, state_management)
+    for guild in guilds:
+        campaign = generate_campaign(DECISIONS_PER_GUILD)
+        for decision in campaign['decisions']:
+            decision.guild_id = guild.id
+        state_management.for_guild(guild.id).write_state(campaign)
+
+    guild = guilds[len(guilds) // 2]
+    decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PREPARATION)[0]
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+        decisions.find_decisions(guild.id, decision_id=decision.id_)
+    lookup = (time.perf_counter() - start) / OPERATIONS * 1_000_000
+    start = time.perf_counter()
+    for _ in range(20):
+        state_management.for_guild(guild.id).update_decision(decision)
+    update = (time.perf_counter() - start) / 20 * 1000
+    return lookup, update
+
+def main():
+    print(f'{DECISIONS_PER_GUILD} decisions per guild')
+    print(f'{"guilds":>8} {"lookup us":>10} {"update ms":>10}')
+    for guild_count in [1, 10, 100]:
+        with tempfile.TemporaryDirectory() as root, contextlib.redirect_stdout(io.StringIO()):
+            lookup, update = run(root, guild_count)
+        print(f'{guild_count:>8} {lookup:>10.2f} {update:>10.3f}')
+
+if __name__ == '__main__':
+    main()
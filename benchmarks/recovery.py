@@ -0,0 +1,93 @@
+"""
+    Restart after downtime with a backlog of overdue published decisions, against a fake
+    guild whose API calls take a fixed latency. Compares resolving them on the scheduler's
+    first tick, each announced on its own, with the startup recovery pass that announces
+    them in one summary per channel. Outbound messages are paced by the real dispatcher.
+    Reports wall time, journal writes and the messages sent.
+
+    Run from the repository root:
+        python -m benchmarks.recovery [decisions ...]
+"""
+import asyncio
+import contextlib
+import datetime
+import io
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from cogs.tally import Tally
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from metrics import persistence_seconds
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+from utils.dispatch import dispatcher
+from write_behind import WriteBehindPersistence
+
+LATENCY = 0.05
+
+async def restart(tmp, count, recover):
+    """
+    Resolve count overdue decisions as a restarted bot would.
+    returns: (seconds until every announcement is delivered, journal writes, messages sent)
+    """
+    publish_channel = FakeChannel('publish', LATENCY)
+    dm_channel = FakeChannel('dm', LATENCY)
+    guild = FakeGuild([dm_channel, publish_channel])
+    bot = FakeBot([guild])
+    options = GlobalOptions()
+    name = f'{count}-{"recovery" if recover else "tick"}'
+    backend = file_persistence(admin_state_file=os.path.join(tmp, f'admin-{name}.yaml'),
+                               decision_state_file=os.path.join(tmp, f'decisions-{name}.json'))
+    backend.write_admin_state({'channels': {'dm': dm_channel.id, 'publish': publish_channel.id}})
+
+    campaign = generate_campaign(count)
+    for decision in campaign['decisions']:
+        decision.state = DecisionState.PUBLISHED
+        decision.guild_id = guild.id
+        decision.resolve_time = datetime.datetime.now() - datetime.timedelta(hours=1)
+        message = await publish_channel.send()
+        message.react(decision.actions[0].glyph, me=True)
+        message.react(decision.actions[0].glyph)
+        decision.message_id = message.id
+    backend.write_state(campaign)
+
+    partitions = GuildPartitionedPersistence(
+        lambda guild_id: WriteBehindPersistence(backend, flush_delay=options.write_flush_delay),
+        lambda: [guild.id])
+    bot.cogs['Channels'] = Channels(bot, partitions)
+    bot.cogs['Tally'] = Tally(bot)
+    decisions = bot.cogs['Decisions'] = Decisions(bot, partitions, options)
+
+    journal_writes = persistence_seconds.summary(operation='journal_append')[0]
+    messages_sent = dispatcher.messages_sent
+    start = time.perf_counter()
+    if recover:
+        await decisions.recover_overdue()
+    else:
+        await decisions.check_time()
+    partitions.flush()
+    elapsed = time.perf_counter() - start
+    assert not decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+    return (elapsed, persistence_seconds.summary(operation='journal_append')[0] - journal_writes,
+            dispatcher.messages_sent - messages_sent)
+
+def main(counts):
+    print(f'Each simulated API call takes {LATENCY * 1000:.0f} ms, ' +
+          f'concurrency is {GlobalOptions().resolution_concurrency}.')
+    print(f'{"decisions":>10} {"":>9} {"wall time s":>12} {"journal writes":>15} {"messages":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            for recover in [False, True]:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    elapsed, writes, messages = asyncio.run(restart(tmp, count, recover))
+                print(f'{count:>10} {"recovery" if recover else "tick":>9} {elapsed:>12.3f} {writes:>15} {messages:>9}')
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 50, 200])
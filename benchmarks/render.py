@@ -0,0 +1,74 @@
+"""
+    Time rendering Decision embeds with many actions, uncached and through the render
+    cache, after checking the cache serves exactly what a fresh render produces.
+
+    Run from the repository root:
+        python -m benchmarks.render [actions ...]
+"""
+import datetime
+import sys
+import time
+
+from benchmarks.campaign import generate_campaign
+from utils.display import RenderCache, render_decision
+from utils.embeds import CharacterEmbed
+
+DECISIONS = 200
+SHOWS = 5
+
+def legacy_render(decision):
+    """ The rendering DecisionDisplayEmbed did before the cache. """
+    rich_body = '**' + decision.title + '**\n' + decision.body + '\n\n'
+    rich_body+= '**Actions:**\n'
+    for action in decision.actions:
+        rich_body+=action.glyph + ' = ' + action.description + '\n'
+    if decision.resolve_time:
+        resolve_time_pretty = datetime.datetime.strftime(decision.resolve_time, "%d %b at %-I:%M %p")
+        rich_body+= f'\nVoting closes at {resolve_time_pretty} \n'
+    embed = CharacterEmbed(None)
+    embed.description = rich_body
+    return embed
+
+def fresh_render(decision):
+    embed = CharacterEmbed(None)
+    embed.description = render_decision(decision)
+    return embed
+
+def payload(embed):
+    # The colour is random per embed, everything else has to match
+    data = embed.to_dict()
+    data.pop('color', None)
+    return data
+
+def check(decisions, cache):
+    for decision in decisions:
+        fresh = legacy_render(decision)
+        assert payload(cache.get(decision)) == payload(fresh), decision.id_
+        assert payload(cache.get(decision)) == payload(fresh), decision.id_
+    # A written Decision is rendered again
+    decision = decisions[0]
+    decision.title += ' (edited)'
+    decision.version += 1
+    cache.invalidate(decision.id_)
+    assert payload(cache.get(decision)) == payload(legacy_render(decision))
+
+def timed(func, decisions):
+    start = time.perf_counter()
+    for _ in range(SHOWS):
+        for decision in decisions:
+            func(decision)
+    return (time.perf_counter() - start) * 1e6 / (SHOWS * len(decisions))
+
+def main(action_counts):
+    print(f'{"actions":>8} {"legacy us":>10} {"render us":>10} {"cached us":>10}')
+    for actions in action_counts:
+        decisions = generate_campaign(DECISIONS, actions_per_decision=actions)['decisions']
+        check(decisions, RenderCache(maxsize=DECISIONS))
+        cache = RenderCache(maxsize=DECISIONS)
+        results = [timed(legacy_render, decisions),
+                   timed(fresh_render, decisions),
+                   timed(cache.get, decisions)]
+        print(f'{actions:>8} ' + ' '.join(f'{us:>10.2f}' for us in results))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [3, 20, 100])
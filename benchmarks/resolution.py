@@ -0,0 +1,63 @@
+"""
+    Resolve batches of due decisions against a fake guild whose API calls take a fixed
+    latency, to show the batch finishes in roughly constant wall time.
+
+    Run from the repository root:
+        python -m benchmarks.resolution
+"""
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+
+LATENCY = 0.05
+
+async def resolve_batch(tmp, count):
+    publish_channel = FakeChannel('publish', LATENCY)
+    dm_channel = FakeChannel('dm', LATENCY)
+    guild = FakeGuild([dm_channel, publish_channel])
+    bot = FakeBot([guild])
+    state_management = file_persistence(
+        admin_state_file=os.path.join(tmp, f'admin-{count}.yaml'),
+        decision_state_file=os.path.join(tmp, f'decisions-{count}.yaml'))
+    state_management.write_admin_state({'channels': {'dm': dm_channel.id, 'publish': publish_channel.id}})
+    partitions = GuildPartitionedPersistence(lambda guild_id: state_management, lambda: [guild.id])
+    bot.cogs['Channels'] = Channels(bot, partitions)
+
+    campaign = generate_campaign(count)
+    for decision in campaign['decisions']:
+        decision.state = DecisionState.PUBLISHED
+        decision.guild_id = guild.id
+        decision.resolve_time = datetime.datetime.now() - datetime.timedelta(minutes=1)
+        message = await publish_channel.send()
+        await message.add_reaction(decision.actions[0].glyph)
+        decision.message_id = message.id
+    state_management.write_state(campaign)
+
+    decisions = Decisions(bot, partitions, GlobalOptions())
+    start = time.perf_counter()
+    await decisions.check_time()
+    elapsed = time.perf_counter() - start
+    assert not decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+    return elapsed
+
+def main():
+    print(f'Each simulated API call takes {LATENCY * 1000:.0f} ms, ' +
+          f'concurrency is {GlobalOptions().resolution_concurrency}.')
+    print(f'{"decisions":>10} {"wall time s":>12}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in [1, 5, 10, 20]:
+            print(f'{count:>10} {asyncio.run(resolve_batch(tmp, count)):>12.3f}')
+
+if __name__ == '__main__':
+    main()
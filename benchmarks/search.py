@@ -0,0 +1,63 @@
+"""
+    Time SearchIndex maintenance and queries on campaigns with varied text, against a
+    scan of every decision.
+
+    Run from the repository root:
+        python -m benchmarks.search [count ...]
+"""
+import random
+import sys
+import time
+
+from benchmarks.campaign import generate_campaign
+from search_index import SearchIndex, tokenize
+
+VOCABULARY = [f'word{i}' for i in range(5000)]
+REPEAT = 200
+
+def write_text(decisions, seed=0):
+    """ Give the decisions titles and bodies drawn from a vocabulary, common words first. """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for decision in decisions:
+        decision.title = ' '.join(rng.choices(VOCABULARY, weights, k=4))
+        decision.body = ' '.join(rng.choices(VOCABULARY, weights, k=60))
+
+def scan(decisions, query):
+    terms = set(tokenize(query))
+    return [decision.id_ for decision in decisions
+            if terms <= set(tokenize(decision.title) + tokenize(decision.body) +
+                            [word for action in decision.actions for word in tokenize(action.description)])]
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+def main(counts):
+    print(f'{"decisions":>10} {"operation":>24} {"ms":>10}')
+    for count in counts:
+        decisions = generate_campaign(count)['decisions']
+        write_text(decisions)
+        index, build_ms = timed(lambda: SearchIndex(decisions))
+        rng = random.Random(1)
+
+        def update():
+            decision = rng.choice(decisions)
+            decision.body += ' ' + rng.choice(VOCABULARY)
+            index.update(decision)
+
+        results = [
+            ('build', build_ms),
+            ('update', timed(update, REPEAT)[1]),
+            ('rare term', timed(lambda: index.search('word4000'), REPEAT)[1]),
+            ('common term', timed(lambda: index.search('word0'), REPEAT)[1]),
+            ('common and rare terms', timed(lambda: index.search('word0 word1 word2000'), REPEAT)[1]),
+            ('scan, rare term', timed(lambda: scan(decisions, 'word4000'))[1]),
+        ]
+        for name, ms in results:
+            print(f'{count:>10} {name:>24} {ms:>10.3f}')
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,41 @@
+"""
+    Compare load/dump time and file size of the python-object YAML decision format
+    against the versioned JSON format.
+
+    Run from the repository root:
+        python -m benchmarks.serialization [count ...]
+"""
+import json
+import sys
+import time
+
+import yaml
+
+from benchmarks.campaign import generate_campaign
+from model.serialization import decode_state, encode_state
+
+FORMATS = {
+    'yaml': (lambda state: yaml.dump(state, Dumper=yaml.Dumper),
+             lambda text: yaml.load(text, Loader=yaml.Loader)),
+    'yaml (libyaml)': (lambda state: yaml.dump(state, Dumper=getattr(yaml, 'CDumper', yaml.Dumper)),
+                       lambda text: yaml.load(text, Loader=getattr(yaml, 'CLoader', yaml.Loader))),
+    'json v1': (lambda state: json.dumps(encode_state(state), separators=(',', ':')),
+                lambda text: decode_state(json.loads(text))),
+}
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def main(counts):
+    print(f'{"format":>15} {"decisions":>10} {"dump ms":>10} {"load ms":>10} {"size KiB":>10}')
+    for count in counts:
+        campaign = generate_campaign(count)
+        for name, (dump, load) in FORMATS.items():
+            text, dump_ms = timed(dump, campaign)
+            _, load_ms = timed(load, text)
+            print(f'{name:>15} {count:>10} {dump_ms:>10.1f} {load_ms:>10.1f} {len(text.encode()) / 1024:>10.1f}')
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or [1000, 10000])
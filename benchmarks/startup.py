@@ -0,0 +1,100 @@
+"""
+    Cold start of a bot hosting several guilds, with a simulated gateway login. Before,
+    each guild's state was read on the event loop when the tally tracked its published
+    decisions on READY, and indexed by its first command; now it is preloaded and indexed
+    on worker threads while the bot logs in, and the tally waits for that.
+    Reports when the bot is ready, when every guild has answered its first command, and
+    the longest the event loop was held up (heartbeats are due every few seconds).
+
+    Run from the repository root:
+        python -m benchmarks.startup [guilds decisions_per_guild]
+"""
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeGuild
+from benchmarks.multi_guild import open_partition
+from benchmarks.search import write_text
+from cogs.decisions import Decisions
+from cogs.search import Search
+from cogs.storymap import StoryMap
+from cogs.tally import Tally
+from globaloptions import GlobalOptions
+from partitioned_persistence import GuildPartitionedPersistence
+
+# Seconds a gateway login and READY take
+LOGIN = 1.0
+
+def write_guilds(root, guild_count, decision_count):
+    state_management = GuildPartitionedPersistence(open_partition(root))
+    for guild_id in range(1, guild_count + 1):
+        campaign = generate_campaign(decision_count, seed=guild_id)
+        write_text(campaign['decisions'], seed=guild_id)
+        for decision in campaign['decisions']:
+            decision.guild_id = guild_id
+        state_management.for_guild(guild_id).write_state(campaign)
+
+async def watch_loop(stalls, interval=0.01):
+    """ Record the longest the loop took to come back to a coroutine sleeping interval. """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+async def first_commands(guild_ids, story_map, search):
+    # $storymap and $finddecision in every guild
+    for guild_id in guild_ids:
+        story_map.graph(guild_id).orphans()
+        search.index(guild_id).search('word1')
+
+async def cold_start(root, guild_ids, warm):
+    guilds = []
+    for guild_id in guild_ids:
+        guild = FakeGuild([], name=f'guild{guild_id}')
+        guild.id = guild_id
+        guilds.append(guild)
+    bot = FakeBot(guilds)
+    state_management = GuildPartitionedPersistence(open_partition(root), lambda: guild_ids)
+    story_map = StoryMap(bot, state_management)
+    search = Search(bot, state_management)
+    bot.cogs['Decisions'] = Decisions(bot, state_management, GlobalOptions())
+    tally = bot.cogs['Tally'] = Tally(bot)
+    stalls = []
+    watcher = asyncio.create_task(watch_loop(stalls))
+    start = time.perf_counter()
+
+    async def warm_state():
+        await state_management.preload(guild_ids)
+        await asyncio.gather(*(cog.warm(guild_id) for guild_id in guild_ids for cog in [story_map, search]))
+
+    bot.warm_up = asyncio.create_task(warm_state()) if warm else None
+    await asyncio.sleep(LOGIN)
+    # On READY the tally tracks the published decisions of every guild
+    await tally.on_ready()
+    tally.checkpoint.cancel()
+    ready = time.perf_counter() - start
+    await first_commands(guild_ids, story_map, search)
+    answered = time.perf_counter() - start
+    await asyncio.sleep(0.02)
+    watcher.cancel()
+    return ready, answered, max(stalls)
+
+def main(guild_count=10, decision_count=2000):
+    print(f'{guild_count} guilds x {decision_count} decisions, {LOGIN:.1f}s login')
+    print(f'{"":>8} {"ready s":>8} {"answered s":>11} {"max stall s":>12}')
+    guild_ids = list(range(1, guild_count + 1))
+    with tempfile.TemporaryDirectory() as root:
+        with contextlib.redirect_stdout(io.StringIO()):
+            write_guilds(root, guild_count, decision_count)
+        for name, warm in [('lazy', False), ('preload', True)]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                ready, answered, stall = asyncio.run(cold_start(root, guild_ids, warm))
+            print(f'{name:>8} {ready:>8.2f} {answered:>11.2f} {stall:>12.2f}')
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,92 @@
+"""
+    Time StoryGraph maintenance and queries on large branching campaigns.
+
+    Run from the repository root:
+        python -m benchmarks.story_graph [count ...]
+"""
+import random
+import sys
+import time
+
+from benchmarks.campaign import generate_campaign
+from model.decision import Action, Decision
+from story_graph import StoryGraph
+
+REPEAT = 1000
+
+def link_campaign(decisions, seed=0):
+    """
+    Link the decisions into a branching story: most actions lead to a decision of their
+    own, some merge into a nearby branch, a few loop back, the rest are dead ends.
+    """
+    rng = random.Random(seed)
+    unused = 1
+    for i, decision in enumerate(decisions):
+        for action in decision.actions:
+            roll = rng.random()
+            if roll < 0.45 and unused < len(decisions):
+                action.next_decision_id = decisions[unused].id_
+                unused += 1
+            elif roll < 0.55:
+                action.next_decision_id = decisions[rng.randint(i, min(i + 50, len(decisions) - 1))].id_
+            elif roll < 0.552:
+                action.next_decision_id = decisions[rng.randint(max(0, i - 20), i)].id_
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+def main(counts):
+    print(f'{"decisions":>10} {"operation":>22} {"ms":>10}')
+    for count in counts:
+        decisions = generate_campaign(count)['decisions']
+        link_campaign(decisions)
+        graph, build_ms = timed(lambda: StoryGraph(decisions))
+        rng = random.Random(1)
+        edited = [rng.randrange(count - 1) for _ in range(REPEAT)]
+
+        def relink():
+            # Point an action at another decision a little further down the story
+            i = edited.pop()
+            decision = decisions[i]
+            decision.actions[0].next_decision_id = decisions[rng.randint(i + 1, min(i + 50, count - 1))].id_
+            graph.update(decision)
+            graph.cycles()
+
+        def extend():
+            # Prepare a new decision, then link an existing action to it
+            decision = Decision('New decision', 'Body', actions=[Action('1', 'Action')])
+            graph.update(decision)
+            previous = decisions[rng.randrange(count)]
+            previous.actions[-1].next_decision_id = decision.id_
+            graph.update(previous)
+            graph.cycles()
+
+        def close_loop():
+            decision = decisions[-2]
+            decision.actions[0].next_decision_id = decisions[0].id_
+            graph.update(decision)
+            return graph.cycles()
+
+        middle = decisions[count // 2].id_
+        deep = decisions[-1].id_
+        results = [
+            ('build', build_ms),
+            ('cycles (first)', timed(graph.cycles)[1]),
+            ('relink + cycles', timed(relink, REPEAT)[1]),
+            ('extend + cycles', timed(extend, REPEAT)[1]),
+            ('orphans', timed(graph.orphans, REPEAT)[1]),
+            ('dead ends', timed(graph.dead_ends, REPEAT)[1]),
+            ('would_loop (forward)', timed(lambda: graph.would_loop(middle, deep), REPEAT)[1]),
+            ('would_loop (back)', timed(lambda: graph.would_loop(deep, middle), REPEAT)[1]),
+            ('close loop + cycles', timed(close_loop)[1]),
+            ('descendants (middle)', timed(lambda: graph.descendants(middle))[1]),
+            ('ancestors (last)', timed(lambda: graph.ancestors(deep))[1]),
+        ]
+        for name, ms in results:
+            print(f'{count:>10} {name:>22} {ms:>10.4f}')
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [1000, 10000, 50000])
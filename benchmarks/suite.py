@@ -0,0 +1,237 @@
+"""
+    The benchmark suite: generate a synthetic campaign and time persistence, lookups, the
+    scheduler tick, resolution and rendering against it. Runs offline, API calls go to
+    fake channels. Results are written as JSON so runs on two commits can be compared.
+
+    Run from the repository root:
+        python -m benchmarks.suite [--decisions N] [--actions N] [--branching N]
+                                   [--mix preparation=1,published=1,resolved=1]
+                                   [--repeat N] [--output results.json]
+        python -m benchmarks.suite --compare before.json after.json [--threshold 0.1]
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.campaign import campaign_depth, generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+from sqlite_persistence import SqlitePersistence
+from utils.display import RenderCache, render_decision
+
+def measure(func, repeat, operations=1):
+    """
+    Run func repeat times and return the median and best time of one operation in ms.
+    params:
+        func: The code to time, called without arguments.
+        repeat: The number of timed runs.
+        operations: The number of operations one call of func performs.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000 / operations)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'runs': repeat}
+
+def persistence_results(tmp, campaign, repeat):
+    backends = {
+        'json': lambda: file_persistence(admin_state_file=os.path.join(tmp, 'admin.yaml'),
+                                         decision_state_file=os.path.join(tmp, 'decisions.json')),
+        'sqlite': lambda: SqlitePersistence(os.path.join(tmp, 'cyoa.db')),
+    }
+    results = {}
+    decision = campaign['decisions'][len(campaign['decisions']) // 2]
+    for name, make_backend in backends.items():
+        backend = make_backend()
+        results[f'{name} save'] = measure(lambda: backend.write_state(campaign), repeat)
+        # A fresh instance has nothing resident and has to read the whole store
+        results[f'{name} load'] = measure(lambda: make_backend().get_state(), repeat)
+        backend = make_backend()
+        backend.get_state()
+        results[f'{name} update'] = measure(lambda: [backend.update_decision(decision) for _ in range(20)], repeat, 20)
+    return results
+
+def decisions_cog(tmp, campaign):
+    """ A Decisions cog over a campaign written to a JSON backend, in a guild of fake channels. """
+    publish_channel = FakeChannel('publish')
+    dm_channel = FakeChannel('dm')
+    guild = FakeGuild([dm_channel, publish_channel])
+    bot = FakeBot([guild])
+    state_management = file_persistence(admin_state_file=os.path.join(tmp, 'cog-admin.yaml'),
+                                        decision_state_file=os.path.join(tmp, 'cog-decisions.json'))
+    state_management.write_admin_state({'channels': {'dm': dm_channel.id, 'publish': publish_channel.id}})
+    for decision in campaign['decisions']:
+        decision.guild_id = guild.id
+    state_management.write_state(campaign)
+    partitions = GuildPartitionedPersistence(lambda guild_id: state_management, lambda: [guild.id])
+    bot.cogs['Channels'] = Channels(bot, partitions)
+    decisions = bot.cogs['Decisions'] = Decisions(bot, partitions, GlobalOptions())
+    return decisions, guild, publish_channel
+
+def lookup_results(decisions, guild, campaign, repeat):
+    ids = [decision.id_ for decision in campaign['decisions'][::max(1, len(campaign['decisions']) // 100)]]
+    return {
+        'lookup by id': measure(lambda: [decisions.find_decisions(guild.id, decision_id=id_) for id_ in ids],
+                                repeat, len(ids)),
+        'lookup by state': measure(lambda: decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED),
+                                   repeat),
+        'chooser page': measure(lambda: decisions.state_management.for_guild(guild.id)
+                                .page_decisions(DecisionState.PREPARATION, 'Decision 1', 20, 11), repeat),
+    }
+
+def tick_results(decisions, repeat):
+    # The common tick: published decisions are waiting but none is due yet
+    loop = asyncio.new_event_loop()
+    try:
+        return {'scheduler tick': measure(lambda: loop.run_until_complete(decisions.check_time()), repeat)}
+    finally:
+        loop.close()
+
+def resolution_results(decisions, guild, publish_channel, batch, repeat):
+    # Each run publishes and resolves a batch of the PREPARATION decisions
+    async def resolve():
+        state_management = decisions.state_management.for_guild(guild.id)
+        due = []
+        for decision in state_management.get_decisions(DecisionState.PREPARATION)[:batch]:
+            decision.state = DecisionState.PUBLISHED
+            decision.resolve_time = datetime.datetime.now() - datetime.timedelta(minutes=1)
+            message = await publish_channel.send()
+            await message.add_reaction(decision.actions[0].glyph)
+            decision.message_id = message.id
+            state_management.update_decision(decision)
+            due.append(decision)
+        start = time.perf_counter()
+        await decisions.resolve_decisions(due)
+        return (time.perf_counter() - start) * 1000
+
+    times = [asyncio.run(resolve()) for _ in range(repeat)]
+    return {f'resolve batch of {batch}': {'median_ms': statistics.median(times), 'min_ms': min(times), 'runs': repeat}}
+
+def render_results(campaign, repeat):
+    decisions = campaign['decisions'][:200]
+    cache = RenderCache(maxsize=len(decisions))
+    for decision in decisions:
+        cache.get(decision)
+    return {
+        'render': measure(lambda: [render_decision(decision) for decision in decisions], repeat, len(decisions)),
+        'render cached': measure(lambda: [cache.get(decision) for decision in decisions], repeat, len(decisions)),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_mix(text):
+    """ 'preparation=1,published=2' -> {DecisionState.PREPARATION: 1.0, DecisionState.PUBLISHED: 2.0} """
+    if not text:
+        return None
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[DecisionState[name.strip().upper()]] = float(weight)
+    return mix
+
+def run(decision_count=2000, actions_per_decision=3, branching=2, state_mix=None, repeat=5, batch=10):
+    """
+    Generate a campaign and run every benchmark against it.
+    returns: {'meta': how and where it ran, 'results': benchmark name -> timings}
+    """
+    campaign = generate_campaign(decision_count, actions_per_decision, state_mix=state_mix, branching=branching)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        results.update(persistence_results(tmp, campaign, repeat))
+        decisions, guild, publish_channel = decisions_cog(tmp, campaign)
+        results.update(lookup_results(decisions, guild, campaign, repeat))
+        # Push every published decision past the tick, resolution brings its own due decisions
+        for decision in decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED):
+            decision.resolve_time = datetime.datetime.now() + datetime.timedelta(days=1)
+        results.update(tick_results(decisions, repeat))
+        results.update(resolution_results(decisions, guild, publish_channel, batch, repeat))
+    results.update(render_results(campaign, repeat))
+    meta = {
+        'commit': git_commit(),
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'decisions': decision_count,
+        'actions_per_decision': actions_per_decision,
+        'branching': branching,
+        'depth': campaign_depth(decision_count, min(branching, actions_per_decision)),
+        'state_mix': {state.name: weight for state, weight in state_mix.items()} if state_mix else None,
+        'repeat': repeat,
+        'resolution_batch': batch,
+    }
+    return {'meta': meta, 'results': results}
+
+def compare(before, after, threshold):
+    """
+    Print the change of every benchmark between two result files, and return the names of
+    those whose median got slower by more than threshold (0.1 is 10%).
+    """
+    regressions = []
+    print(f'{"benchmark":>24} {"before ms":>12} {"after ms":>12} {"change":>8}')
+    for name, result in after['results'].items():
+        if name not in before['results']:
+            print(f'{name:>24} {"":>12} {result["median_ms"]:>12.4f} {"new":>8}')
+            continue
+        old, new = before['results'][name]['median_ms'], result['median_ms']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' slower'
+        print(f'{name:>24} {old:>12.4f} {new:>12.4f} {change:>+8.1%}{flag}')
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--decisions', type=int, default=2000, help='decisions in the campaign')
+    parser.add_argument('--actions', type=int, default=3, help='actions per decision')
+    parser.add_argument('--branching', type=int, default=2, help='decisions each decision leads to, 0 for none')
+    parser.add_argument('--mix', help='relative weight of each state, e.g. preparation=1,published=2,resolved=1')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each benchmark')
+    parser.add_argument('--batch', type=int, default=10, help='decisions resolved together')
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        return 1 if compare(before, after, args.threshold) else 0
+
+    results = run(args.decisions, args.actions, args.branching, parse_mix(args.mix), args.repeat, args.batch)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        for name, result in results['results'].items():
+            print(f'{name:>24} {result["median_ms"]:>12.4f} ms')
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
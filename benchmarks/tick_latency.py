@@ -0,0 +1,53 @@
+"""
+    Measure the cost of a scheduler tick (Decisions.check_time's lookup of due
+    PUBLISHED decisions) against the number of decisions in the campaign.
+
+    Run from the repository root:
+        python -m benchmarks.tick_latency
+"""
+import datetime
+import os
+import json
+import tempfile
+import time
+
+from benchmarks.campaign import generate_campaign
+from file_persistence import file_persistence
+from model.decision import DecisionState
+from model.serialization import decode_state
+
+def tick(state_management):
+    """ The lookup check_time does on every tick """
+    now = datetime.datetime.now()
+    published = [d for d in state_management.get_state()['decisions'] if d.state == DecisionState.PUBLISHED]
+    return [d for d in published if d.resolve_time < now]
+
+def uncached_tick(state_management):
+    """ The same lookup, re-reading and decoding the state file on every tick """
+    with open(state_management.decision_state_file) as f:
+        state = decode_state(json.load(f))
+    now = datetime.datetime.now()
+    published = [d for d in state['decisions'] if d.state == DecisionState.PUBLISHED]
+    return [d for d in published if d.resolve_time < now]
+
+def measure(func, state_management, repeat=5):
+    func(state_management)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(state_management)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    print(f'{"decisions":>10} {"uncached ms":>12} {"cached ms":>10}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in [100, 1000, 2000]:
+            state_management = file_persistence(
+                admin_state_file=os.path.join(tmp, 'admin.yaml'),
+                decision_state_file=os.path.join(tmp, 'decisions.json'))
+            state_management.write_state(generate_campaign(count))
+            uncached = measure(uncached_tick, state_management, repeat=1)
+            cached = measure(tick, state_management)
+            print(f'{count:>10} {uncached:>12.2f} {cached:>10.3f}')
+
+if __name__ == '__main__':
+    main()
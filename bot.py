@@ -3,6 +3,9 @@ import asyncio
 import logging
 import os
 import random
+import shutil
+import signal
+import time
 
 import discord
 from discord.ext import commands
@@ -10,48 +13,147 @@ from dotenv import load_dotenv
 
 from cogs.actions import Actions
 from cogs.admin import AdminTools
+from cogs.channels import Channels
 from cogs.decisions import Decisions
 from cogs.error_handler import CommandErrorHandler
 from cogs.scheduler import Scheduler
+from cogs.search import Search
+from cogs.storymap import StoryMap
+from cogs.tally import Tally
 from cogs.user_interaction import UserInteraction
 from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from metrics import registry
+from partitioned_persistence import GuildPartitionedPersistence
+from sqlite_persistence import SqlitePersistence
+from utils.startup import wait_for_warm_up
+from write_behind import WriteBehindPersistence
 
+STARTED = time.perf_counter()
 handler = logging.FileHandler(filename='discord.log', encoding='utf-8', mode='w')
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 GUILD = os.getenv('DISCORD_GUILD')
-state_management = file_persistence()
+# 'file' (default) keeps decisions in JSON and admin settings in YAML, or 'sqlite'.
+# 'yaml' is what 'file' used to be called and is still accepted.
+PERSISTENCE_BACKEND = os.getenv('PERSISTENCE_BACKEND', 'file')
+if PERSISTENCE_BACKEND == 'yaml':
+    PERSISTENCE_BACKEND = 'file'
+# Each guild's state lives in STATE_DIRECTORY/<guild id>/
+STATE_DIRECTORY = os.getenv('STATE_DIRECTORY', './state')
+# Run as an auto-sharded bot when set
+SHARDED = os.getenv('SHARDED')
+# Serve metrics for Prometheus at http://127.0.0.1:METRICS_PORT/metrics, set empty to disable
+METRICS_PORT = os.getenv('METRICS_PORT', '9108')
+options = GlobalOptions()
+
+def open_guild_state(guild_id):
+    directory = os.path.join(STATE_DIRECTORY, str(guild_id))
+    state_files = ['admin.yaml', 'decisions.json', 'decisions.json.journal', 'decisions.yaml', 'decisions.yaml.journal', 'cyoa.db']
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+        # State from before partitioning by guild belongs to the DISCORD_GUILD guild
+        guild = bot.get_guild(guild_id)
+        if guild and guild.name == GUILD:
+            for state_file in state_files:
+                if os.path.exists(state_file):
+                    print(f'Copying {state_file} into {directory}.')
+                    shutil.copy(state_file, directory)
+    if PERSISTENCE_BACKEND == 'sqlite':
+        backend = SqlitePersistence(os.path.join(directory, 'cyoa.db'))
+    else:
+        backend = file_persistence(os.path.join(directory, 'admin.yaml'),
+                                   os.path.join(directory, 'decisions.json'),
+                                   legacy_decision_state_file=os.path.join(directory, 'decisions.yaml'))
+    return WriteBehindPersistence(backend, flush_delay=options.write_flush_delay)
+
+def existing_guild_states():
+    """ The ids of the guilds with a state directory. """
+    if not os.path.isdir(STATE_DIRECTORY):
+        return []
+    return [int(name) for name in os.listdir(STATE_DIRECTORY) if name.isdigit()]
+
+state_management = GuildPartitionedPersistence(open_guild_state, existing_guild_states)
 
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix='$', intents=intents)
+if SHARDED:
+    bot = commands.AutoShardedBot(command_prefix='$', intents=intents)
+else:
+    bot = commands.Bot(command_prefix='$', intents=intents)
+# Loads and indexes the persisted state of every guild while the bot connects
+bot.warm_up = None
 
 @bot.event
 async def on_ready():
     guild = discord.utils.get(bot.guilds, name=GUILD)
     print(f'{bot.user} has connected to {guild}!')
+    # on_ready fires again after reconnects, only report the first time
+    if bot.warm_up:
+        await wait_for_warm_up(bot)
+        bot.warm_up = None
+        print(f'Ready in {time.perf_counter() - STARTED:.2f}s.')
 
 @bot.check
 async def dm_channel_commands(ctx):
-    # get admin state
-    admin_state = state_management.get_admin_state()
-    # if ctx channel name is not admin channel, disallow command
-    if admin_state:
-        if admin_state['channels']['dm']:
-            if ctx.channel.name != admin_state['channels']['dm']:
-                await ctx.send('This command is not allowed in this channel.')
-                return False
+    # if ctx channel is not admin channel, disallow command
+    if not bot.get_cog('Channels').allows(ctx):
+        await ctx.send('This command is not allowed in this channel.')
+        return False
     return True
 
-async def main():
+async def warm_state():
+    """
+    Open the state of every guild with a state directory and build its story map and
+    search index, so the first commands after a restart do not pay for it.
+    """
+    start = time.perf_counter()
+    guild_ids = existing_guild_states()
+    await state_management.preload(guild_ids)
+    await asyncio.gather(*(bot.get_cog(name).warm(guild_id)
+                           for guild_id in guild_ids
+                           for name in ['StoryMap', 'Search']))
+    print(f'Loaded the state of {len(guild_ids)} guild(s) in {time.perf_counter() - start:.2f}s.')
+
+async def setup_hook():
+    # Each cog is added after the cogs it looks up when loaded
     await bot.add_cog(UserInteraction(bot))
-    await bot.add_cog(Decisions(bot, state_management))
+    await bot.add_cog(Channels(bot, state_management))
+    await bot.add_cog(Tally(bot))
+    await bot.add_cog(StoryMap(bot, state_management))
+    await bot.add_cog(Search(bot, state_management))
+    await bot.add_cog(Decisions(bot, state_management, options))
     await bot.add_cog(Actions(bot, state_management))
-    await bot.add_cog(AdminTools(bot, state_management))
-    await bot.add_cog(CommandErrorHandler(bot))
+    await bot.add_cog(AdminTools(bot, state_management, options))
     await bot.add_cog(Scheduler(bot))
+    await bot.add_cog(CommandErrorHandler(bot))
+    if METRICS_PORT:
+        # Metrics are optional, a port held by another process must not stop the bot
+        try:
+            bot.metrics_server = await registry.serve('127.0.0.1', int(METRICS_PORT))
+            print(f'Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics.')
+        except OSError as error:
+            print(f'Not serving metrics on port {METRICS_PORT}: {error!r}')
+    # setup_hook runs before the gateway connects, warm the state while it does
+    bot.warm_up = asyncio.create_task(warm_state())
+    # Deploys stop the bot with SIGTERM, close it the way Ctrl+C does
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:
+        # No signal handlers on Windows event loops
+        pass
+
+close_connection = bot.close
+
+async def close():
+    """ Close the bot, then write out anything still held by the write-behind window. """
+    try:
+        await close_connection()
+    finally:
+        state_management.flush()
 
-asyncio.run(main())
-bot.run(TOKEN, log_handler=handler, log_level=logging.DEBUG)
\ No newline at end of file
+bot.setup_hook = setup_hook
+bot.close = close
+bot.run(TOKEN, log_handler=handler, log_level=logging.DEBUG)
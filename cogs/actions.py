@@ -5,14 +5,19 @@ from discord import Emoji, PartialEmoji
 from discord.ext import commands
 from discord.ext.commands import Context
 
-from file_persistence import file_persistence
+from partitioned_persistence import GuildPartitionedPersistence
 from model.decision import Decision, DecisionState, Action
 from utils.display import DecisionDisplayEmbed, GenericDisplayEmbed
 
 class Actions(commands.Cog):
-    def __init__(self, bot, persistence: file_persistence):
+    def __init__(self, bot, persistence: GuildPartitionedPersistence):
         self.bot = bot
         self.persistence = persistence
+        self.decisions = None
+        self.user_interaction = None
+
+    async def cog_load(self):
+        # Cogs are added in dependency order, Decisions and UserInteraction are loaded by now
         self.decisions = self.bot.get_cog('Decisions')
         self.user_interaction = self.bot.get_cog('UserInteraction')
 
@@ -38,8 +43,8 @@ class Actions(commands.Cog):
         await GenericDisplayEmbed('Create Action', message_str, ctx.channel).send_message()
         action_glyph = await self.user_interaction.await_response(ctx)
 
-        selected_decision.actions.append(Action(glyph=action_glyph, description=action_description, previous_decision=selected_decision))
-        await self.decisions.update_decision(selected_decision)
+        selected_decision.actions.append(Action(glyph=action_glyph, description=action_description, previous_decision_id=selected_decision.id_))
+        await self.decisions.update_decision(selected_decision, ctx.guild.id)
 
     @commands.command(name='modifyactions')
     async def modify_actions(self,
@@ -118,7 +123,43 @@ class Actions(commands.Cog):
         if action_index != -1:
             selected_decision.actions[action_index].description = action_description
             selected_decision.actions[action_index].glyph = action_glyph
-            selected_decision.actions[action_index].previous_decision = selected_decision
-            await self.decisions.update_decision(selected_decision)
+            selected_decision.actions[action_index].previous_decision_id = selected_decision.id_
+            await self.decisions.update_decision(selected_decision, ctx.guild.id)
         else:
             print('could not find that action to update.')
+
+    @commands.command(name='linkaction')
+    async def link_action(self,
+                          ctx: Context,
+                          decision: Decision = None):
+        """
+        Set the Decision an action leads to.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+            decision: The decision whose action to link. If not provided, the user will be prompted to select one.
+        """
+        selected_decision = decision
+        if not decision:
+            selected_decision = await self.decisions.choose_decision(ctx, DecisionState.PREPARATION)
+        if not selected_decision:
+            return
+
+        message_str = 'Which action do you want to link? (c to cancel)\n'
+        for index, action in enumerate(selected_decision.actions):
+            message_str += f'[**{index + 1}**] {action.glyph} = {action.description} \n'
+        await GenericDisplayEmbed('Link Action', message_str, ctx.channel).send_message()
+        response = await self.user_interaction.await_response(ctx, [str(v) for v in range(1, len(selected_decision.actions) + 1)] + ['c'])
+        if not response:
+            return
+        selected_action = selected_decision.actions[int(response) - 1]
+
+        await GenericDisplayEmbed('Link Action', f'Which decision does {selected_action.glyph} lead to?', ctx.channel).send_message()
+        next_decision = await self.decisions.choose_decision(ctx, DecisionState.PREPARATION)
+        if not next_decision:
+            return
+
+        graph = self.bot.get_cog('StoryMap').graph(ctx.guild.id)
+        if graph.would_loop(selected_decision.id_, next_decision.id_):
+            await ctx.send(f'Note: {next_decision.title} leads back to {selected_decision.title}, this closes a loop.')
+        selected_action.next_decision_id = next_decision.id_
+        await self.decisions.update_decision(selected_decision, ctx.guild.id)
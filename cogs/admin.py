@@ -1,42 +1,64 @@
+import asyncio
+
 import discord
 from discord.ext import commands
 from discord.ext.commands import Cog, Context
 
-from utils.display import GenericDisplayEmbed
+import metrics
+from globaloptions import GlobalOptions
+from profiler import ProfileSession
+from utils.display import GenericDisplayEmbed, truncate_description
+
+# Functions and allocation sites listed when a profile is posted
+PROFILE_TOP = 10
 
 class AdminTools(Cog):
 
-    def __init__(self, bot, state_management):
+    def __init__(self, bot, state_management, options: GlobalOptions = None):
         self.bot = bot
         self.state_management = state_management
+        self.options = options or GlobalOptions()
+        self.user_interaction = None
+        # The running ProfileSession, if any, and the channel its results go to
+        self.profile_session = None
+        self.profile_channel = None
+        # Ends a timed profile
+        self.profile_timer = None
+        # Commands left before a per-command profile stops, None when it is timed
+        self.profile_commands_left = None
+
+    async def cog_load(self):
+        # Cogs are added in dependency order, UserInteraction is loaded by now
         self.user_interaction = self.bot.get_cog('UserInteraction')
 
     @commands.command(name='SetDMChannel')
     async def set_dm_channel(self,
                              ctx: Context,
                              channel: discord.TextChannel):
-        admin_state = self.state_management.get_admin_state()
+        admin_state = self.state_management.for_guild(ctx.guild.id).get_admin_state()
         previous_channel = admin_state["channels"]["dm"]
         print(f'Set DM channel from {previous_channel} to {channel}.')
-        admin_state['channels']['dm'] = channel.name
-        self.state_management.write_admin_state(admin_state)
+        admin_state['channels']['dm'] = channel.id
+        self.state_management.for_guild(ctx.guild.id).write_admin_state(admin_state)
+        self.bot.get_cog('Channels').invalidate(ctx.guild.id)
         await ctx.send(f'DM Channel updated to {channel}')
 
     @commands.command(name='SetPublishChannel')
     async def set_publish_channel(self,
                                   ctx: Context,
                                   channel: discord.TextChannel):
-        admin_state = self.state_management.get_admin_state()
+        admin_state = self.state_management.for_guild(ctx.guild.id).get_admin_state()
         previous_channel = admin_state["channels"]["publish"]
         print(f'Set DM channel from {previous_channel} to {channel}.')
-        admin_state['channels']['publish'] = channel.name
-        self.state_management.write_admin_state(admin_state)
+        admin_state['channels']['publish'] = channel.id
+        self.state_management.for_guild(ctx.guild.id).write_admin_state(admin_state)
+        self.bot.get_cog('Channels').invalidate(ctx.guild.id)
         await ctx.send(f'Publish Channel updated to {channel}')
     
     @commands.command(name='setcampaigndescription')
     async def set_campaign_description(self,
                                    ctx: Context):
-        admin_state = self.state_management.get_admin_state()
+        admin_state = self.state_management.for_guild(ctx.guild.id).get_admin_state()
         campaign_definition = admin_state["campaign_definition"]
         previous_description = campaign_definition["description"]
         previous_name = campaign_definition["title"]
@@ -78,16 +100,14 @@ class AdminTools(Cog):
                 campaign_definition['theme'] = stripped_list
 
         admin_state["campaign_definition"] = campaign_definition
-        self.state_management.write_admin_state(admin_state)
+        self.state_management.for_guild(ctx.guild.id).write_admin_state(admin_state)
         await ctx.send(f'campaign Description updated to {admin_state}')
 
     @commands.command(name='displaycampaigndescription')
     async def display_campaign_description(self,
                                         ctx: Context):
-        admin_state = self.state_management.get_admin_state()
-        publish_channel = admin_state['channels']['publish']
-        channel = next((x for x in ctx.guild.channels if x.name == publish_channel), None)
-        print(ctx.guild.channels)
+        admin_state = self.state_management.for_guild(ctx.guild.id).get_admin_state()
+        channel = self.bot.get_cog('Channels').get_channel(ctx.guild, 'publish')
         print(channel)
         campaign_definition = admin_state["campaign_definition"]
         title = campaign_definition["title"]
@@ -95,3 +115,142 @@ class AdminTools(Cog):
         theme = campaign_definition["theme"]
         msg = f'{description}\n\n\nCampaign Theme: {", ".join(theme)}'
         await GenericDisplayEmbed(title, description, channel).send_message()
+
+    @commands.command(name='stats')
+    @commands.has_permissions(administrator=True)
+    async def stats(self,
+                    ctx: Context):
+        """
+        Display the metrics recorded since the bot started: command latencies, persistence
+        I/O, scheduler ticks and resolution lag, and outbound messages.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+        """
+        lines = []
+        for metric in metrics.registry.metrics.values():
+            for key in sorted(metric.values):
+                labels = ' '.join(str(value) for value in key)
+                name = metric.name.removeprefix('cyoa_') + (f' {labels}' if labels else '')
+                if isinstance(metric, metrics.Histogram):
+                    count, total, p95 = metric.summary(**dict(zip(metric.labelnames, key)))
+                    lines.append(f'{name}: {count} x {total / count * 1000:.1f} ms avg, p95 <= {p95 * 1000:g} ms')
+                else:
+                    lines.append(f'{name}: {metric.values[key]}')
+        message_str = truncate_description('\n'.join(lines) or 'Nothing recorded yet.')
+        await GenericDisplayEmbed('Stats', message_str, ctx.channel).send_message()
+
+    @commands.group(name='profile', invoke_without_command=True)
+    @commands.has_permissions(administrator=True)
+    async def profile(self,
+                      ctx: Context):
+        """
+        Show whether a profile is running. Profiles sample where the bot spends its CPU time and
+        trace where it allocates memory, see $profile start, $profile commands and $profile stop.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+        """
+        session = self.profile_session
+        if session is None:
+            await ctx.send('No profile is running. Use $profile start [seconds] or $profile commands [count].')
+        elif self.profile_commands_left is not None:
+            await ctx.send(f'Profiling since {session.started_at:%H:%M:%S}, {self.profile_commands_left} command(s) to go.')
+        else:
+            await ctx.send(f'Profiling since {session.started_at:%H:%M:%S}.')
+
+    @profile.command(name='start')
+    @commands.has_permissions(administrator=True)
+    async def profile_start(self,
+                            ctx: Context,
+                            seconds: int = 60):
+        """
+        Profile the bot for a number of seconds, then post the results.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+            seconds: How long to profile for, capped at options.profile_max_seconds.
+        """
+        if await self.start_profile(ctx):
+            seconds = max(1, min(seconds, self.options.profile_max_seconds))
+            self.profile_timer = asyncio.create_task(self.stop_profile_after(seconds))
+            await ctx.send(f'Profiling for {seconds}s.')
+
+    @profile.command(name='commands')
+    @commands.has_permissions(administrator=True)
+    async def profile_commands(self,
+                               ctx: Context,
+                               count: int = 10):
+        """
+        Profile the bot until a number of commands have run, then post the results.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+            count: The number of commands to profile, $profile commands themselves do not count.
+        """
+        if await self.start_profile(ctx):
+            self.profile_commands_left = max(1, count)
+            # A profile waiting on commands that never come still ends
+            self.profile_timer = asyncio.create_task(self.stop_profile_after(self.options.profile_max_seconds))
+            await ctx.send(f'Profiling the next {self.profile_commands_left} command(s).')
+
+    @profile.command(name='stop')
+    @commands.has_permissions(administrator=True)
+    async def profile_stop(self,
+                           ctx: Context):
+        """
+        Stop the running profile now and post its results.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+        """
+        if self.profile_session is None:
+            await ctx.send('No profile is running.')
+            return
+        await self.finish_profile()
+
+    async def start_profile(self, ctx):
+        if self.profile_session is not None:
+            await ctx.send('A profile is already running, $profile stop ends it.')
+            return False
+        channels = self.bot.get_cog('Channels')
+        self.profile_channel = (channels.get_channel(ctx.guild, 'dm') if channels and ctx.guild else None) or ctx.channel
+        self.profile_session = ProfileSession(interval=self.options.profile_sample_interval)
+        self.profile_session.start()
+        return True
+
+    async def stop_profile_after(self, seconds):
+        await asyncio.sleep(seconds)
+        self.profile_timer = None
+        await self.finish_profile()
+
+    async def finish_profile(self):
+        """
+        Stop the running profile, write its results to options.profile_directory and post a
+        summary of them to the DM channel.
+        """
+        session, channel = self.profile_session, self.profile_channel
+        self.profile_session = None
+        self.profile_commands_left = None
+        if self.profile_timer is not None:
+            self.profile_timer.cancel()
+            self.profile_timer = None
+        # Snapshots of a large heap take a while, keep them off the event loop
+        await asyncio.to_thread(session.stop)
+        summary_file, folded_file = await asyncio.to_thread(session.write, self.options.profile_directory)
+        print(f'Wrote profile to {summary_file} and {folded_file}.')
+        summary = truncate_description(session.summary(PROFILE_TOP))
+        await GenericDisplayEmbed('Profile', f'```\n{summary}\n```\nWritten to {summary_file}', channel).send_message()
+
+    @Cog.listener()
+    async def on_command_completion(self, ctx):
+        await self.count_profiled_command(ctx)
+
+    @Cog.listener()
+    async def on_command_error(self, ctx, error):
+        await self.count_profiled_command(ctx)
+
+    async def count_profiled_command(self, ctx):
+        # The only work done for every command while no per-command profile is running
+        if self.profile_commands_left is None:
+            return
+        if ctx.command is None or (ctx.command.root_parent or ctx.command).name == 'profile':
+            return
+        self.profile_commands_left -= 1
+        if self.profile_commands_left <= 0:
+            await self.finish_profile()
@@ -0,0 +1,104 @@
+"""
+    A Discord Cog that resolves the configured DM and publish channels of a guild.
+"""
+import discord
+from discord.ext import commands
+
+class Channels(commands.Cog):
+    """
+    Caches the channel object configured for each (guild, role), role being 'dm' or
+    'publish', so the hot paths do not scan guild.channels, and the set of channel ids
+    commands are allowed in per guild. Entries are dropped when the admin settings change
+    or the channel is updated or deleted.
+    params:
+        bot: The bot whose channel events invalidate the cache.
+        state_management: The state management object holding each guild's admin settings.
+    """
+    def __init__(self, bot, state_management):
+        self.bot = bot
+        self.state_management = state_management
+        # (guild id, role) -> channel
+        self.cache = {}
+        # guild id (None for direct messages) -> ids of the channels commands are allowed in,
+        # None when commands are allowed everywhere
+        self.allowed_channels = {}
+
+    def get_channel(self, guild, role):
+        """
+        Return the channel configured for a role in a guild, or None.
+        params:
+            guild: The guild to find the channel in.
+            role: 'dm' or 'publish'.
+        """
+        key = (guild.id, role)
+        if key in self.cache:
+            return self.cache[key]
+
+        state_management = self.state_management.for_guild(guild.id)
+        admin_state = state_management.get_admin_state()
+        configured = admin_state['channels'][role]
+        if isinstance(configured, int):
+            channel = guild.get_channel(configured)
+        elif configured:
+            # Channels used to be stored by name, store the id from now on so a rename
+            # does not break publishing
+            channel = next((x for x in guild.channels if x.name == configured), None)
+            if channel:
+                print(f'Storing {role} channel {configured} by id {channel.id}.')
+                admin_state['channels'][role] = channel.id
+                state_management.write_admin_state(admin_state)
+        else:
+            channel = None
+        if channel:
+            self.cache[key] = channel
+        return channel
+
+    def allows(self, ctx):
+        """
+        Whether commands may be invoked in the channel of a context, which is the DM channel
+        of its guild once one is configured. Outside of a guild there is no state to act on.
+        """
+        guild_id = ctx.guild.id if ctx.guild else None
+        if guild_id in self.allowed_channels:
+            allowed = self.allowed_channels[guild_id]
+        else:
+            allowed = self.allowed_channels[guild_id] = self._build_allowed(ctx.guild)
+        return allowed is None or ctx.channel.id in allowed
+
+    def _build_allowed(self, guild):
+        if guild is None:
+            return frozenset()
+        admin_state = self.state_management.for_guild(guild.id).get_admin_state()
+        if not admin_state or not admin_state['channels']['dm']:
+            return None
+        dm_channel = self.get_channel(guild, 'dm')
+        if dm_channel is None:
+            # The DM channel was deleted, allow commands everywhere so $SetDMChannel can
+            # point at a new one
+            print(f'The DM channel of {guild.name} no longer exists, allowing commands in every channel.')
+            return None
+        return frozenset([dm_channel.id])
+
+    def invalidate(self, guild_id=None, channel_id=None):
+        """
+        Drop cached channels of a guild, or the entries pointing at a channel, along with
+        the allowed channels. With no arguments the whole cache is dropped.
+        """
+        for key, channel in list(self.cache.items()):
+            if (guild_id is None or key[0] == guild_id) and (channel_id is None or channel.id == channel_id):
+                del self.cache[key]
+        # Rebuilt lazily on the next command, rare enough to drop every guild's
+        self.allowed_channels.clear()
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        # A channel configured by name may have just been created
+        self.invalidate(guild_id=channel.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        self.invalidate(channel_id=before.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.invalidate(channel_id=channel.id)
@@ -4,13 +4,23 @@
 import asyncio
 import datetime
 import random
+import time
 
 from discord.ext import commands
 from discord.ext.commands import Context
 
-from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from metrics import recovered_decisions, recovery_seconds, scheduler_tick_seconds
+from partitioned_persistence import GuildPartitionedPersistence
 from model.decision import Decision, DecisionState
-from utils.display import DecisionDisplayEmbed, GenericDisplayEmbed
+from utils.dispatch import ANNOUNCEMENT, PUBLICATION
+from utils.display import DecisionDisplayEmbed, GenericDisplayEmbed, description_pages, render_cache
+
+RESOLUTION_TITLES = ["The people have spoken.",
+                     "A fate is drawn.",
+                     "The gods deign.",
+                     "A decision has been made.",
+                     "The future crystalizes."]
 
 class Decisions(commands.Cog):
     """
@@ -18,16 +28,27 @@ class Decisions(commands.Cog):
     params:
         bot: The bot that uses these commands.
         state_management: The state management object responsible for persisting
-            Decisions' state.
+            Decisions' state, partitioned by guild.
+        options: Tunables, defaults to GlobalOptions().
     """
     def __init__(self,
                  bot: commands.Bot,
-                 state_management: file_persistence):
+                 state_management: GuildPartitionedPersistence,
+                 options: GlobalOptions = None):
         self.bot = bot
         self.state_management = state_management
-        self.actions = self.bot.get_cog('Actions')
+        self.options = options or GlobalOptions()
+        self.user_interaction = None
+
+    async def cog_load(self):
+        # Cogs are added in dependency order, UserInteraction is loaded by now
         self.user_interaction = self.bot.get_cog('UserInteraction')
 
+    @property
+    def actions(self):
+        # Actions depends on Decisions and is loaded after it, so look it up when used
+        return self.bot.get_cog('Actions')
+
     # Bot Commands
     @commands.command(name='preparedecision')
     async def prepare_decision(self,
@@ -43,9 +64,9 @@ class Decisions(commands.Cog):
         """
         # create decision model
         decision = Decision(title, body)
-        decisions = self.state_management.get_state()
-        decisions['decisions'].append(decision)
-        self.state_management.write_state(decisions)
+        decision.guild_id = ctx.guild.id
+        self.state_management.for_guild(ctx.guild.id).add_decision(decision)
+        self.update_indexes(decision, ctx.guild.id)
 
         # Display decision
         await DecisionDisplayEmbed(decision, ctx.channel, ctx).send_message()
@@ -78,13 +99,13 @@ class Decisions(commands.Cog):
                     response = await self.user_interaction.await_response(ctx)
                     if response:
                         selected_decision.title = response
-                        await self.update_decision(selected_decision)
+                        await self.update_decision(selected_decision, ctx.guild.id)
                 case '2':
                     await GenericDisplayEmbed('Decision Body Update', 'What is the new body?', ctx.channel).send_message()
                     response = await self.user_interaction.await_response(ctx)
                     if response:
                         selected_decision.body = response
-                        await self.update_decision(selected_decision)
+                        await self.update_decision(selected_decision, ctx.guild.id)
                 case '3':
                     await self.actions.modify_actions(ctx, selected_decision)
             await DecisionDisplayEmbed(selected_decision, ctx.channel, ctx).send_message()
@@ -92,47 +113,16 @@ class Decisions(commands.Cog):
     @commands.command(name='viewdecisions')
     async def view_decisions(self,
                              ctx: Context,
-                             decision_state: DecisionState = DecisionState.PREPARATION):
+                             decision_state: DecisionState = DecisionState.PREPARATION,
+                             title_prefix: str = ''):
         """
         View stored decisions filtering on its state.
         params:
             ctx: The Discord context in which the command has been executed within.
             decision_state: The state to filter decisions on.
+            title_prefix: Only list decisions whose title starts with this.
         """
-        decisions = self.find_decisions(decision_state=decision_state)
-        choices = []
-        message_str = 'Found Decision(s), which one do you want to view. (c to cancel):'
-
-        # If multiple decisions are found, list each and have user select one
-        for decision in decisions:
-            choices.append(decision)
-            message_str += f'\n [**{len(choices)}**] {str(decision.title)[0:20]}'
-
-        # Ensure selection is within the bounds of choice
-        def check(msg):
-            valid = [str(v) for v in range(1, len(choices) + 1)] + ["c"]
-            return msg.channel == ctx.channel \
-                and msg.author == ctx.author \
-                and msg.content.lower() in valid
-
-        # Send choices, await a legitimate response
-        await GenericDisplayEmbed('Multiple Matches Found', message_str, ctx.channel).send_message()
-
-        response = ''
-        try:
-            response = await self.bot.wait_for("message", timeout=30, check=check)
-        except asyncio.TimeoutError:
-            response = None
-
-        # Display decision
-        if response:
-            if response.content == 'c':
-                response = None
-            else:
-                display_decision = choices[int(response.content) - 1]
-                await DecisionDisplayEmbed(display_decision, ctx, ctx.channel).send_message()
-        if response is None:
-            await ctx.send("Selection timed out or was canceled.")
+        await self.choose_decision(ctx, decision_state, title_prefix)
 
     @commands.command(name='publishdecision')
     async def publish_decision(self,
@@ -144,28 +134,12 @@ class Decisions(commands.Cog):
         :param timeout: The amount of time that the Decision can be voted upon.
         :return: None
         """
-        # Find all Decisions in the PREPARATION state
-        decisions = self.find_decisions(decision_state=DecisionState.PREPARATION)
-        choices = []
-        admin_state = self.state_management.get_admin_state()
-        publish_channel = admin_state['channels']['publish']
+        channel = self.bot.get_cog('Channels').get_channel(ctx.guild, 'publish')
+        publish_channel = channel.name if channel else None
 
-        # Display choices
-        message_str = "Found decision(s), which one do you want to publish:\n"
-        for i, decision in enumerate(decisions):
-            choices.append(decision)
-            message_str += f"[**{i+1}**] {str(decision.title)[0:20]}\n"
-        message_str += "Type a number between 1 and {} to select a decision, or type 'c' to cancel.".format(len(choices))
-        await GenericDisplayEmbed('Multiple Decisions Found', message_str, ctx.channel).send_message()
-
-        response = await self.user_interaction.await_response(ctx, [str(i) for i in range(1, len(choices) + 1)] + ["c"])
-
-        # Publish selected decision
-        if not response:
+        selected_decision = await self.choose_decision(ctx, DecisionState.PREPARATION)
+        if not selected_decision:
             return
-        
-        selected_decision = choices[int(response) - 1]
-        await DecisionDisplayEmbed(selected_decision, ctx, ctx.channel).send_message()
 
         # Confirm publication
         message = f"Do you wish to publish the above Decision to **{publish_channel}**?\n" + \
@@ -196,134 +170,404 @@ class Decisions(commands.Cog):
         if not response or response.lower() == 'n':
             return
 
-        # Find the 'public-channel' and display the decision
-        channel = next((x for x in ctx.guild.channels if x.name == publish_channel), None)
+        if channel is None:
+            await ctx.send('No publish channel is set, use $SetPublishChannel first.')
+            return
+
+        # Display the decision in the 'public-channel'
+        previous = (selected_decision.publish_time, selected_decision.resolve_time,
+                    selected_decision.state, selected_decision.guild_id)
         selected_decision.publish_time = str(datetime.datetime.now())
         selected_decision.resolve_time = resolve_time
         selected_decision.state = DecisionState.PUBLISHED
         selected_decision.guild_id = ctx.guild.id
+        # The embed shows the resolve time, drop the one rendered while choosing
+        render_cache.invalidate(selected_decision.id_)
         await ctx.send(f'The decision will publish to {channel} with a resolve time at {selected_decision.resolve_time}')
-        sent_message = await DecisionDisplayEmbed(selected_decision, channel, ctx).send_message()
-        selected_decision.message_id = sent_message.id
+        # Start counting votes before the reactions are added, players can vote right away
+        def track_votes(message):
+            selected_decision.message_id = message.id
+            self.bot.get_cog('Tally').track(selected_decision)
+        try:
+            await DecisionDisplayEmbed(selected_decision, channel, ctx, PUBLICATION).send_message(on_sent=track_votes)
+        except Exception:
+            if selected_decision.message_id is not None:
+                # The message went out, only adding its reactions failed
+                print(f'Published {selected_decision.id_} without all of its reactions.')
+            else:
+                # Nothing was published, leave the Decision in preparation
+                (selected_decision.publish_time, selected_decision.resolve_time,
+                 selected_decision.state, selected_decision.guild_id) = previous
+                raise
         await self.update_decision(selected_decision)
+        self.bot.get_cog('Scheduler').schedule(selected_decision)
 
     # Helper Functions
     async def update_decision(self,
-                              decision: Decision):
-        self.state_management.update_decision(decision)
+                              decision: Decision,
+                              guild_id: int = None):
+        """
+        Persist changes to a Decision in the state of its guild.
+        params:
+            decision: The changed Decision.
+            guild_id: The guild the Decision belongs to, defaults to decision.guild_id.
+        """
+        decision.version += 1
+        render_cache.invalidate(decision.id_)
+        self.state_management.for_guild(guild_id or decision.guild_id).update_decision(decision)
+        self.update_indexes(decision, guild_id)
+
+    async def update_decisions(self,
+                               decisions: list,
+                               guild_id: int):
+        """
+        Persist changes to several Decisions of one guild as a single batched write.
+        params:
+            decisions: The changed Decisions.
+            guild_id: The guild the Decisions belong to.
+        """
+        for decision in decisions:
+            decision.version += 1
+            render_cache.invalidate(decision.id_)
+        self.state_management.for_guild(guild_id).update_decisions(decisions)
+        for decision in decisions:
+            self.update_indexes(decision, guild_id)
+
+    def update_indexes(self,
+                       decision: Decision,
+                       guild_id: int = None):
+        """ Keep the guild's story map and search index in step with a new or changed Decision. """
+        for name in ['StoryMap', 'Search']:
+            cog = self.bot.get_cog(name)
+            if cog:
+                cog.update(decision, guild_id)
       
     async def check_time(self):
-        """ Checks the time for each published decision and checks if the resolve time is up """
-        decisions = self.find_decisions(decision_state=DecisionState.PUBLISHED)
+        """ Checks the time for each published decision and resolves those whose resolve time is up """
+        with scheduler_tick_seconds.time():
+            now = datetime.datetime.now()
+            due = []
+            for guild in self.guilds_with_state():
+                decisions = self.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+                due += [x for x in decisions if as_datetime(x.resolve_time) < now]
+            await self.resolve_decisions(due)
+
+    async def resolve_decisions(self,
+                                decisions: list):
+        """
+        Resolve several due Decisions concurrently, at most options.resolution_concurrency at a time.
+        Channels are looked up once per guild for the whole batch.
+        params:
+            decisions: The Decisions whose resolve time is up.
+        returns: The result of each resolution in order, an exception if it failed.
+        """
+        if not decisions:
+            return []
+        # guild id -> (publish channel, DM channel), or the error looking them up raised
+        channels = {}
         for decision in decisions:
-            if decision.resolve_time < datetime.datetime.now():
-                print(f'Resolve time is up for {decision.id_}' )
-                # Count votes and choose the winner
-                # Inform  the publish channel of the winner
-                # Inform the DM channel of the winner and the next decision
-                # TODO: Implement this
-
-                guild = self.bot.get_guild(decision.guild_id)
-                publish_channel_name = self.state_management.get_admin_state()['channels']['publish']
-                dm_channel_name = self.state_management.get_admin_state()['channels']['dm']
-                publish_channel = next((x for x in guild.channels if x.name == publish_channel_name), None)
-                dm_channel = next((x for x in guild.channels if x.name == dm_channel_name), None)
-                print(f'Publish channel: {publish_channel.name}')
-
-                # Find the specific discord message object
-                message = await publish_channel.fetch_message(decision.message_id)
-                # Get the message reaction count from the message
-                reactions = message.reactions
-                # Tally the reactions and find the reaction with the most votes
-                top_reaction = None
-                for reaction in reactions:
-                    if not top_reaction:
-                        top_reaction = reaction
-                    elif reaction.count > top_reaction.count:
-                        top_reaction = reaction
-                
-                # TODO: Handle the case where there is a tie
-                # TODO: Handle the case where there is no reaction
-                # Find the action that corresponds to the reaction
-                action = next((x for x in decision.actions if x.glyph == top_reaction.emoji), None)
-                # set the found action as the voted action
-                decision.voted_action = action
-                
-                decision.state = DecisionState.RESOLVED
-                await self.update_decision(decision)
-                # Get the message reaction count from the message
-                
-
-                # create list of messages
-                list_of_messages = ["The people have spoken.",
-                                    "A fate is drawn.",
-                                    "The gods deign.",
-                                    "A decision has been made.",
-                                    "The future crystalizes."]
-                # TODO: Make the message embed look nicer
-                message = random.choice(list_of_messages)
-                await GenericDisplayEmbed(message, f'An action has been chosen \n{action.glyph}: {action.description}', publish_channel).send_message()
-                await GenericDisplayEmbed(message, f'An action has been chosen \n{action.glyph}: {action.description}', dm_channel).send_message()
+            if decision.guild_id not in channels:
+                try:
+                    guild = self.bot.get_guild(decision.guild_id)
+                    if guild is None:
+                        raise LookupError(f'Guild {decision.guild_id} is not available.')
+                    channels[decision.guild_id] = self.find_channels(guild)
+                except Exception as error:
+                    channels[decision.guild_id] = error
+
+        semaphore = asyncio.Semaphore(self.options.resolution_concurrency)
+        async def resolve(decision):
+            found = channels[decision.guild_id]
+            if isinstance(found, Exception):
+                raise found
+            async with semaphore:
+                publish_channel, dm_channel = found
+                await self.resolve_decision(decision, publish_channel, dm_channel)
+
+        results = await asyncio.gather(*[resolve(decision) for decision in decisions], return_exceptions=True)
+        for decision, result in zip(decisions, results):
+            if isinstance(result, Exception):
+                print(f'Failed to resolve {decision.id_}: {result!r}')
+        return results
+
+    def guilds_with_state(self):
+        """
+        The guilds the bot is in that have state. Start-up passes go over these rather than
+        every guild, whose state would otherwise be created on the spot.
+        """
+        guilds = (self.bot.get_guild(guild_id) for guild_id in sorted(self.state_management.guild_ids()))
+        return [guild for guild in guilds if guild is not None]
+
+    def find_channels(self, guild):
+        """
+        Find the publish and DM channels of a guild.
+        returns: A (publish channel, DM channel) tuple.
+        """
+        channels = self.bot.get_cog('Channels')
+        return channels.get_channel(guild, 'publish'), channels.get_channel(guild, 'dm')
+
+    async def resolve_decision(self,
+                               decision: Decision,
+                               publish_channel = None,
+                               dm_channel = None):
+        """
+        Tally the votes of a published Decision, resolve it and announce the chosen action.
+        params:
+            decision: The Decision whose resolve time is up.
+            publish_channel: The channel the Decision was published to, looked up if not provided.
+            dm_channel: The DM channel, looked up if not provided.
+            Announcements to a channel that is not set are skipped.
+        """
+        print(f'Resolve time is up for {decision.id_}' )
+        if publish_channel is None:
+            guild = self.bot.get_guild(decision.guild_id)
+            publish_channel, dm_channel = self.find_channels(guild)
+        if publish_channel:
+            print(f'Publish channel: {publish_channel.name}')
+
+        action = await self.count_votes(decision, publish_channel)
+        self.settle(decision, action)
+        await self.update_decision(decision)
+
+        # TODO: Make the message embed look nicer
+        message = random.choice(RESOLUTION_TITLES)
+        for channel in [publish_channel, dm_channel]:
+            # The Decision is resolved either way, only announce where a channel is set
+            if channel is None:
+                continue
+            await GenericDisplayEmbed(message, f'An action has been chosen \n{describe_action(action)}', channel, ANNOUNCEMENT).send_message()
+
+    async def count_votes(self,
+                          decision: Decision,
+                          publish_channel):
+        """
+        Find the Action with the most votes on a published Decision.
+        params:
+            decision: The published Decision.
+            publish_channel: The channel the Decision was published to.
+        returns: The winning Action, None when the Decision has no Actions.
+        """
+        # Take the winner from the live tally, it is only missing when votes may have been
+        # cast while the bot was down
+        tally = self.bot.get_cog('Tally')
+        action = tally.winner(decision) if tally else None
+        if action is None:
+            # Find the specific discord message object and count the reactions on it that
+            # are votes, ties going to the earliest Action
+            if publish_channel is None:
+                raise LookupError(f'No publish channel to count the votes of {decision.id_} in.')
+            message = await publish_channel.fetch_message(decision.message_id)
+            if tally:
+                if decision.id_ not in tally.votes:
+                    tally.track(decision, live=False)
+                tally.reconcile(decision, message.reactions)
+                action = tally.winner(decision)
+            elif decision.actions:
+                counts = {str(reaction.emoji): reaction.count for reaction in message.reactions}
+                action = max(decision.actions, key=lambda x: counts.get(x.glyph, 0))
+        return action
+
+    def settle(self,
+               decision: Decision,
+               action):
+        """ Mark a Decision RESOLVED with its voted Action and final count, without persisting it. """
+        # set the found action as the voted action
+        decision.voted_action = action
+        decision.state = DecisionState.RESOLVED
+        tally = self.bot.get_cog('Tally')
+        if tally:
+            decision.votes = dict(tally.votes.get(decision.id_, {}))
+            tally.forget(decision)
+
+    async def recover_overdue(self):
+        """
+        Resolve every published Decision whose resolve time passed while the bot was down.
+        Their messages are fetched concurrently, at most options.resolution_concurrency at a
+        time, each guild's resolutions are written as one batch, and each channel gets one
+        summary instead of an announcement per Decision.
+        returns: The Decisions resolved.
+        """
+        start = time.perf_counter()
+        now = datetime.datetime.now()
+        overdue = []
+        channels = {}
+        for guild in self.guilds_with_state():
+            try:
+                due = [x for x in self.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+                       if as_datetime(x.resolve_time) < now]
+                if due:
+                    channels[guild.id] = self.find_channels(guild)
+                    overdue += due
+            except Exception as error:
+                # Left PUBLISHED, the scheduler retries them like any other due decision
+                print(f'Failed to recover the decisions of guild {guild.id}: {error!r}')
+        if not overdue:
+            return []
+
+        semaphore = asyncio.Semaphore(self.options.resolution_concurrency)
+        async def count(decision):
+            async with semaphore:
+                return await self.count_votes(decision, channels[decision.guild_id][0])
+
+        results = await asyncio.gather(*[count(decision) for decision in overdue], return_exceptions=True)
+        counted = {}
+        for decision, action in zip(overdue, results):
+            if isinstance(action, Exception):
+                print(f'Failed to recover {decision.id_}: {action!r}')
+                continue
+            counted.setdefault(decision.guild_id, []).append((decision, action))
+
+        resolved = []
+        for guild_id, decisions in counted.items():
+            # One guild's failure must not stop the others
+            if await self.resolve_recovered(decisions, guild_id):
+                resolved += [decision for decision, _ in decisions]
+            try:
+                await self.announce_recovered([decision for decision, _ in decisions], channels[guild_id])
+            except Exception as error:
+                print(f'Failed to announce the recovered decisions of guild {guild_id}: {error!r}')
+
+        seconds = time.perf_counter() - start
+        recovery_seconds.observe(seconds)
+        recovered_decisions.inc(len(resolved))
+        print(f'Recovered {len(resolved)} of {len(overdue)} overdue decisions in {seconds:.2f}s.')
+        return resolved
+
+    async def resolve_recovered(self,
+                                decisions: list,
+                                guild_id: int):
+        """
+        Resolve the counted overdue Decisions of a guild with one batched write. If the write
+        fails they are put back as they were, still PUBLISHED.
+        params:
+            decisions: (Decision, winning Action) of each Decision.
+            guild_id: The guild the Decisions belong to.
+        returns: Whether the Decisions were resolved.
+        """
+        previous = [(decision.state, decision.voted_action, decision.votes) for decision, _ in decisions]
+        for decision, action in decisions:
+            self.settle(decision, action)
+        try:
+            await self.update_decisions([decision for decision, _ in decisions], guild_id)
+            return True
+        except Exception as error:
+            print(f'Failed to write the recovered decisions of guild {guild_id}: {error!r}')
+            for (decision, _), (state, voted_action, votes) in zip(decisions, previous):
+                decision.state, decision.voted_action, decision.votes = state, voted_action, votes
+            return False
+
+    async def announce_recovered(self,
+                                 decisions: list,
+                                 channels):
+        """
+        Post one summary of the resolved Decisions of a guild to each of its channels.
+        params:
+            decisions: The Decisions, those not RESOLVED are left out.
+            channels: The (publish channel, DM channel) of the guild, either may be None.
+        """
+        decisions = [decision for decision in decisions if decision.state == DecisionState.RESOLVED]
+        if not decisions:
+            return
+        lines = [f'**{str(decision.title)[0:50]}**: {describe_action(decision.voted_action)}'
+                 for decision in decisions]
+        title = f'{len(decisions)} decisions were made while I was away' if len(decisions) > 1 \
+            else 'A decision was made while I was away'
+        for channel in channels:
+            if channel is None:
+                continue
+            for description in description_pages(lines):
+                await GenericDisplayEmbed(title, description, channel, ANNOUNCEMENT).send_message()
 
     async def choose_decision(self,
                               ctx: Context,
-                              state: DecisionState):
+                              state: DecisionState,
+                              title_prefix: str = ''):
         """
-        choose_decision: Display a list of decisions and allow the user to select one.
+        choose_decision: Display a page of decisions at a time and allow the user to select one.
+        Only the decisions of the current page are read from state management.
         params:
             ctx: The Discord context in which the command has been executed within.
             state: The state of the decision to choose from.
+            title_prefix: Only list decisions whose title starts with this, the user can change it.
         """
-        decisions = self.find_decisions(decision_state=state)
-        choices = []
-        message_str = 'Found Decision(s), which one do you want to select. (c to cancel):'
-
-        # If multiple decisions are found, list each and have user select one
-        for decision in decisions:
-            choices.append(decision)
-            message_str += f'\n [**{len(choices)}**] {str(decision.title)[0:20]}'
-
-        # Send choices, await a legitimate response
-        await GenericDisplayEmbed('Select Decision', message_str, ctx.channel).send_message()
-
-        response = await self.user_interaction.await_response(ctx, 
-            [str(v) for v in range(1, len(choices) + 1)] + ["c"])
-
-        # Display decision
-        if response:
-            selected_decision = choices[int(response) - 1]
-            await DecisionDisplayEmbed(selected_decision, ctx.channel, ctx).send_message()
-            return selected_decision
-        return None
+        state_management = self.state_management.for_guild(ctx.guild.id)
+        page_size = self.options.chooser_page_size
+        page = 0
+        while True:
+            # One decision past the page tells whether there is a next page
+            decisions = state_management.page_decisions(state, title_prefix, page * page_size, page_size + 1)
+            choices = decisions[:page_size]
+            if not choices and page == 0 and not title_prefix:
+                await ctx.send('No decisions found.')
+                return None
+
+            message_str = f'Page {page + 1}, which decision do you want to select? (c to cancel)'
+            if title_prefix:
+                message_str += f'\nTitles starting with **{title_prefix}**'
+            if not choices:
+                message_str += '\nNo decisions found.'
+            for index, decision in enumerate(choices):
+                message_str += f'\n [**{index + 1}**] {str(decision.title)[0:20]}'
+            options = [str(v) for v in range(1, len(choices) + 1)] + ['f', 'c']
+            if len(decisions) > page_size:
+                message_str += '\n [**n**] Next page'
+                options.append('n')
+            if page > 0:
+                message_str += '\n [**p**] Previous page'
+                options.append('p')
+            message_str += '\n [**f**] Filter by title'
+
+            # Send choices, await a legitimate response
+            await GenericDisplayEmbed('Select Decision', message_str, ctx.channel).send_message()
+            response = await self.user_interaction.await_response(ctx, options)
+            if not response:
+                return None
+            response = response.lower()
+            if response == 'n':
+                page += 1
+            elif response == 'p':
+                page -= 1
+            elif response == 'f':
+                await GenericDisplayEmbed('Select Decision', 'Type the start of the title. (* to list every decision)', ctx.channel).send_message()
+                response = await self.user_interaction.await_response(ctx)
+                if response is None:
+                    return None
+                title_prefix = '' if response == '*' else response
+                page = 0
+            else:
+                # Display decision
+                selected_decision = choices[int(response) - 1]
+                await DecisionDisplayEmbed(selected_decision, ctx.channel, ctx).send_message()
+                return selected_decision
 
     def find_decisions(self,
+                       guild_id: int,
                        decision_id: str = None,
                        decision_state: DecisionState = None):
         """
         Find a Decision in state management based on filter criteria.
+        Both filters are answered from the state management's indexes rather than a scan.
         params:
-            id: The unique identifier of a Decision to filter the results with.
+            guild_id: The guild whose Decisions are searched.
+            decision_id: The unique identifier of a Decision to filter the results with.
             decision_state: The state of Decisions to filter the results with.
         """
-        state = self.state_management.get_state()
-        decisions = []
-
-        # If an id is provided, return the decision with that id
+        state_management = self.state_management.for_guild(guild_id)
+        # If an id is provided, return the decision with that id (or None)
         if decision_id:
-            for decision in state:
-                if decision.id == decision_id:
-                    return decision
-                # TODO: Handle scenario where none are found of this id
+            return state_management.get_decision(decision_id)
         # If no id is provided, return all decisions with the provided state
         elif decision_state:
-            for decision in state['decisions']:
-                if decision.state == decision_state:
-                    decisions.append(decision)
-                # TODO: Handle scenario where none are found of this state
-            return decisions
+            return state_management.get_decisions(decision_state)
         else:
-            return state
+            return state_management.get_state()
   
+def describe_action(action):
+    """ The glyph and description of a chosen Action, for announcements. """
+    if action is None:
+        return 'No action was chosen.'
+    return f'{action.glyph}: {action.description}'
+
 def round_time(date=None, date_delta=datetime.timedelta(minutes=1), to='average'):
     """
     Round a datetime object to a multiple of a timedelta
@@ -348,3 +592,11 @@ def round_time(date=None, date_delta=datetime.timedelta(minutes=1), to='average'
             rounding = (seconds + round_to / 2) // round_to * round_to
 
     return date + datetime.timedelta(0, rounding - seconds, - date.microsecond)
+
+def as_datetime(value):
+    """
+    Older decisions.yaml entries hold resolve_time as a string, return it as a datetime.
+    """
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
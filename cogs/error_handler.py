@@ -1,14 +1,33 @@
 import discord
+import time
 import traceback
 import sys
 from discord.ext import commands
 
+from metrics import command_seconds
+
 
 class CommandErrorHandler(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_command(self, ctx):
+        """The event triggered when a command is invoked, before its checks run."""
+        ctx.invoked_at = time.perf_counter()
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        """The event triggered when a command has completed without error."""
+        self.observe(ctx, 'ok')
+
+    def observe(self, ctx, outcome):
+        """Record how long a command took, from its invocation."""
+        invoked_at = getattr(ctx, 'invoked_at', None)
+        if invoked_at is not None and ctx.command is not None:
+            command_seconds.observe(time.perf_counter() - invoked_at, command=ctx.command.qualified_name, outcome=outcome)
+
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
         """The event triggered when an error is raised while invoking a command.
@@ -19,6 +38,8 @@ class CommandErrorHandler(commands.Cog):
         error: commands.CommandError
             The Exception raised.
         """
+        self.observe(ctx, 'error')
+
         if hasattr(ctx.command, 'on_error'):
             return
 
@@ -49,6 +70,9 @@ class CommandErrorHandler(commands.Cog):
         elif isinstance(error, commands.errors.MissingRequiredArgument):
             await ctx.send(f'Missing parameter for command {ctx.command.name}: {error.args[0]}')
 
+        elif isinstance(error, commands.MissingPermissions):
+            await ctx.send(f'{ctx.command} is only available to administrators.')
+
         else:
             print('Ignoring exception in command {}:'.format(ctx.command), file=sys.stderr)
             traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
\ No newline at end of file
@@ -1,18 +1,169 @@
-from discord.ext import tasks, commands
+import asyncio
+import datetime
+import heapq
+import time
+from collections import deque
+
+import discord
+from discord.ext import commands
+
+from cogs.decisions import as_datetime
+from metrics import resolution_lag_seconds, scheduler_tick_seconds
+from model.decision import DecisionState
+from utils.startup import wait_for_warm_up
 
 class Scheduler(commands.Cog):
+    """
+    Resolves published Decisions when their resolve time comes up.
+    Pending resolve times are kept in a min-heap and the scheduler sleeps until the earliest
+    one, instead of polling. Scheduling a new deadline wakes it so it can sleep again
+    against the new earliest one. A resolution that fails is retried with a growing delay,
+    unless its message is gone.
+    params:
+        bot: The bot whose Decisions cog resolves the decisions.
+    """
+    # Upper bound on a single sleep, so wall clock adjustments are noticed eventually
+    max_sleep = 60.0
+    # Seconds before the first retry of a failed resolution, doubled on each further failure
+    retry_delay = 5.0
+    # Failures that retrying cannot fix
+    permanent_errors = (discord.NotFound,)
+
     def __init__(self, bot):
-        self.index = 0
         self.bot = bot
+        # (due time, guild id, decision id, resolve_time) of every pending resolution, the
+        # due time is later than the resolve_time when retrying a failed one
+        self.deadlines = []
+        # decision id -> failed attempts at resolving it
+        self.failures = {}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        # Seconds between each decision's resolve_time and when it actually got resolved
+        self.resolution_lags = deque(maxlen=100)
 
     def cog_unload(self):
-        self.printer.cancel()
+        if self.task:
+            self.task.cancel()
+
+    def schedule(self, decision):
+        """
+        Add the resolve_time of a newly published Decision to the pending deadlines.
+        """
+        resolve_time = as_datetime(decision.resolve_time)
+        heapq.heappush(self.deadlines, (resolve_time, decision.guild_id, decision.id_, resolve_time))
+        self.wakeup.set()
+
+    def rebuild(self):
+        """
+        Rebuild the pending deadlines from the persisted PUBLISHED decisions of every guild with state.
+        """
+        decisions = self.bot.get_cog('Decisions')
+        self.deadlines = []
+        for guild in decisions.guilds_with_state():
+            for decision in decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED):
+                resolve_time = as_datetime(decision.resolve_time)
+                self.deadlines.append((resolve_time, guild.id, decision.id_, resolve_time))
+        heapq.heapify(self.deadlines)
+        self.wakeup.set()
+
+    @property
+    def last_resolution_lag(self):
+        return self.resolution_lags[-1] if self.resolution_lags else None
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            now = datetime.datetime.now()
+            if not self.deadlines or self.deadlines[0][0] > now:
+                delay = self.max_sleep
+                if self.deadlines:
+                    delay = min(delay, (self.deadlines[0][0] - now).total_seconds())
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # One guild's failure must not stop resolutions for every guild
+            try:
+                await self.tick(now)
+            except Exception as error:
+                print(f'Scheduler tick failed: {error!r}')
+
+    async def tick(self, now):
+        """
+        Resolve everything that is due together, so a batch of decisions expiring at the
+        same time is announced concurrently.
+        """
+        tick_start = time.perf_counter()
+        decisions = self.bot.get_cog('Decisions')
+        due = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, guild_id, decision_id, resolve_time = heapq.heappop(self.deadlines)
+            decision = decisions.find_decisions(guild_id, decision_id=decision_id)
+            # Skip deadlines of decisions that were resolved or rescheduled in the meantime
+            if decision is None \
+                    or decision.state != DecisionState.PUBLISHED \
+                    or as_datetime(decision.resolve_time) != resolve_time:
+                self.failures.pop(decision_id, None)
+                continue
+            due.append(decision)
+
+        results = await decisions.resolve_decisions(due)
+        scheduler_tick_seconds.observe(time.perf_counter() - tick_start)
+        resolved = []
+        for decision, result in zip(due, results):
+            if isinstance(result, Exception):
+                self.retry(decision, result)
+            else:
+                self.failures.pop(decision.id_, None)
+                resolved.append(decision)
+        self.record_lags(resolved)
+
+    def retry(self, decision, error):
+        """
+        Put the deadline of a Decision whose resolution failed back, retry_delay seconds from
+        now doubling with each failure, at most max_sleep. Permanent errors are not retried.
+        """
+        failures = self.failures.pop(decision.id_, 0) + 1
+        if isinstance(error, self.permanent_errors):
+            print(f'Giving up on resolving {decision.id_}: {error!r}')
+            return
+        if decision.state != DecisionState.PUBLISHED:
+            # It was resolved, only announcing it failed
+            return
+        self.failures[decision.id_] = failures
+        delay = min(self.retry_delay * 2 ** (failures - 1), self.max_sleep)
+        retry_at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        heapq.heappush(self.deadlines, (retry_at, decision.guild_id,
+                                        decision.id_, as_datetime(decision.resolve_time)))
+        print(f'Retrying {decision.id_} in {delay:.0f}s.')
+
+    def record_lags(self, resolved):
+        """ Record how late each of the just resolved Decisions was. """
+        resolved_at = datetime.datetime.now()
+        for decision in resolved:
+            lag = (resolved_at - as_datetime(decision.resolve_time)).total_seconds()
+            self.resolution_lags.append(lag)
+            resolution_lag_seconds.observe(lag)
+            print(f'Resolved {decision.id_} {lag:.3f}s after its resolve time.')
 
-    @tasks.loop(seconds=5.0)
-    async def printer(self):
-        # call the decisions cog check_time method
-        await self.bot.get_cog('Decisions').check_time()
+    async def startup(self):
+        """
+        Resolve the decisions that fell due while the bot was down in one recovery pass, rather
+        than one by one on the first tick, then schedule the rest and run.
+        """
+        await wait_for_warm_up(self.bot)
+        try:
+            self.record_lags(await self.bot.get_cog('Decisions').recover_overdue())
+        except Exception as error:
+            # Whatever was not recovered is still PUBLISHED and gets resolved by the loop
+            print(f'Recovering overdue decisions failed: {error!r}')
+        self.rebuild()
+        await self.run()
 
     @commands.Cog.listener()
     async def on_ready(self):
-        self.printer.start()
+        # on_ready fires again after reconnects, only start up once
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.startup())
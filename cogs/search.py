@@ -0,0 +1,74 @@
+"""
+    A Discord Cog that finds Decisions by the words in them.
+"""
+from discord.ext import commands
+from discord.ext.commands import Context
+
+from model.decision import Decision
+from partitioned_persistence import GuildPartitionedPersistence, GuildStructures
+from search_index import SearchIndex
+from utils.display import DecisionDisplayEmbed, GenericDisplayEmbed
+
+MAX_RESULTS = 10
+
+class Search(commands.Cog):
+    """
+    Holds a SearchIndex per guild, built from state management the first time it is
+    needed and updated as Decisions and their Actions change.
+    params:
+        bot: The bot that uses these commands.
+        state_management: The state management object holding each guild's Decisions.
+    """
+    def __init__(self,
+                 bot: commands.Bot,
+                 state_management: GuildPartitionedPersistence):
+        self.bot = bot
+        self.state_management = state_management
+        # The SearchIndex of each guild
+        self.indexes = GuildStructures(state_management, SearchIndex)
+
+    def index(self, guild_id):
+        """ Return the SearchIndex of a guild, building it if needed. """
+        return self.indexes.get(guild_id)
+
+    def update(self,
+               decision: Decision,
+               guild_id: int = None):
+        """ Take in a new or changed Decision, see GuildStructures.update. """
+        self.indexes.update(decision, guild_id)
+
+    async def warm(self, guild_id):
+        """ Build the SearchIndex of a guild ahead of its first search, see GuildStructures.warm. """
+        await self.indexes.warm(guild_id)
+
+    @commands.command(name='finddecision')
+    async def find_decision(self,
+                            ctx: Context,
+                            *,
+                            terms: str):
+        """
+        List the decisions containing every search term, best match first, and display
+        the one selected.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+            terms: The words to search the titles, bodies and actions of decisions for.
+        """
+        state_management = self.state_management.for_guild(ctx.guild.id)
+        results = []
+        for decision_id, _ in self.index(ctx.guild.id).search(terms, MAX_RESULTS):
+            decision = state_management.get_decision(decision_id)
+            if decision:
+                results.append(decision)
+        if not results:
+            await ctx.send(f'No decisions found for {terms}.')
+            return
+
+        message_str = 'Found Decision(s), which one do you want to view. (c to cancel):'
+        for index, decision in enumerate(results):
+            message_str += f'\n [**{index + 1}**] {str(decision.title)[0:40]} ({decision.state.name.lower()})'
+        await GenericDisplayEmbed('Search Results', message_str, ctx.channel).send_message()
+
+        user_interaction = self.bot.get_cog('UserInteraction')
+        response = await user_interaction.await_response(ctx, [str(v) for v in range(1, len(results) + 1)] + ['c'])
+        if response:
+            await DecisionDisplayEmbed(results[int(response) - 1], ctx.channel, ctx).send_message()
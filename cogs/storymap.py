@@ -0,0 +1,109 @@
+"""
+    A Discord Cog that keeps a map of how the Decisions of each guild's campaign branch.
+"""
+from discord.ext import commands
+from discord.ext.commands import Context
+
+from model.decision import Decision
+from partitioned_persistence import GuildPartitionedPersistence, GuildStructures
+from story_graph import StoryGraph
+from utils.display import MAX_DESCRIPTION_LENGTH, GenericDisplayEmbed
+
+class StoryMap(commands.Cog):
+    """
+    Holds a StoryGraph per guild, built from state management the first time it is needed
+    and updated as Decisions and their Actions change.
+    params:
+        bot: The bot that uses these commands.
+        state_management: The state management object holding each guild's Decisions.
+    """
+    def __init__(self,
+                 bot: commands.Bot,
+                 state_management: GuildPartitionedPersistence):
+        self.bot = bot
+        self.state_management = state_management
+        # The StoryGraph of each guild
+        self.graphs = GuildStructures(state_management, StoryGraph)
+
+    def graph(self, guild_id):
+        """ Return the StoryGraph of a guild, building it if needed. """
+        return self.graphs.get(guild_id)
+
+    def update(self,
+               decision: Decision,
+               guild_id: int = None):
+        """
+        Take in a new or changed Decision. StoryGraphs not built yet will read it from state.
+        params:
+            decision: The new or changed Decision.
+            guild_id: The guild the Decision belongs to, defaults to decision.guild_id.
+        """
+        self.graphs.update(decision, guild_id)
+
+    async def warm(self, guild_id):
+        """
+        Build the StoryGraph of a guild on a worker thread, so startup does not hold up the
+        event loop.
+        params:
+            guild_id: The guild to build the StoryGraph of.
+        """
+        await self.graphs.warm(guild_id)
+
+    @commands.command(name='storymap')
+    async def story_map(self,
+                        ctx: Context):
+        """
+        Display the branches of the campaign from each Decision no Action leads to, along
+        with its dead ends and loops.
+        params:
+            ctx: The Discord context in which the command has been executed within.
+        """
+        graph = self.graph(ctx.guild.id)
+        state_management = self.state_management.for_guild(ctx.guild.id)
+
+        def title(decision_id):
+            decision = state_management.get_decision(decision_id)
+            return str(decision.title)[0:40] if decision else f'missing decision {decision_id}'
+
+        cycles = graph.cycles()
+        dead_ends = graph.dead_ends()
+        message_str = f'{len(graph)} decision(s), {len(dead_ends)} dead end(s), {len(cycles)} loop(s).\n'
+
+        lines = []
+        length = 0
+        shown = set()
+        # Walk depth first with an explicit stack, long arcs would exceed the recursion limit.
+        # Loops no orphan leads into are walked from their first Decision.
+        starts = sorted(graph.orphans(), key=title) + [cycle[0] for cycle in cycles]
+        stack = [(decision_id, 0, '') for decision_id in reversed(starts)]
+        while stack and length < MAX_DESCRIPTION_LENGTH:
+            decision_id, depth, via = stack.pop()
+            if depth == 0 and decision_id in shown:
+                continue
+            line = '\u2003' * depth + via + f'**{title(decision_id)}**'
+            if decision_id in shown:
+                line += ' ↩'
+            elif decision_id in dead_ends:
+                line += ' (dead end)'
+            lines.append(line)
+            length += len(line) + 1
+            if decision_id in shown:
+                continue
+            shown.add(decision_id)
+            decision = state_management.get_decision(decision_id)
+            for action in reversed(decision.actions if decision else []):
+                if action.next_decision_id:
+                    stack.append((action.next_decision_id, depth + 1, f'{action.glyph} → '))
+        if stack and length >= MAX_DESCRIPTION_LENGTH:
+            lines.append('…')
+        message_str += '\n'.join(lines)
+
+        for cycle in cycles:
+            if length >= MAX_DESCRIPTION_LENGTH:
+                break
+            line = '\nLoop: ' + ' → '.join(title(decision_id) for decision_id in cycle)
+            line = line[:MAX_DESCRIPTION_LENGTH - length]
+            message_str += line
+            length += len(line)
+
+        await GenericDisplayEmbed('Story Map', message_str, ctx.channel).send_message()
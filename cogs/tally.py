@@ -0,0 +1,154 @@
+"""
+    A Discord Cog that counts votes on published Decisions as reactions come in.
+"""
+from collections import Counter
+
+import discord
+from discord.ext import commands, tasks
+
+from model.decision import Decision, DecisionState
+from utils.startup import wait_for_warm_up
+
+class Tally(commands.Cog):
+    """
+    Keeps a live vote count per Action of every published Decision, fed by reaction gateway
+    events, so resolution does not need to fetch the message and walk its reactions.
+    Counts are checkpointed to state management periodically.
+    params:
+        bot: The bot whose reaction events are counted.
+    """
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # message id -> decision id, for published decisions only
+        self.messages = {}
+        # decision id -> guild id
+        self.guilds = {}
+        # decision id -> {glyph: action id}
+        self.glyphs = {}
+        # decision id -> Counter of action id -> votes
+        self.votes = {}
+        # Decisions whose every reaction event has been seen by this process. The others
+        # were restored from a checkpoint and may have missed votes while the bot was down.
+        self.live = set()
+        self.dirty = set()
+        # Whether on_ready fired before, it fires again for every new gateway session
+        self.ready = False
+
+    def cog_unload(self):
+        self.checkpoint.cancel()
+
+    def track(self,
+              decision: Decision,
+              live: bool = True):
+        """
+        Start counting votes on a published Decision.
+        params:
+            decision: The published Decision, with its message_id set.
+            live: Whether the count starts from the moment of publication.
+        """
+        self.messages[decision.message_id] = decision.id_
+        self.guilds[decision.id_] = decision.guild_id
+        self.glyphs[decision.id_] = {action.glyph: action.id_ for action in decision.actions}
+        self.votes[decision.id_] = Counter(decision.votes)
+        if live:
+            self.live.add(decision.id_)
+
+    def forget(self,
+               decision: Decision):
+        """ Stop counting votes on a Decision, once it is resolved. """
+        self.messages.pop(decision.message_id, None)
+        for tracked in [self.guilds, self.glyphs, self.votes]:
+            tracked.pop(decision.id_, None)
+        self.live.discard(decision.id_)
+        self.dirty.discard(decision.id_)
+
+    def winner(self,
+               decision: Decision):
+        """
+        Return the Action with the most votes, ties going to the earliest Action, or None
+        when the count is not known to be complete and the message has to be reconciled.
+        """
+        if decision.id_ not in self.live or not decision.actions:
+            return None
+        votes = self.votes[decision.id_]
+        return max(decision.actions, key=lambda action: votes[action.id_])
+
+    def reconcile(self,
+                  decision: Decision,
+                  reactions):
+        """
+        Replace the count of a Decision with the reactions of its fetched message.
+        """
+        glyphs = self.glyphs.get(decision.id_, {})
+        votes = Counter()
+        for reaction in reactions:
+            action_id = glyphs.get(str(reaction.emoji))
+            if action_id:
+                # The bot's own reaction is not a vote
+                votes[action_id] = reaction.count - 1 if reaction.me else reaction.count
+        self.votes[decision.id_] = votes
+        self.live.add(decision.id_)
+        self.dirty.add(decision.id_)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.ready:
+            # Reaction events sent between the sessions were missed, reconcile every count
+            self.live.clear()
+        self.ready = True
+        await wait_for_warm_up(self.bot)
+        decisions = self.bot.get_cog('Decisions')
+        for guild in decisions.guilds_with_state():
+            for decision in decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED):
+                if decision.id_ not in self.votes:
+                    self.track(decision, live=False)
+        if not self.checkpoint.is_running():
+            self.checkpoint.start()
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        self.count(payload, 1)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        self.count(payload, -1)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        decision_id = self.messages.get(payload.message_id)
+        if decision_id is not None:
+            self.votes[decision_id] = Counter()
+            self.dirty.add(decision_id)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(self, payload: discord.RawReactionClearEmojiEvent):
+        decision_id = self.messages.get(payload.message_id)
+        if decision_id is None:
+            return
+        action_id = self.glyphs[decision_id].get(str(payload.emoji))
+        if action_id is not None:
+            self.votes[decision_id].pop(action_id, None)
+            self.dirty.add(decision_id)
+
+    def count(self, payload, change):
+        decision_id = self.messages.get(payload.message_id)
+        if decision_id is None or payload.user_id == self.bot.user.id:
+            return
+        action_id = self.glyphs[decision_id].get(str(payload.emoji))
+        if action_id is None:
+            return
+        self.votes[decision_id][action_id] += change
+        self.dirty.add(decision_id)
+
+    @tasks.loop(seconds=30.0)
+    async def checkpoint(self):
+        """ Persist the counts that changed since the last checkpoint. """
+        decisions = self.bot.get_cog('Decisions')
+        dirty, self.dirty = self.dirty, set()
+        for decision_id in dirty:
+            if decision_id not in self.votes:
+                continue
+            decision = decisions.find_decisions(self.guilds[decision_id], decision_id=decision_id)
+            if decision is not None and decision.state == DecisionState.PUBLISHED:
+                decision.votes = dict(self.votes[decision_id])
+                await decisions.update_decision(decision)
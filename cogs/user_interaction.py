@@ -4,23 +4,41 @@ class UserInteraction(commands.Cog):
     def __init__(self,
                  bot: commands.Bot):
         self.bot = bot
+        # (channel id, author id) -> (future, valid options) of the prompt awaiting that
+        # user's next message in that channel
+        self.waiting = {}
+
+    # Hand each message to the prompt waiting on its channel and author, if any.
+    @commands.Cog.listener()
+    async def on_message(self, msg):
+        waiter = self.waiting.get((msg.channel.id, msg.author.id))
+        if waiter is None:
+            return
+        future, valid_options = waiter
+        # Ensure selection is within the bounds of choice
+        if valid_options and msg.content.lower() not in valid_options:
+            return
+        if not future.done():
+            future.set_result(msg)
 
     # Bot awaits for a response from the user.
     async def await_response(self, ctx, valid_options = [], timeout = 30):
-        # Ensure selection is within the bounds of choice
-        def check(msg):
-            return msg.channel == ctx.channel \
-                and msg.author == ctx.author \
-                and msg.content.lower() in valid_options
+        key = (ctx.channel.id, ctx.author.id)
+        future = asyncio.get_running_loop().create_future()
+        # A new prompt to the same user in the same channel replaces the one before it
+        previous = self.waiting.get(key)
+        if previous and not previous[0].done():
+            previous[0].set_result(None)
+        self.waiting[key] = (future, valid_options)
 
         response = ''
         try:
-            if valid_options:
-                response = await self.bot.wait_for("message", timeout=timeout, check=check)
-            else:
-                response = await self.bot.wait_for("message", timeout=timeout)
+            response = await asyncio.wait_for(future, timeout=timeout)
         except asyncio.TimeoutError:
             response = None
+        finally:
+            if self.waiting.get(key, (None,))[0] is future:
+                del self.waiting[key]
 
         # Display decision
         if response:
@@ -1,70 +1,331 @@
+import itertools
+import json
 import os
+import threading
+import time
 import yaml
+
+from metrics import persistence_bytes, persistence_seconds
+from model.decision import DecisionState
+from model.serialization import decode_decision, decode_legacy_yaml, decode_state, encode_decision, encode_state
+
+# Prefer the libyaml bindings when they are available, they parse an order of magnitude
+# faster than the pure-Python implementation.
+Loader = getattr(yaml, 'CLoader', yaml.Loader)
+
 class file_persistence:
-    def __init__(self):
+    """
+    Persist Decisions to a versioned JSON file and admin settings to a YAML file.
+    params:
+        admin_state_file: The file holding admin settings.
+        decision_state_file: The snapshot file holding all Decisions.
+        legacy_decision_state_file: A decisions.yaml of python-object YAML, migrated to
+            decision_state_file when that does not exist yet.
+        journal: When enabled, single-decision mutations are appended to a journal file next to
+            the snapshot instead of rewriting the whole snapshot.
+        journal_threshold: The journal size in bytes past which it is folded back into the
+            snapshot by a background compaction.
+    """
+    def __init__(self,
+                 admin_state_file='./admin.yaml',
+                 decision_state_file='./decisions.json',
+                 legacy_decision_state_file=None,
+                 journal=True,
+                 journal_threshold=1024 * 1024):
         self.admin_template = "./model/template/admin_template.yaml"
-        self.decision_template = "./model/template/decision_template.yaml"
-        self.admin_state_file = './admin.yaml'
-        self.decision_state_file = './decisions.yaml'
+        self.admin_state_file = admin_state_file
+        self.decision_state_file = decision_state_file
+        self.legacy_decision_state_file = legacy_decision_state_file
+        self.journal = journal
+        self.journal_threshold = journal_threshold
+        self.journal_file = decision_state_file + '.journal'
+        # The journal being folded into the snapshot by a compaction in progress
+        self.compacting_journal_file = decision_state_file + '.journal.compacting'
+        # Resident copy of the decision state and the (mtime, size) of the snapshot it was read from
+        self._decisions = None
+        self._decisions_stamp = None
+        # Indexes over the resident state: id -> list position, id -> indexed state and
+        # DecisionState -> {id: Decision}
+        self._positions = {}
+        self._indexed_states = {}
+        self._by_state = {}
+        # Resident copy of the admin settings, validated the same way
+        self._admin = None
+        self._admin_stamp = None
+        self._lock = threading.RLock()
+        self._compaction = None
         if(not os.path.exists(self.admin_state_file)):
             print(f'Creating file {self.admin_state_file}.')
             self.write_admin_template()
         if(not os.path.exists(self.decision_state_file)):
-            print(f'Creating file {self.decision_state_file}.')
-            self.write_decision_template()
+            if legacy_decision_state_file and os.path.exists(legacy_decision_state_file):
+                print(f'Migrating {legacy_decision_state_file} to {self.decision_state_file}.')
+                self.write_state(self._read_legacy_state())
+            else:
+                print(f'Creating file {self.decision_state_file}.')
+                self.write_state({'decisions': []})
 
-    # Decisions    
+    # Decisions
     def write_state(self, decisions):
-        with open(self.decision_state_file, 'w') as f:
-            f.write(yaml.dump(decisions))
-    
+        """
+        Replace the whole decision state. The snapshot is written atomically and any journal
+        is discarded, since the new snapshot supersedes it.
+        """
+        with self._lock:
+            self._write_snapshot(self._dump_state(decisions))
+            for journal_file in [self.journal_file, self.compacting_journal_file]:
+                if os.path.exists(journal_file):
+                    os.remove(journal_file)
+            self._decisions = decisions
+            self._index()
+
     def get_state(self):
-        with open(self.decision_state_file) as f:
-            decisions = yaml.load(f.read(), Loader=yaml.Loader)
-            return decisions
-    
+        """
+        Return the decision state, served from memory.
+        The snapshot is only re-read (and the journal replayed over it) when its mtime or
+        size changed since it was last loaded or written, so hand edits of the snapshot
+        are still picked up.
+        """
+        with self._lock:
+            stamp = self._file_stamp(self.decision_state_file)
+            if self._decisions is None or stamp != self._decisions_stamp:
+                with persistence_seconds.time(operation='snapshot_read'):
+                    with open(self.decision_state_file, 'rb') as f:
+                        content = f.read()
+                    decisions = decode_state(json.loads(content))
+                persistence_bytes.inc(len(content), operation='snapshot_read')
+                for journal_file in [self.compacting_journal_file, self.journal_file]:
+                    self._replay_journal(journal_file, decisions)
+                self._decisions = decisions
+                self._decisions_stamp = stamp
+                self._index()
+            return self._decisions
+
+    def get_decision(self, id_):
+        """ Return the Decision with this id from the id index, or None. """
+        with self._lock:
+            decisions = self.get_state()
+            position = self._positions.get(id_)
+            return None if position is None else decisions['decisions'][position]
+
+    def get_decisions(self, state: DecisionState):
+        """ Return all Decisions in a state from the per-state index. """
+        with self._lock:
+            self.get_state()
+            return list(self._by_state[state].values())
+
+    def page_decisions(self, state: DecisionState, title_prefix='', offset=0, limit=10):
+        """
+        Return one page of the Decisions in a state whose title starts with a prefix,
+        ignoring case. Only the Decisions up to the end of the page are looked at.
+        """
+        with self._lock:
+            self.get_state()
+            decisions = self._by_state[state].values()
+            if title_prefix:
+                prefix = title_prefix.lower()
+                decisions = (d for d in decisions if str(d.title).lower().startswith(prefix))
+            return list(itertools.islice(decisions, offset, offset + limit))
+
+    def add_decision(self, decision):
+        """ Persist a newly created Decision. """
+        with self._lock:
+            decisions = self.get_state()
+            decisions['decisions'].append(decision)
+            self._index_decision(decision, len(decisions['decisions']) - 1)
+            if self.journal:
+                self._append_journal({'op': 'put', 'decision': decision})
+            else:
+                self.write_state(decisions)
+
     def update_decision(self, decision):
-        decisions = self.get_state()
-        # Find index of object to replace in the list
-        index = -1
-        for i, obj in enumerate(decisions['decisions']):
-            if obj.id_ == decision.id_:
-                index = i
-                break
-
-        if index != -1:
-            # Replace object at the found index
-            decisions['decisions'][index] = decision
-
-            self.write_state(decisions)
-        else:
-            print('Object to replace not found.')
-
-    def write_decision_template(self):
-        with open(self.decision_template) as f:
-            decision = yaml.load(f.read(), Loader=yaml.Loader)
-            print(decision)
-        
-        with open(self.decision_state_file, 'w') as f:
-            print(f'Writing template to state file {self.decision_state_file}, {decision}.')
-            f.write(yaml.dump(decision))
-    
+        with self._lock:
+            decisions = self.get_state()
+            index = self._positions.get(decision.id_)
+
+            if index is not None:
+                # Replace object at the found index and move it to its new state's bucket
+                decisions['decisions'][index] = decision
+                self._index_decision(decision, index)
+
+                if self.journal:
+                    self._append_journal({'op': 'put', 'decision': decision})
+                else:
+                    self.write_state(decisions)
+            else:
+                print('Object to replace not found.')
+
+    def update_decisions(self, decisions):
+        """ Persist changes to several Decisions with one journal append, or one snapshot write. """
+        with self._lock:
+            state = self.get_state()
+            found = []
+            for decision in decisions:
+                index = self._positions.get(decision.id_)
+                if index is None:
+                    print(f'Object to replace not found: {decision.id_}.')
+                    continue
+                state['decisions'][index] = decision
+                self._index_decision(decision, index)
+                found.append(decision)
+            if not found:
+                return
+            if self.journal:
+                self._append_journal(*[{'op': 'put', 'decision': decision} for decision in found])
+            else:
+                self.write_state(state)
+
+    def compact(self):
+        """
+        Fold the journal into a new snapshot.
+        The live journal is set aside under the lock so writes can keep appending to a fresh
+        one while the snapshot is encoded and written. Until the new snapshot is in place the set-aside
+        journal is still replayed on load, so a crash at any point loses nothing.
+        """
+        with self._lock:
+            if os.path.exists(self.compacting_journal_file):
+                # Left behind by a compaction that did not finish, fold everything in one go
+                self.write_state(self.get_state())
+                return
+            if not os.path.exists(self.journal_file):
+                return
+            # Every write so far is in the resident state, later ones go to the fresh journal
+            decisions = list(self.get_state()['decisions'])
+            os.replace(self.journal_file, self.compacting_journal_file)
+        # Encoding the whole campaign takes a while, readers and writers go on meanwhile
+        snapshot = self._dump_state({'decisions': decisions})
+        temp_file = self._write_temp(self.decision_state_file + '.compacting.tmp', snapshot)
+        with self._lock:
+            # A write_state during the compaction already replaced the snapshot and journals
+            if not os.path.exists(self.compacting_journal_file):
+                os.remove(temp_file)
+                return
+            self._replace_snapshot(temp_file)
+            os.remove(self.compacting_journal_file)
+
+    def _index(self):
+        self._positions = {}
+        self._indexed_states = {}
+        self._by_state = {state: {} for state in DecisionState}
+        for position, decision in enumerate(self._decisions['decisions']):
+            self._index_decision(decision, position)
+
+    def _index_decision(self, decision, position):
+        # Decisions are mutated in place before being written, so the state they were
+        # indexed under is tracked separately from decision.state
+        previous_state = self._indexed_states.get(decision.id_)
+        if previous_state is not None and previous_state != decision.state:
+            del self._by_state[previous_state][decision.id_]
+        self._by_state[decision.state][decision.id_] = decision
+        self._indexed_states[decision.id_] = decision.state
+        self._positions[decision.id_] = position
+
+    def _append_journal(self, *records):
+        # One record per line, a record without its newline is a torn write. Several records
+        # are appended with one write and one fsync.
+        lines = ''.join(json.dumps({'op': record['op'], 'decision': encode_decision(record['decision'])},
+                                   separators=(',', ':')) + '\n' for record in records)
+        with persistence_seconds.time(operation='journal_append'):
+            with open(self.journal_file, 'a') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        persistence_bytes.inc(len(lines.encode()), operation='journal_append')
+        if size > self.journal_threshold and (self._compaction is None or not self._compaction.is_alive()):
+            self._compaction = threading.Thread(target=self.compact, name='journal-compaction')
+            self._compaction.start()
+
+    def _replay_journal(self, journal_file, decisions):
+        if not os.path.exists(journal_file):
+            return
+        start = time.perf_counter()
+        with open(journal_file, 'rb') as f:
+            content = f.read()
+        persistence_bytes.inc(len(content), operation='journal_replay')
+        *records, tail = content.split(b'\n')
+        if tail.strip():
+            # Cut the torn record off so later appends start on a record boundary
+            print(f'Dropping incomplete record at the end of {journal_file}.')
+            with open(journal_file, 'r+b') as f:
+                f.truncate(len(content) - len(tail))
+        index = {obj.id_: i for i, obj in enumerate(decisions['decisions'])}
+        for record in records:
+            decision = decode_decision(json.loads(record)['decision'])
+            if decision.id_ in index:
+                decisions['decisions'][index[decision.id_]] = decision
+            else:
+                index[decision.id_] = len(decisions['decisions'])
+                decisions['decisions'].append(decision)
+        persistence_seconds.observe(time.perf_counter() - start, operation='journal_replay')
+
+    def _read_legacy_state(self):
+        """ Read a python-object YAML snapshot and the '...'-terminated journal written with it. """
+        with open(self.legacy_decision_state_file) as f:
+            decisions = decode_legacy_yaml(f.read())
+        legacy_journal_file = self.legacy_decision_state_file + '.journal'
+        if os.path.exists(legacy_journal_file):
+            with open(legacy_journal_file) as f:
+                *records, _ = f.read().split('\n...\n')
+            index = {obj.id_: i for i, obj in enumerate(decisions['decisions'])}
+            for record in records:
+                decision = decode_legacy_yaml(record)['decision']
+                if decision.id_ in index:
+                    decisions['decisions'][index[decision.id_]] = decision
+                else:
+                    index[decision.id_] = len(decisions['decisions'])
+                    decisions['decisions'].append(decision)
+        return decisions
+
+    @staticmethod
+    def _dump_state(decisions):
+        return json.dumps(encode_state(decisions), separators=(',', ':'))
+
+    def _write_snapshot(self, snapshot):
+        # Write next to the snapshot and rename over it, so a crash never leaves it truncated
+        self._replace_snapshot(self._write_temp(self.decision_state_file + '.tmp', snapshot))
+
+    def _replace_snapshot(self, temp_file):
+        os.replace(temp_file, self.decision_state_file)
+        self._decisions_stamp = self._file_stamp(self.decision_state_file)
+
+    @staticmethod
+    def _write_temp(temp_file, content):
+        with persistence_seconds.time(operation='snapshot_write'):
+            with open(temp_file, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        persistence_bytes.inc(size, operation='snapshot_write')
+        return temp_file
+
     def write_admin_state(self, admin):
         with open(self.admin_state_file, 'w') as f:
             print(f'Writing to state file {self.admin_state_file}, {admin}.')
             f.write(yaml.dump(admin))
+        self._admin = admin
+        self._admin_stamp = self._file_stamp(self.admin_state_file)
 
     def get_admin_state(self):
-        with open(self.admin_state_file) as f:
-            admin = yaml.load(f.read(), Loader=yaml.Loader)
-            print(admin)
-            return admin
+        """ Return the admin settings, served from memory unless admin.yaml changed on disk. """
+        stamp = self._file_stamp(self.admin_state_file)
+        if self._admin is None or stamp != self._admin_stamp:
+            with open(self.admin_state_file) as f:
+                self._admin = yaml.load(f.read(), Loader=yaml.Loader)
+            self._admin_stamp = stamp
+        return self._admin
 
     def write_admin_template(self):
         with open(self.admin_template) as f:
             admin = yaml.load(f.read(), Loader=yaml.Loader)
             print(admin)
-        
+
         with open(self.admin_state_file, 'w') as f:
             print(f'Writing template to state file {self.admin_state_file}, {admin}.')
             f.write(yaml.dump(admin))
+
+    @staticmethod
+    def _file_stamp(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
@@ -2,3 +2,14 @@ class GlobalOptions():
 
     def __init__(self):
         self.default_timeout=120
+        # Seconds to hold persistence writes so back-to-back writes are flushed together
+        self.write_flush_delay=0.25
+        # Due decisions resolved at the same time
+        self.resolution_concurrency=10
+        # Decisions listed per page when choosing one
+        self.chooser_page_size=10
+        # Where $profile writes its results, and seconds between its CPU samples
+        self.profile_directory='./profiles'
+        self.profile_sample_interval=0.005
+        # Longest window $profile start can be asked for, in seconds
+        self.profile_max_seconds=600
@@ -0,0 +1,199 @@
+"""
+    Counters and histograms recorded as the bot runs, served in the Prometheus text format.
+"""
+import asyncio
+import bisect
+import contextlib
+import threading
+import time
+
+# Upper bounds in seconds, for latencies from a dictionary lookup to a slow Discord round-trip
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds in seconds for how late a resolution is
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+def _label_text(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Counter():
+    """
+    A count that only goes up, one per combination of label values.
+    params:
+        name: The metric name.
+        documentation: What is counted, the HELP line.
+        labelnames: The names of the labels each count is kept by.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # label values -> count
+        self.values = {}
+        # The persistence compaction thread records too
+        self._lock = threading.Lock()
+
+    def inc(self, amount = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in sorted(self.values.items())]
+
+class Histogram():
+    """
+    Observations counted into cumulative buckets, with their sum and count, per combination
+    of label values.
+    params:
+        name: The metric name.
+        documentation: What is observed, the HELP line.
+        labelnames: The names of the labels observations are kept by.
+        buckets: The upper bounds of the buckets, in increasing order.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames = (), buckets = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts (the last one for +Inf), sum, count]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """ Observe the seconds the body of a with block takes. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels):
+        """ Return (count, sum, estimated 95th percentile) of the observations with these labels. """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                return 0, 0.0, None
+            counts, total, count = list(entry[0]), entry[1], entry[2]
+        target = 0.95 * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return count, total, bound
+        return count, total, float('inf')
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(entry[0]), entry[1], entry[2]) for key, entry in self.values.items())
+        samples = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + '_bucket', key, (('le', '+Inf' if bound == float('inf') else repr(bound)),),
+                                cumulative))
+            samples.append((self.name + '_sum', key, (), total))
+            samples.append((self.name + '_count', key, (), count))
+        return samples
+
+class MetricsRegistry():
+    """
+    Holds every metric by name and renders them for scraping.
+    """
+    def __init__(self):
+        # name -> Counter or Histogram
+        self.metrics = {}
+
+    def counter(self, name, documentation, labelnames = ()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames = (), buckets = DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """ Return every metric in the Prometheus text exposition format. """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, key, extra, value in metric.samples():
+                lines.append(f'{name}{_label_text(metric.labelnames, key, extra)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    async def serve(self, host = '127.0.0.1', port = 9108):
+        """
+        Serve render() over HTTP at /metrics on a local port, for Prometheus to scrape.
+        returns: The asyncio server, already serving.
+        """
+        async def handle(reader, writer):
+            try:
+                request_line = await reader.readline()
+                # Skip the headers
+                while (await reader.readline()).strip():
+                    pass
+                parts = request_line.decode('latin-1').split()
+                if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                    status, body = '200 OK', self.render().encode()
+                else:
+                    status, body = '404 Not Found', b'Not found\n'
+                writer.write(f'HTTP/1.1 {status}\r\n'
+                             f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: close\r\n\r\n'.encode() + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+        return await asyncio.start_server(handle, host, port)
+
+registry = MetricsRegistry()
+
+command_seconds = registry.histogram(
+    'cyoa_command_seconds', 'Time from a command being invoked to it completing or failing.',
+    ['command', 'outcome'])
+persistence_seconds = registry.histogram(
+    'cyoa_persistence_seconds', 'Time spent reading and writing decision state files.', ['operation'])
+persistence_bytes = registry.counter(
+    'cyoa_persistence_bytes_total', 'Bytes read from and written to decision state files.', ['operation'])
+scheduler_tick_seconds = registry.histogram(
+    'cyoa_scheduler_tick_seconds', 'Time the scheduler takes to find and resolve the decisions that are due.')
+resolution_lag_seconds = registry.histogram(
+    'cyoa_resolution_lag_seconds', 'How long after its resolve time a decision got resolved.', buckets=LAG_BUCKETS)
+recovery_seconds = registry.histogram(
+    'cyoa_recovery_seconds', 'Time the startup pass takes to resolve the decisions that fell due while the bot was down.')
+recovered_decisions = registry.counter(
+    'cyoa_recovered_decisions_total', 'Decisions resolved by the startup recovery pass.')
+outbound_messages = registry.counter(
+    'cyoa_outbound_messages_total', 'Messages sent by the outbound dispatcher.', ['priority'])
+outbound_embeds = registry.counter(
+    'cyoa_outbound_embeds_total', 'Embeds sent by the outbound dispatcher, several can share a message.', ['priority'])
+outbound_rate_limits = registry.counter(
+    'cyoa_outbound_rate_limits_total', 'Requests the outbound dispatcher retried after a 429.')
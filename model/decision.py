@@ -4,6 +4,10 @@
 from enum import Enum
 import shortuuid
 
+def new_id():
+    """ Generate the UUID of a new Decision or Action """
+    return str(shortuuid.ShortUUID().random(length=22))
+
 class DecisionState(Enum):
     """
         The different states of a Decision
@@ -18,65 +22,78 @@ class DecisionState(Enum):
 class Decision:
     """
         Simple object model for a Decision
+        The version is bumped every time a changed Decision is written by this process. It
+        restarts at 0 whenever a Decision is read back from state management.
         params:
             body: The body text of a Decision; flavour text
             actions: An array of Action objects
             id_: The UUID of the Decision
     """
+    __slots__ = ('id_', 'title', 'body', 'actions', 'voted_action', 'state', 'publish_time',
+                 'resolve_time', 'guild_id', 'message_id', 'votes', 'version')
 
     def __init__(
             self,
             title,
             body,
-            actions = [],
-            id_ = str(shortuuid.ShortUUID().random(length=22))
+            actions = None,
+            id_ = None
         ):
         self.id_ = id_
         if self.id_ is None:
-            self.id_ = str(shortuuid.ShortUUID().random(length=22))
+            self.id_ = new_id()
         self.title = title
         self.body = body
-        self.actions = actions
+        self.actions = actions if actions is not None else []
         self.voted_action = None
         self.state = DecisionState.PREPARATION
         self.publish_time = None
         self.resolve_time = None
-        self.guild_id = None 
+        self.guild_id = None
         self.message_id = None
+        # Votes per Action id, as last checkpointed while the Decision was published
+        self.votes = {}
+        self.version = 0
+
+    def get_next_decision_ids(self):
+        """
+            Return the ids of all the next Decisions associated with this Decisions actions
+        """
+        return [action.next_decision_id for action in self.actions if action.next_decision_id is not None]
 
-    def get_next_decisions(self):
+    def get_next_decisions(self, find_decision):
         """
             Return all the next Decisions associated with this Decisions actions
+            params:
+                find_decision: Called with a Decision id, returns the Decision from the store
         """
-        next_decisions = []
-        for action in self.actions:
-            if action.next_decision is not None:
-                next_decisions.append(action.next_decision)
-        return next_decisions
+        return [find_decision(id_) for id_ in self.get_next_decision_ids()]
 
 class Action:
     """
         Simple object model for an Action
+        Actions refer to Decisions by id, the Decisions themselves are looked up in the store.
         params:
             glyph: The emoji representing the Action
             description: The description of the Action/emoji
-            next_decision: The next Decision associated to this Action
+            next_decision_id: The id of the next Decision associated to this Action
+            previous_decision_id: The id of the Decision this Action belongs to
             id_: The UUID of the Action
     """
+    __slots__ = ('id_', 'glyph', 'description', 'next_decision_id', 'previous_decision_id')
 
     def __init__(
             self,
             glyph,
             description,
-            next_decision = None,
-            previous_decision = None,
+            next_decision_id = None,
+            previous_decision_id = None,
             id_ = None
         ):
         self.id_ = id_
         if self.id_ is None:
-            self.id_ = str(shortuuid.ShortUUID().random(length=22))
+            self.id_ = new_id()
         self.glyph = glyph
         self.description = description
-        self.next_decision = next_decision
-        self.previous_decision = previous_decision
-    
\ No newline at end of file
+        self.next_decision_id = next_decision_id
+        self.previous_decision_id = previous_decision_id
@@ -0,0 +1,136 @@
+"""
+    Versioned encoding of Decisions and Actions to plain dicts, for JSON storage.
+    Objects refer to each other by id, so encoded decisions never carry references.
+"""
+import datetime
+
+import yaml
+
+from model.decision import Action, Decision, DecisionState
+
+FORMAT_VERSION = 1
+
+def encode_state(state):
+    """ Encode a {'decisions': [...]} state dict. """
+    return {
+        'version': FORMAT_VERSION,
+        'decisions': [encode_decision(decision) for decision in state['decisions']]
+    }
+
+def decode_state(data):
+    """ Decode an encoded state into a {'decisions': [...]} state dict. """
+    version = data.get('version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported decision state format version {version}.')
+    return {'decisions': [decode_decision(decision) for decision in data['decisions']]}
+
+def encode_decision(decision: Decision):
+    return {
+        'id': decision.id_,
+        'title': decision.title,
+        'body': decision.body,
+        'state': encode_decision_state(decision.state),
+        'actions': [encode_action(action) for action in decision.actions],
+        'voted_action': decision.voted_action.id_ if decision.voted_action else None,
+        'publish_time': _encode_time(decision.publish_time),
+        'resolve_time': _encode_time(decision.resolve_time),
+        'guild_id': decision.guild_id,
+        'message_id': decision.message_id,
+        # A copy, compaction encodes on a worker thread while votes may be checkpointed
+        'votes': dict(decision.votes)
+    }
+
+def decode_decision(data):
+    decision = Decision(data['title'], data['body'], actions=[], id_=data['id'])
+    decision.state = decode_decision_state(data['state'])
+    decision.actions = [decode_action(action, decision) for action in data['actions']]
+    decision.voted_action = next((x for x in decision.actions if x.id_ == data['voted_action']), None)
+    decision.publish_time = data['publish_time']
+    decision.resolve_time = _decode_time(data['resolve_time'])
+    decision.guild_id = data['guild_id']
+    decision.message_id = data['message_id']
+    decision.votes = data.get('votes') or {}
+    return decision
+
+def encode_action(action: Action):
+    return {
+        'id': action.id_,
+        'glyph': action.glyph,
+        'description': action.description,
+        'next_decision': action.next_decision_id
+    }
+
+def decode_action(data, decision: Decision):
+    return Action(data['glyph'],
+                  data['description'],
+                  next_decision_id=data['next_decision'],
+                  previous_decision_id=decision.id_,
+                  id_=data['id'])
+
+def encode_decision_state(state: DecisionState):
+    return state.name
+
+def decode_decision_state(name):
+    return DecisionState[name]
+
+def _encode_time(value):
+    return str(value) if value is not None else None
+
+def _decode_time(value):
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+class LegacyLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """
+    Reads the python-object YAML decisions used to be stored as, without constructing
+    arbitrary python objects: objects become plain dicts of their attributes.
+    """
+
+def _construct_legacy_object(loader, suffix, node):
+    # Yield the dict before filling it in, so anchors referring back to it resolve
+    data = {}
+    yield data
+    data.update(loader.construct_mapping(node))
+
+def _construct_legacy_decision_state(loader, node):
+    return DecisionState(*loader.construct_sequence(node))
+
+LegacyLoader.add_multi_constructor('tag:yaml.org,2002:python/object:', _construct_legacy_object)
+LegacyLoader.add_constructor('tag:yaml.org,2002:python/object/apply:model.decision.DecisionState',
+                             _construct_legacy_decision_state)
+
+def decode_legacy_yaml(text):
+    """
+    Decode one python-object YAML document into the objects it held, with Decisions and
+    Actions converted to the current models.
+    """
+    return _from_legacy(yaml.load(text, Loader=LegacyLoader))
+
+def _from_legacy(data):
+    if isinstance(data, dict) and 'actions' in data and 'body' in data:
+        return _legacy_decision(data)
+    if isinstance(data, dict):
+        return {key: _from_legacy(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_from_legacy(value) for value in data]
+    return data
+
+def _legacy_decision(data):
+    decision = Decision(data['title'], data['body'], id_=data['id_'])
+    for action in data['actions']:
+        next_decision = action.get('next_decision')
+        decision.actions.append(Action(action['glyph'],
+                                       action['description'],
+                                       next_decision_id=next_decision['id_'] if next_decision else None,
+                                       previous_decision_id=decision.id_,
+                                       id_=action['id_']))
+    voted_action = data.get('voted_action')
+    if voted_action:
+        decision.voted_action = next((x for x in decision.actions if x.id_ == voted_action['id_']), None)
+    decision.state = data['state']
+    decision.publish_time = data.get('publish_time')
+    resolve_time = data.get('resolve_time')
+    decision.resolve_time = _decode_time(str(resolve_time)) if resolve_time is not None else None
+    decision.guild_id = data.get('guild_id')
+    decision.message_id = data.get('message_id')
+    decision.votes = data.get('votes') or {}
+    return decision
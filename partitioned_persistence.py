@@ -0,0 +1,119 @@
+"""
+    Keep the state of every guild in its own persistence backend.
+"""
+import asyncio
+
+class GuildPartitionedPersistence:
+    """
+    Routes state management to a separate backend per guild id, so each guild has its own
+    admin settings and decisions, and one guild's traffic never touches another's files.
+    Backends are opened on first use.
+    params:
+        open_partition: Called with a guild id, returns the backend holding that guild's state.
+        existing_partitions: Called without arguments, returns the ids of the guilds whose
+            state already exists without opening it. Defaults to none beyond the opened ones.
+    """
+    def __init__(self, open_partition, existing_partitions=None):
+        self.open_partition = open_partition
+        self.existing_partitions = existing_partitions
+        # guild id -> backend
+        self.partitions = {}
+
+    def for_guild(self, guild_id):
+        """ Return the backend of a guild, opening it if needed. """
+        partition = self.partitions.get(guild_id)
+        if partition is None:
+            partition = self.partitions[guild_id] = self.open_partition(guild_id)
+        return partition
+
+    def guild_ids(self):
+        """
+        Return the ids of the guilds that have state, opened or not, without opening or
+        creating any. Guilds that never used a command have none.
+        """
+        guild_ids = set(self.partitions)
+        if self.existing_partitions:
+            guild_ids.update(self.existing_partitions())
+        return guild_ids
+
+    async def preload(self, guild_ids):
+        """
+        Open the backends of several guilds and read their state into memory, each on a
+        worker thread, so startup overlaps the reads with each other and with logging in.
+        A guild opened by for_guild in the meantime keeps that backend.
+        params:
+            guild_ids: The guilds to open.
+        """
+        def load(guild_id):
+            partition = self.open_partition(guild_id)
+            partition.get_state()
+            return partition
+        guild_ids = [guild_id for guild_id in guild_ids if guild_id not in self.partitions]
+        partitions = await asyncio.gather(*(asyncio.to_thread(load, guild_id) for guild_id in guild_ids))
+        for guild_id, partition in zip(guild_ids, partitions):
+            self.partitions.setdefault(guild_id, partition)
+
+    def flush(self):
+        """ Flush every opened partition that holds back writes. """
+        for partition in self.partitions.values():
+            if hasattr(partition, 'flush'):
+                partition.flush()
+
+class GuildStructures:
+    """
+    Keeps a structure built from each guild's Decisions, such as a StoryGraph or a
+    SearchIndex. It is built from state management the first time it is needed, or ahead
+    of time by warm(), and updated as Decisions change.
+    params:
+        state_management: The GuildPartitionedPersistence holding each guild's Decisions.
+        build: Called with a list of Decisions, returns the structure, which takes in
+            changed Decisions through its update(decision) method.
+    """
+    def __init__(self, state_management, build):
+        self.state_management = state_management
+        self.build = build
+        # guild id -> structure
+        self.built = {}
+        # guild id -> Decisions changed while its structure is being built by warm()
+        self.building = {}
+
+    def get(self, guild_id):
+        """ Return the structure of a guild, building it if needed. """
+        structure = self.built.get(guild_id)
+        if structure is None:
+            decisions = self.state_management.for_guild(guild_id).get_state()['decisions']
+            structure = self.built[guild_id] = self.build(decisions)
+        return structure
+
+    def update(self, decision, guild_id=None):
+        """
+        Take in a new or changed Decision. Structures not built yet will read it from state.
+        params:
+            decision: The new or changed Decision.
+            guild_id: The guild the Decision belongs to, defaults to decision.guild_id.
+        """
+        guild_id = guild_id or decision.guild_id
+        structure = self.built.get(guild_id)
+        if structure is not None:
+            structure.update(decision)
+        elif guild_id in self.building:
+            self.building[guild_id].append(decision)
+
+    async def warm(self, guild_id):
+        """
+        Build the structure of a guild on a worker thread, so startup does not hold up the
+        event loop. Decisions changed in the meantime are applied once it is built.
+        params:
+            guild_id: The guild to build the structure of.
+        """
+        if guild_id in self.built or guild_id in self.building:
+            return
+        self.building[guild_id] = []
+        try:
+            decisions = list(self.state_management.for_guild(guild_id).get_state()['decisions'])
+            structure = await asyncio.to_thread(self.build, decisions)
+            for decision in self.building[guild_id]:
+                structure.update(decision)
+            self.built.setdefault(guild_id, structure)
+        finally:
+            del self.building[guild_id]
@@ -0,0 +1,145 @@
+"""
+    On-demand CPU sampling and memory tracing of the running bot.
+"""
+import collections
+import datetime
+import os
+import sys
+import threading
+import tracemalloc
+
+# Leaf functions that mean the event loop is waiting for I/O, not running code
+IDLE_FUNCTIONS = {'select'}
+
+def _label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+class SamplingProfiler():
+    """
+    Samples the stack of one thread from a background thread at a fixed interval. Nothing
+    runs in the profiled thread, so its cost is the sampler thread taking the GIL briefly.
+    params:
+        thread_id: The thread to sample, the calling thread by default.
+        interval: Seconds between samples.
+    """
+    def __init__(self, thread_id = None, interval = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        # code object -> samples with it at the top of the stack
+        self.self_samples = collections.Counter()
+        # code object -> samples with it anywhere on the stack
+        self.total_samples = collections.Counter()
+        # stack of code objects, outermost first -> samples
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self.samples += 1
+            if codes[0].co_name in IDLE_FUNCTIONS:
+                self.idle_samples += 1
+                continue
+            self.self_samples[codes[0]] += 1
+            for code in set(codes):
+                self.total_samples[code] += 1
+            self.stacks[tuple(codes[::-1])] += 1
+
+    def hottest(self, count):
+        """ Return (self samples, total samples, label) of the functions most often running. """
+        return [(samples, self.total_samples[code], _label(code))
+                for code, samples in self.self_samples.most_common(count)]
+
+    def folded(self):
+        """ Return the samples as folded stacks, one 'outer;...;inner count' line each, for flame graphs. """
+        return [';'.join(_label(code) for code in stack) + f' {samples}' for stack, samples in self.stacks.most_common()]
+
+class ProfileSession():
+    """
+    CPU sampling plus tracemalloc snapshots over a window, started and stopped on demand.
+    params:
+        interval: Seconds between CPU samples.
+        frames: Stack frames tracemalloc keeps per allocation.
+    """
+    def __init__(self, interval = 0.005, frames = 1):
+        self.sampler = SamplingProfiler(interval=interval)
+        self.frames = frames
+        self.started_at = None
+        self.stopped_at = None
+        self.allocations = []
+        self._traced_before = False
+        self._start_snapshot = None
+
+    def start(self):
+        self.started_at = datetime.datetime.now()
+        self._traced_before = tracemalloc.is_tracing()
+        if not self._traced_before:
+            tracemalloc.start(self.frames)
+        self._start_snapshot = self._snapshot()
+        self.sampler.start()
+
+    def stop(self):
+        """ Stop sampling and tracing and keep the allocation growth since start, largest first. """
+        self.sampler.stop()
+        snapshot = self._snapshot()
+        if not self._traced_before:
+            tracemalloc.stop()
+        self.stopped_at = datetime.datetime.now()
+        self.allocations = [stat for stat in snapshot.compare_to(self._start_snapshot, 'lineno') if stat.size_diff > 0]
+        self._start_snapshot = None
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def summary(self, count = 10):
+        """ Return a text summary of the hottest functions and the biggest allocation sites. """
+        sampler = self.sampler
+        seconds = (self.stopped_at - self.started_at).total_seconds()
+        busy = sampler.samples - sampler.idle_samples
+        lines = [f'{seconds:.1f}s, {sampler.samples} samples, '
+                 f'busy {busy / sampler.samples:.0%}' if sampler.samples else f'{seconds:.1f}s, no samples',
+                 '', f'Hottest functions (self / total samples of {busy} busy):']
+        for self_samples, total_samples, label in sampler.hottest(count):
+            lines.append(f'{self_samples:>6} {total_samples:>6}  {label}')
+        lines += ['', 'Biggest allocation sites (growth, blocks):']
+        for stat in self.allocations[:count]:
+            frame = stat.traceback[0]
+            lines.append(f'{stat.size_diff / 1024:>8.1f} KiB {stat.count_diff:>+7}  '
+                         f'{os.path.basename(frame.filename)}:{frame.lineno}')
+        return '\n'.join(lines)
+
+    def write(self, directory, count = 50):
+        """
+        Write the summary and the folded stacks to files named after the start time.
+        returns: The paths of the summary and folded stacks files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, 'profile-' + self.started_at.strftime('%Y%m%d-%H%M%S'))
+        with open(base + '.txt', 'w') as f:
+            f.write(self.summary(count) + '\n')
+        with open(base + '.folded', 'w') as f:
+            f.write('\n'.join(self.sampler.folded()) + '\n')
+        return base + '.txt', base + '.folded'
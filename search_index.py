@@ -0,0 +1,108 @@
+"""
+    Full-text index of the Decisions of a campaign.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+
+# Title words count for this many body words
+TITLE_WEIGHT = 3
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+WORD = re.compile(r'\w+')
+
+def tokenize(text):
+    """ Split text into lowercase words. """
+    return WORD.findall(str(text or '').lower())
+
+class SearchIndex:
+    """
+    An inverted index over the title, body and action descriptions of Decisions, kept up
+    to date one Decision at a time. Searches return the Decisions containing every term,
+    ranked by BM25 with title words weighted up.
+    """
+    def __init__(self, decisions=()):
+        # term -> {decision id: weighted term frequency}
+        self.postings = {}
+        # decision id -> Counter of weighted term frequencies, to take a Decision out again
+        self.terms = {}
+        # decision id -> weighted number of words
+        self.lengths = {}
+        self.total_length = 0
+        for decision in decisions:
+            self.update(decision)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def update(self, decision):
+        """ Index a new Decision or re-index a changed one. """
+        terms = Counter(tokenize(' '.join([str(decision.body)] + [str(action.description) for action in decision.actions])))
+        for term in tokenize(decision.title):
+            terms[term] += TITLE_WEIGHT
+        if self.terms.get(decision.id_) == terms:
+            return
+        self.remove(decision.id_)
+        id_ = decision.id_
+        postings = self.postings
+        for term, frequency in terms.items():
+            term_postings = postings.get(term)
+            if term_postings is None:
+                postings[term] = {id_: frequency}
+            else:
+                term_postings[id_] = frequency
+        self.terms[decision.id_] = terms
+        self.lengths[decision.id_] = sum(terms.values())
+        self.total_length += self.lengths[decision.id_]
+
+    def remove(self, decision_id):
+        """ Take a Decision out of the index. """
+        terms = self.terms.pop(decision_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[decision_id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(decision_id)
+
+    def search(self, query, limit=10):
+        """
+        Return (decision id, score) of the best matches for a query, best first.
+        params:
+            query: Words that must all appear in a Decision.
+            limit: The number of results to return.
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.terms:
+            return []
+        postings = [self.postings.get(term) for term in query_terms]
+        if not all(postings):
+            return []
+        # Intersect starting from the rarest term, so common terms cost little
+        postings.sort(key=len)
+        candidates = list(postings[0])
+        for term_postings in postings[1:]:
+            candidates = [decision_id for decision_id in candidates if decision_id in term_postings]
+            if not candidates:
+                return []
+
+        count = len(self.terms)
+        average_length = self.total_length / count
+        weights = [(term_postings, math.log(1 + (count - len(term_postings) + 0.5) / (len(term_postings) + 0.5)))
+                   for term_postings in postings]
+
+        lengths = self.lengths
+        scores = []
+        for decision_id in candidates:
+            length_norm = K1 * (1 - B + B * lengths[decision_id] / average_length)
+            score = 0.0
+            for term_postings, idf in weights:
+                frequency = term_postings[decision_id]
+                score += idf * frequency * (K1 + 1) / (frequency + length_norm)
+            scores.append((score, decision_id))
+        return [(decision_id, score) for score, decision_id in heapq.nlargest(limit, scores)]
@@ -0,0 +1,236 @@
+"""
+    Persist Decisions and admin settings to a SQLite database.
+"""
+import datetime
+import json
+import sqlite3
+import sys
+
+import yaml
+
+from model.decision import Action, Decision, DecisionState
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id_ TEXT PRIMARY KEY,
+    title TEXT,
+    body TEXT,
+    state INTEGER NOT NULL,
+    publish_time TEXT,
+    resolve_time TEXT,
+    guild_id INTEGER,
+    message_id INTEGER,
+    voted_action_id TEXT,
+    votes TEXT
+);
+CREATE INDEX IF NOT EXISTS decisions_state ON decisions (state);
+CREATE INDEX IF NOT EXISTS decisions_resolve_time ON decisions (resolve_time);
+CREATE TABLE IF NOT EXISTS actions (
+    id_ TEXT PRIMARY KEY,
+    decision_id TEXT NOT NULL REFERENCES decisions (id_) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    glyph TEXT,
+    description TEXT,
+    next_decision_id TEXT
+);
+CREATE INDEX IF NOT EXISTS actions_decision_id ON actions (decision_id, position);
+CREATE TABLE IF NOT EXISTS admin (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DECISION_COLUMNS = 'id_, title, body, state, publish_time, resolve_time, guild_id, message_id, voted_action_id, votes'
+
+class SqlitePersistence:
+    """
+    A persistence backend storing Decisions and Actions as rows, offering the same surface
+    as file_persistence. id_ is the primary key of both tables, decisions are also indexed
+    on state and resolve_time.
+    params:
+        database_file: The SQLite database file.
+    """
+    def __init__(self, database_file='./cyoa.db'):
+        self.admin_template = "./model/template/admin_template.yaml"
+        self.database_file = database_file
+        # Startup opens the database on a worker thread, it is only used from the event loop after
+        self.connection = sqlite3.connect(database_file, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(decisions)')]
+        if 'votes' not in columns:
+            self.connection.execute('ALTER TABLE decisions ADD COLUMN votes TEXT')
+        if self.connection.execute("SELECT 1 FROM admin WHERE key = 'admin'").fetchone() is None:
+            print(f'Writing admin template to {self.database_file}.')
+            with open(self.admin_template) as f:
+                self.write_admin_state(yaml.safe_load(f.read()))
+
+    # Decisions
+    def write_state(self, decisions):
+        with self.connection:
+            self.connection.execute('DELETE FROM decisions')
+            for decision in decisions['decisions']:
+                self._insert_decision(decision)
+
+    def get_state(self):
+        return {'decisions': self._select_decisions('', ())}
+
+    def get_decisions(self, state: DecisionState):
+        """ Return all Decisions in a state, using the index on state. """
+        return self._select_decisions('WHERE decisions.state = ?', (state.value,))
+
+    def page_decisions(self, state: DecisionState, title_prefix='', offset=0, limit=10):
+        """
+        Return one page of the Decisions in a state whose title starts with a prefix,
+        ignoring case. Only the Decisions of the page are built.
+        """
+        # Escape LIKE wildcards, so the prefix matches literally
+        pattern = title_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        ids = [row[0] for row in self.connection.execute(
+            "SELECT id_ FROM decisions WHERE state = ? AND title LIKE ? ESCAPE '\\' "
+            'ORDER BY rowid LIMIT ? OFFSET ?',
+            (state.value, pattern, limit, offset))]
+        if not ids:
+            return []
+        return self._select_decisions(f'WHERE decisions.id_ IN ({", ".join("?" * len(ids))})', ids)
+
+    def get_decision(self, id_):
+        """ Return the Decision with this id, or None. """
+        decisions = self._select_decisions('WHERE decisions.id_ = ?', (id_,))
+        return decisions[0] if decisions else None
+
+    def add_decision(self, decision):
+        with self.connection:
+            self._insert_decision(decision)
+
+    def update_decision(self, decision):
+        with self.connection:
+            found = self.connection.execute('SELECT 1 FROM decisions WHERE id_ = ?', (decision.id_,)).fetchone()
+            if found:
+                self._insert_decision(decision)
+            else:
+                print('Object to replace not found.')
+
+    def update_decisions(self, decisions):
+        """ Persist changes to several Decisions in one transaction. """
+        with self.connection:
+            for decision in decisions:
+                found = self.connection.execute('SELECT 1 FROM decisions WHERE id_ = ?', (decision.id_,)).fetchone()
+                if found:
+                    self._insert_decision(decision)
+                else:
+                    print(f'Object to replace not found: {decision.id_}.')
+
+    # Admin
+    def write_admin_state(self, admin):
+        print(f'Writing admin state to {self.database_file}, {admin}.')
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO admin (key, value) VALUES ('admin', ?)",
+                                    (yaml.dump(admin),))
+
+    def get_admin_state(self):
+        row = self.connection.execute("SELECT value FROM admin WHERE key = 'admin'").fetchone()
+        return yaml.safe_load(row[0])
+
+    def _insert_decision(self, decision):
+        # Upsert rather than replace, so the rowid (and with it the decision order) is kept
+        self.connection.execute(
+            f'INSERT INTO decisions ({DECISION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (id_) DO UPDATE SET title = excluded.title, body = excluded.body, '
+            'state = excluded.state, publish_time = excluded.publish_time, '
+            'resolve_time = excluded.resolve_time, guild_id = excluded.guild_id, '
+            'message_id = excluded.message_id, voted_action_id = excluded.voted_action_id, '
+            'votes = excluded.votes',
+            (decision.id_,
+             decision.title,
+             decision.body,
+             decision.state.value,
+             _to_text(decision.publish_time),
+             _to_text(decision.resolve_time),
+             decision.guild_id,
+             decision.message_id,
+             decision.voted_action.id_ if decision.voted_action else None,
+             json.dumps(decision.votes)))
+        self.connection.execute('DELETE FROM actions WHERE decision_id = ?', (decision.id_,))
+        self.connection.executemany(
+            'INSERT INTO actions (id_, decision_id, position, glyph, description, next_decision_id) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(action.id_,
+              decision.id_,
+              position,
+              action.glyph,
+              action.description,
+              action.next_decision_id)
+             for position, action in enumerate(decision.actions)])
+
+    def _select_decisions(self, where, params):
+        """ Build Decision objects for the rows matching a WHERE clause. """
+        rows = self.connection.execute(
+            f'SELECT {DECISION_COLUMNS} FROM decisions {where} ORDER BY rowid', params).fetchall()
+        decisions = {}
+        voted_action_ids = {}
+        for id_, title, body, state, publish_time, resolve_time, guild_id, message_id, voted_action_id, votes in rows:
+            decision = Decision(title, body, actions=[], id_=id_)
+            decision.state = DecisionState(state)
+            decision.publish_time = publish_time
+            decision.resolve_time = _to_datetime(resolve_time)
+            decision.guild_id = guild_id
+            decision.message_id = message_id
+            decision.votes = json.loads(votes) if votes else {}
+            decisions[id_] = decision
+            voted_action_ids[id_] = voted_action_id
+        if not decisions:
+            return []
+
+        if where:
+            actions = self.connection.execute(
+                'SELECT a.decision_id, a.id_, a.glyph, a.description, a.next_decision_id FROM actions a '
+                f'JOIN decisions ON decisions.id_ = a.decision_id {where} ORDER BY a.decision_id, a.position',
+                params)
+        else:
+            actions = self.connection.execute(
+                'SELECT decision_id, id_, glyph, description, next_decision_id FROM actions '
+                'ORDER BY decision_id, position')
+        for decision_id, id_, glyph, description, next_decision_id in actions:
+            decision = decisions[decision_id]
+            action = Action(glyph,
+                            description,
+                            next_decision_id=next_decision_id,
+                            previous_decision_id=decision_id,
+                            id_=id_)
+            decision.actions.append(action)
+            if id_ == voted_action_ids[decision_id]:
+                decision.voted_action = action
+        return list(decisions.values())
+
+def _to_text(value):
+    return str(value) if value is not None else None
+
+def _to_datetime(value):
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+def migrate_from_files(admin_state_file='./admin.yaml',
+                       decision_state_file='./decisions.json',
+                       legacy_decision_state_file='./decisions.yaml',
+                       database_file='./cyoa.db'):
+    """
+    One-shot copy of the file_persistence state files into a SQLite database.
+    params:
+        admin_state_file: The admin settings YAML file to read.
+        decision_state_file: The decisions JSON file (and its journal) to read.
+        legacy_decision_state_file: The decisions YAML file to read if there is no JSON file yet.
+        database_file: The SQLite database to write, existing Decisions in it are replaced.
+    """
+    from file_persistence import file_persistence
+    source = file_persistence(admin_state_file, decision_state_file, legacy_decision_state_file)
+    destination = SqlitePersistence(database_file)
+    decisions = source.get_state()
+    destination.write_state(decisions)
+    destination.write_admin_state(source.get_admin_state())
+    print(f"Migrated {len(decisions['decisions'])} decision(s) to {database_file}.")
+
+if __name__ == '__main__':
+    # python sqlite_persistence.py [admin.yaml] [decisions.json] [decisions.yaml] [cyoa.db]
+    migrate_from_files(*sys.argv[1:])
@@ -0,0 +1,306 @@
+"""
+    Index of the branches between the Decisions of a campaign.
+"""
+from collections import deque
+
+class StoryGraph:
+    """
+    Adjacency lists by Decision id, in both directions, kept up to date one Decision at a
+    time so that reachability questions do not have to walk the Decisions themselves.
+    Decisions no Action leads to (orphans) and Decisions without a next Decision (dead
+    ends) are maintained as sets. Loops are found on demand along with a topological rank
+    of every Decision, both are kept as long as changes do not contradict the ranks, which
+    is the case for every link to a Decision further down the story.
+    """
+    def __init__(self, decisions=()):
+        # decision id -> ids of the next decisions, in action order
+        self.children = {}
+        # decision id -> ids of the decisions with an action leading to it
+        self.parents = {}
+        self.roots = set()
+        self.leaves = set()
+        self._cycles = None
+        # decision id -> rank, actions only lead to Decisions of a lower rank or, within a
+        # loop, the same rank. None when the ranks have to be recomputed.
+        self._rank = None
+        self._top = 0
+        self._bottom = 0
+        # decision id -> the ids of the Decisions in the same loop, for loops only
+        self._loops = {}
+        for decision in decisions:
+            self.update(decision)
+
+    def __len__(self):
+        return len(self.children)
+
+    def __contains__(self, decision_id):
+        return decision_id in self.children
+
+    def update(self, decision):
+        """ Add a Decision or take in the changes to its actions. """
+        id_ = decision.id_
+        children = tuple(dict.fromkeys(decision.get_next_decision_ids()))
+        previous = self.children.get(id_)
+        if previous == children:
+            return
+        self.children[id_] = children
+        if previous is None and not self.parents.get(id_):
+            self.roots.add(id_)
+        for child in previous or ():
+            self._unlink(id_, child)
+        for child in children:
+            self._link(id_, child)
+        if children:
+            self.leaves.discard(id_)
+        else:
+            self.leaves.add(id_)
+        if self._rank is not None:
+            self._keep_ranks(id_, previous, children)
+
+    def _keep_ranks(self, id_, previous, children):
+        rank = self._rank
+        if previous is None:
+            # A new Decision goes below everything, ready to be linked to, or above
+            # everything when it already leads somewhere
+            if not children:
+                self._bottom -= 1
+                rank[id_] = self._bottom
+            elif not self.parents.get(id_):
+                self._top += 1
+                rank[id_] = self._top
+            else:
+                self._invalidate()
+            return
+        for child in set(previous).difference(children):
+            if child == id_:
+                # A Decision leading back to itself, only a loop of its own ends
+                if len(self._loops.get(id_, ())) == 1:
+                    self._cycles.remove(self._loops.pop(id_))
+            elif child in rank and rank[child] == rank[id_]:
+                # The link was part of a loop which may be broken now
+                self._invalidate()
+                return
+        for child in set(children).difference(previous):
+            if child == id_:
+                if id_ not in self._loops:
+                    self._loops[id_] = [id_]
+                    self._cycles.append(self._loops[id_])
+            elif child in rank and rank[child] > rank[id_] and not self._rerank(id_, child):
+                self._invalidate()
+                return
+
+    def _rerank(self, parent, child):
+        """
+        Reorder the ranks between those of both ends of a new link that contradicts them,
+        as in Pearce and Kelly's dynamic topological sort, moving loops as a whole.
+        Returns False when the link closes a loop and the ranks have to be recomputed.
+        """
+        rank = self._rank
+        lower, upper = rank[parent], rank[child]
+        # Decisions the new link leads to which are ranked above the parent...
+        forward = self._ranked_reach(child, self.children, lambda r: r >= lower)
+        if parent in forward:
+            return False
+        # ...have to end up below the Decisions leading to the parent
+        backward = self._ranked_reach(parent, self.parents, lambda r: r <= upper)
+        ranks = sorted({rank[id_] for id_ in backward | forward}, reverse=True)
+        order = sorted({rank[id_] for id_ in backward}, reverse=True) \
+            + sorted({rank[id_] for id_ in forward}, reverse=True)
+        moved = dict(zip(order, ranks))
+        rank.update({id_: moved[rank[id_]] for id_ in backward | forward})
+        return True
+
+    def _ranked_reach(self, decision_id, edges, within):
+        """ Ids reachable from decision_id, itself included, through ranks within a range. """
+        rank = self._rank
+        reached = set(self._loops.get(decision_id, (decision_id,)))
+        stack = list(reached)
+        while stack:
+            for next_id in edges.get(stack.pop(), ()):
+                if next_id not in reached and next_id in rank and within(rank[next_id]):
+                    # Decisions in a loop share their rank and move together
+                    for member in self._loops.get(next_id, (next_id,)):
+                        reached.add(member)
+                        stack.append(member)
+        return reached
+
+    def remove(self, decision_id):
+        """ Drop a Decision, actions of other Decisions may still lead to it. """
+        for child in self.children.pop(decision_id, ()):
+            self._unlink(decision_id, child)
+        self.roots.discard(decision_id)
+        self.leaves.discard(decision_id)
+        if decision_id in self._loops:
+            self._invalidate()
+        elif self._rank is not None:
+            self._rank.pop(decision_id, None)
+
+    def _invalidate(self):
+        self._rank = None
+        self._cycles = None
+        self._loops = {}
+
+    def _link(self, parent, child):
+        self.parents.setdefault(child, set()).add(parent)
+        self.roots.discard(child)
+
+    def _unlink(self, parent, child):
+        parents = self.parents.get(child)
+        if parents is None:
+            return
+        parents.discard(parent)
+        if not parents:
+            del self.parents[child]
+            if child in self.children:
+                self.roots.add(child)
+
+    def descendants(self, decision_id):
+        """ Ids of every Decision reachable from a Decision. """
+        return self._reach(decision_id, self.children)
+
+    def ancestors(self, decision_id):
+        """ Ids of every Decision a Decision can be reached from. """
+        return self._reach(decision_id, self.parents)
+
+    def _reach(self, decision_id, edges):
+        reached = set()
+        queue = deque([decision_id])
+        while queue:
+            for next_id in edges.get(queue.popleft(), ()):
+                if next_id not in reached:
+                    reached.add(next_id)
+                    queue.append(next_id)
+        return reached
+
+    def orphans(self):
+        """ Ids of the Decisions no Action leads to, the opening Decision among them. """
+        return set(self.roots)
+
+    def dead_ends(self):
+        """ Ids of the Decisions without any Action leading on. """
+        return set(self.leaves)
+
+    def would_loop(self, decision_id, next_decision_id):
+        """ Whether an Action of a Decision leading to another would close a loop. """
+        if decision_id == next_decision_id:
+            return True
+        if decision_id not in self.children or next_decision_id not in self.children:
+            return False
+        self._ensure_ranks()
+        rank = self._rank
+        floor = rank[decision_id]
+        if rank[next_decision_id] < floor:
+            return False
+        if rank[next_decision_id] == floor:
+            return True
+        # Only Decisions ranked above decision_id can lead to it
+        seen = {next_decision_id}
+        queue = deque(seen)
+        while queue:
+            for child in self.children.get(queue.popleft(), ()):
+                if child == decision_id:
+                    return True
+                if child not in seen and rank.get(child, -1) >= floor:
+                    seen.add(child)
+                    queue.append(child)
+        return False
+
+    def cycles(self):
+        """
+        The loops in the campaign, as lists of the ids of Decisions that can all reach
+        each other.
+        """
+        self._ensure_ranks()
+        return [list(cycle) for cycle in self._cycles]
+
+    def _ensure_ranks(self):
+        if self._rank is None:
+            self._find_cycles()
+
+    def _find_cycles(self):
+        # Tarjan's strongly connected components, iterative so long arcs do not hit the
+        # recursion limit. Components come out in reverse topological order, which gives
+        # the ranks.
+        rank = {}
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        cycles = []
+        for start in self.children:
+            if start in index:
+                continue
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(self.children[start]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in self.children:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.children[child])))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        for member in component:
+                            rank[member] = len(components)
+                        components.append(component)
+                        if len(component) > 1 or node in self.children[node]:
+                            component.reverse()
+                            cycles.append(component)
+        self._rank = self._rank_by_depth(rank, components)
+        self._top = len(components)
+        self._bottom = 0
+        self._cycles = cycles
+        self._loops = {member: cycle for cycle in cycles for member in cycle}
+
+    def _rank_by_depth(self, component_of, components):
+        """
+        Rank the loops and Decisions breadth first from the orphans (Kahn's topological
+        sort), so Decisions at a similar depth in the story get close ranks and reranking
+        for a new link between them stays local.
+        """
+        parents = [0] * len(components)
+        for id_, children in self.children.items():
+            for child in children:
+                if child in component_of and component_of[child] != component_of[id_]:
+                    parents[component_of[child]] += 1
+        queue = deque()
+        for id_ in self.children:
+            component = component_of[id_]
+            if not parents[component]:
+                # Marks the component as queued
+                parents[component] = -1
+                queue.append(component)
+        rank = {}
+        next_rank = len(components)
+        while queue:
+            component = queue.popleft()
+            next_rank -= 1
+            for member in components[component]:
+                rank[member] = next_rank
+                for child in self.children[member]:
+                    if child in component_of and component_of[child] != component:
+                        parents[component_of[child]] -= 1
+                        if not parents[component_of[child]]:
+                            queue.append(component_of[child])
+        return rank
@@ -0,0 +1,89 @@
+"""
+    Hundreds of prompts await answers at once in a shared channel while other users talk,
+    and every answer reaches the prompt of its own author and channel.
+"""
+import asyncio
+import random
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeBot, FakeChannel, FakeMessage, FakeUser
+from cogs.user_interaction import UserInteraction
+
+SESSIONS = 300
+PROMPTS = 6
+
+async def converse(sessions):
+    """
+    Run sessions users through PROMPTS prompts each, alternating free-text and option
+    prompts, in the shared DM channel.
+    returns: (the answers each session gave, the responses its prompts got)
+    """
+    bot = FakeBot()
+    await bot.add_cog(UserInteraction(bot))
+    interaction = bot.get_cog('UserInteraction')
+    channel = FakeChannel('dm')
+    other_channel = FakeChannel('general')
+    bystander = FakeUser('bystander')
+
+    def say(channel, author, content):
+        bot.dispatch('message', FakeMessage(channel, content=content, author=author))
+
+    async def session(number):
+        rng = random.Random(number)
+        user = FakeUser(f'user{number}')
+        ctx = SimpleNamespace(channel=channel, author=user, send=channel.send)
+        answers, responses = [], []
+        for prompt in range(PROMPTS):
+            if prompt % 2:
+                options, answer = ['1', '2', '3', 'c'], rng.choice('123')
+            else:
+                options, answer = [], f'{user} answer {prompt}'
+            waiting = asyncio.create_task(interaction.await_response(ctx, options, timeout=5))
+            await asyncio.sleep(rng.random() * 0.01)
+            # Messages the prompt has to ignore
+            say(channel, bystander, f'{bystander} chatter {prompt}')
+            say(other_channel, user, f'{user} elsewhere {prompt}')
+            if options:
+                say(channel, user, 'not an option')
+            say(channel, user, answer)
+            answers.append(answer)
+            responses.append(await waiting)
+        return answers, responses
+
+    async def chatter():
+        # Unrelated conversation in the same channel for as long as the sessions run
+        for number in range(SESSIONS * PROMPTS):
+            say(channel, bystander, str(number % 3 + 1))
+            await asyncio.sleep(0)
+
+    background = asyncio.create_task(chatter())
+    results = await asyncio.gather(*(session(number) for number in range(sessions)))
+    background.cancel()
+    await bot.close()
+    return results
+
+def test_every_answer_reaches_its_own_prompt():
+    results = asyncio.run(converse(SESSIONS))
+    assert len(results) == SESSIONS
+    for answers, responses in results:
+        assert responses == answers
+
+def test_a_free_text_prompt_ignores_other_authors_and_channels():
+    async def prompt():
+        bot = FakeBot()
+        interaction = UserInteraction(bot)
+        channel = FakeChannel('dm')
+        user, other = FakeUser('user'), FakeUser('other')
+        ctx = SimpleNamespace(channel=channel, author=user, send=channel.send)
+        waiting = asyncio.create_task(interaction.await_response(ctx, timeout=5))
+        await asyncio.sleep(0)
+        await interaction.on_message(FakeMessage(channel, content='from someone else', author=other))
+        await interaction.on_message(FakeMessage(FakeChannel('general'), content='from elsewhere', author=user))
+        await asyncio.sleep(0)
+        answered_early = waiting.done()
+        await interaction.on_message(FakeMessage(channel, content='the answer', author=user))
+        return answered_early, await waiting
+
+    answered_early, response = asyncio.run(prompt())
+    assert not answered_early
+    assert response == 'the answer'
@@ -0,0 +1,68 @@
+"""
+    The outbound dispatcher against fake channels: a 429 is retried once its retry_after
+    has passed, announcements go out ahead of queued prompts, and queued embeds are merged
+    into as few messages as Discord's limits allow, except those that get reactions.
+"""
+import asyncio
+import time
+
+from benchmarks.fakes import FakeChannel
+from utils.dispatch import ANNOUNCEMENT, MAX_EMBED_CHARACTERS, MAX_EMBEDS, PROMPT, OutboundDispatcher
+from utils.embeds import DefaultEmbed
+
+def test_a_rate_limited_send_is_retried_after_retry_after():
+    async def send():
+        # The channel answers a second message within 0.2s with a 429, the dispatcher's
+        # own pacing would allow it
+        channel = FakeChannel('dm', rate_limit=(1, 0.2))
+        dispatcher = OutboundDispatcher(rate=100, per=1.0)
+        start = time.perf_counter()
+        await dispatcher.send(channel, DefaultEmbed(title='first'))
+        await dispatcher.send(channel, DefaultEmbed(title='second'))
+        return channel, dispatcher, time.perf_counter() - start
+
+    channel, dispatcher, elapsed = asyncio.run(send())
+    assert channel.rate_limited == 1
+    assert dispatcher.rate_limits == 1
+    assert [message.embed.title for message in channel.messages.values()] == ['first', 'second']
+    assert elapsed >= 0.2
+
+def test_an_announcement_goes_out_ahead_of_queued_prompts():
+    async def send():
+        channel = FakeChannel('dm', latency=0.01)
+        dispatcher = OutboundDispatcher(rate=100, per=1.0, reaction_rate=100, reaction_per=1.0)
+        # Prompts that get reactions are not merged, each waits for its own message
+        sends = [dispatcher.send(channel, DefaultEmbed(title=f'prompt {number}'), PROMPT, reactions=['1'])
+                 for number in range(5)]
+        sends.append(dispatcher.send(channel, DefaultEmbed(title='announcement'), ANNOUNCEMENT))
+        await asyncio.gather(*sends)
+        return channel
+
+    channel = asyncio.run(send())
+    titles = [message.embed.title for message in channel.messages.values()]
+    assert titles == ['announcement'] + [f'prompt {number}' for number in range(5)]
+
+def test_queued_embeds_are_merged_within_the_limits():
+    async def send():
+        channel = FakeChannel('dm')
+        dispatcher = OutboundDispatcher(rate=100, per=1.0)
+        sends = [dispatcher.send(channel, DefaultEmbed(title=f'short {number}')) for number in range(15)]
+        sends.append(dispatcher.send(channel, DefaultEmbed(title='voted on'), reactions=['1']))
+        sends += [dispatcher.send(channel, DefaultEmbed(title=f'long {number}', description='x' * 2500))
+                  for number in range(5)]
+        messages = await asyncio.gather(*sends)
+        return channel, messages
+
+    channel, messages = asyncio.run(send())
+    for message in channel.messages.values():
+        assert len(message.embeds) <= MAX_EMBEDS
+        assert sum(len(embed) for embed in message.embeds) <= MAX_EMBED_CHARACTERS
+    # Every embed went out exactly once, in as few messages as the limits allow
+    titles = [embed.title for message in channel.messages.values() for embed in message.embeds]
+    assert sorted(titles) == sorted([f'short {number}' for number in range(15)] + ['voted on'] +
+                                    [f'long {number}' for number in range(5)])
+    assert len(channel.messages) == 2 + 1 + 3
+    # The message that gets reactions carries nothing else
+    voted_on = messages[15]
+    assert [embed.title for embed in voted_on.embeds] == ['voted on']
+    assert [reaction.emoji for reaction in voted_on.reactions] == ['1']
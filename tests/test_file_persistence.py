@@ -0,0 +1,178 @@
+"""
+    The id and state indexes of file_persistence stay consistent across updates, restarts,
+    torn journal writes and compaction.
+"""
+import json
+import os
+import threading
+
+import pytest
+
+from file_persistence import file_persistence
+from model.decision import Action, Decision, DecisionState
+from utils.display import RenderCache
+
+@pytest.fixture
+def files(tmp_path):
+    admin_state_file = tmp_path / 'admin.yaml'
+    admin_state_file.write_text('channels:\n  dm:\n  publish:\n')
+    return str(admin_state_file), str(tmp_path / 'decisions.json')
+
+def open_store(files, **kwargs):
+    return file_persistence(admin_state_file=files[0], decision_state_file=files[1], **kwargs)
+
+def make_decisions(count):
+    return [Decision(f'Decision {i}', f'Body {i}', [Action('\U0001F5E1', f'Action {i}')]) for i in range(count)]
+
+def assert_indexed(store, expected):
+    """ expected: decision id -> DecisionState """
+    for id_, state in expected.items():
+        assert store.get_decision(id_).state == state
+    for state in DecisionState:
+        assert sorted(d.id_ for d in store.get_decisions(state)) == \
+            sorted(id_ for id_, expected_state in expected.items() if expected_state == state)
+
+def test_update_moves_decision_between_state_buckets(files):
+    store = open_store(files)
+    decisions = make_decisions(3)
+    for decision in decisions:
+        store.add_decision(decision)
+    decisions[0].state = DecisionState.PUBLISHED
+    store.update_decision(decisions[0])
+    decisions[1].state = DecisionState.PUBLISHED
+    store.update_decision(decisions[1])
+    decisions[1].state = DecisionState.RESOLVED
+    store.update_decision(decisions[1])
+
+    assert_indexed(store, {decisions[0].id_: DecisionState.PUBLISHED,
+                           decisions[1].id_: DecisionState.RESOLVED,
+                           decisions[2].id_: DecisionState.PREPARATION})
+    assert store.get_decision('missing') is None
+
+def test_batched_update_moves_every_decision(files):
+    store = open_store(files)
+    decisions = make_decisions(3)
+    for decision in decisions:
+        store.add_decision(decision)
+    for decision in decisions[:2]:
+        decision.state = DecisionState.RESOLVED
+    store.update_decisions(decisions[:2])
+
+    assert_indexed(open_store(files), {decisions[0].id_: DecisionState.RESOLVED,
+                                       decisions[1].id_: DecisionState.RESOLVED,
+                                       decisions[2].id_: DecisionState.PREPARATION})
+
+def test_indexes_survive_a_restart(files):
+    store = open_store(files)
+    decisions = make_decisions(4)
+    store.write_state({'decisions': decisions[:2]})
+    for decision in decisions[2:]:
+        store.add_decision(decision)
+    decisions[0].state = DecisionState.PUBLISHED
+    decisions[0].message_id = 42
+    store.update_decision(decisions[0])
+    decisions[3].state = DecisionState.RESOLVED
+    store.update_decision(decisions[3])
+
+    restarted = open_store(files)
+    assert_indexed(restarted, {decisions[0].id_: DecisionState.PUBLISHED,
+                               decisions[1].id_: DecisionState.PREPARATION,
+                               decisions[2].id_: DecisionState.PREPARATION,
+                               decisions[3].id_: DecisionState.RESOLVED})
+    assert restarted.get_decision(decisions[0].id_).message_id == 42
+    assert [d.id_ for d in restarted.get_state()['decisions']] == [d.id_ for d in decisions]
+
+def test_torn_journal_record_is_dropped(files):
+    store = open_store(files)
+    decisions = make_decisions(2)
+    for decision in decisions:
+        store.add_decision(decision)
+    with open(store.journal_file, 'a') as f:
+        f.write('{"op":"put","decision":{"id":')
+
+    restarted = open_store(files)
+    assert_indexed(restarted, {decision.id_: DecisionState.PREPARATION for decision in decisions})
+    # Appends after the cut start on a record boundary
+    decisions[1].state = DecisionState.PUBLISHED
+    restarted.update_decision(decisions[1])
+    assert_indexed(open_store(files), {decisions[0].id_: DecisionState.PREPARATION,
+                                       decisions[1].id_: DecisionState.PUBLISHED})
+
+def test_compaction_folds_the_journal_into_the_snapshot(files):
+    store = open_store(files)
+    decisions = make_decisions(3)
+    for decision in decisions:
+        store.add_decision(decision)
+    decisions[2].state = DecisionState.PUBLISHED
+    store.update_decision(decisions[2])
+    assert os.path.exists(store.journal_file)
+
+    store.compact()
+    assert not os.path.exists(store.journal_file)
+    assert not os.path.exists(store.compacting_journal_file)
+    expected = {decisions[0].id_: DecisionState.PREPARATION,
+                decisions[1].id_: DecisionState.PREPARATION,
+                decisions[2].id_: DecisionState.PUBLISHED}
+    assert_indexed(store, expected)
+    assert_indexed(open_store(files), expected)
+
+def test_compaction_runs_once_the_journal_passes_its_threshold(files):
+    store = open_store(files, journal_threshold=1)
+    decisions = make_decisions(2)
+    for decision in decisions:
+        store.add_decision(decision)
+    store._compaction.join()
+    decisions[0].state = DecisionState.RESOLVED
+    store.update_decision(decisions[0])
+    store._compaction.join()
+
+    assert_indexed(open_store(files), {decisions[0].id_: DecisionState.RESOLVED,
+                                       decisions[1].id_: DecisionState.PREPARATION})
+
+def test_compaction_encodes_without_holding_the_lock(files):
+    store = open_store(files)
+    decisions = make_decisions(2)
+    for decision in decisions:
+        store.add_decision(decision)
+    dump_state = store._dump_state
+
+    def dump_while_writing(state):
+        # Another thread gets the lock and writes while the snapshot is encoded
+        acquired = []
+        def write():
+            acquired.append(store._lock.acquire(timeout=1))
+            if acquired[0]:
+                decisions[1].state = DecisionState.PUBLISHED
+                store.update_decision(decisions[1])
+                store._lock.release()
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        assert acquired == [True]
+        return dump_state(state)
+
+    store._dump_state = dump_while_writing
+    store.compact()
+    assert_indexed(open_store(files), {decisions[0].id_: DecisionState.PREPARATION,
+                                       decisions[1].id_: DecisionState.PUBLISHED})
+
+def test_a_reloaded_snapshot_is_not_served_a_stale_embed(files):
+    store = open_store(files)
+    decision = make_decisions(1)[0]
+    store.add_decision(decision)
+    store.compact()
+    cache = RenderCache()
+    assert '**Decision 0**' in cache.get(store.get_decision(decision.id_)).description
+
+    # Edit the snapshot by hand
+    with open(files[1]) as snapshot:
+        data = json.load(snapshot)
+    data['decisions'][0]['title'] = 'New title'
+    with open(files[1], 'w') as snapshot:
+        json.dump(data, snapshot)
+    stat = os.stat(files[1])
+    os.utime(files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    reloaded = store.get_decision(decision.id_)
+    assert reloaded.title == 'New title'
+    assert '**New title**' in cache.get(reloaded).description
@@ -0,0 +1,120 @@
+"""
+    The startup recovery pass resolves overdue decisions guild by guild, so one guild's
+    missing channel, empty decision or failed write does not stop the others. Start-up
+    passes leave the guilds without state alone.
+"""
+import asyncio
+import datetime
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from cogs.scheduler import Scheduler
+from cogs.tally import Tally
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+
+def make_guild(tmp_path, name, count, dm_channel=True):
+    """
+    A guild with count overdue published decisions, each voted for its first action.
+    returns: (guild, its state management, its publish channel, its DM channel or None)
+    """
+    publish_channel = FakeChannel('publish')
+    dm = FakeChannel('dm') if dm_channel else None
+    guild = FakeGuild([channel for channel in [dm, publish_channel] if channel], name=name)
+    admin_state_file = tmp_path / f'{name}-admin.yaml'
+    admin_state_file.write_text('channels:\n  dm:\n  publish:\n')
+    state_management = file_persistence(admin_state_file=str(admin_state_file),
+                                        decision_state_file=str(tmp_path / f'{name}-decisions.json'))
+    state_management.write_admin_state({'channels': {'dm': dm.id if dm else None, 'publish': publish_channel.id}})
+    campaign = generate_campaign(count)
+    for decision in campaign['decisions']:
+        decision.state = DecisionState.PUBLISHED
+        decision.guild_id = guild.id
+        decision.resolve_time = datetime.datetime.now() - datetime.timedelta(hours=1)
+        message = asyncio.run(publish_channel.send())
+        message.react(decision.actions[0].glyph, me=True)
+        message.react(decision.actions[0].glyph)
+        decision.message_id = message.id
+    state_management.write_state(campaign)
+    return guild, state_management, publish_channel, dm
+
+def make_bot(guilds):
+    """ guilds: (guild, state management, ...) of each guild. """
+    partitions = {guild.id: state_management for guild, state_management, *_ in guilds}
+    state_management = GuildPartitionedPersistence(lambda guild_id: partitions[guild_id], lambda: partitions)
+    bot = FakeBot([guild for guild, *_ in guilds])
+    bot.cogs['Channels'] = Channels(bot, state_management)
+    bot.cogs['Tally'] = Tally(bot)
+    return bot.cogs.setdefault('Decisions', Decisions(bot, state_management, GlobalOptions()))
+
+def summaries(channel):
+    return [embed for message in channel.messages.values() for embed in message.embeds]
+
+def test_overdue_decisions_are_resolved_with_one_summary_per_channel(tmp_path):
+    guild, state_management, publish_channel, dm_channel = make_guild(tmp_path, 'a', 3)
+    decisions = make_bot([(guild, state_management)])
+
+    resolved = asyncio.run(decisions.recover_overdue())
+    assert len(resolved) == 3
+    restarted = file_persistence(state_management.admin_state_file, state_management.decision_state_file)
+    assert len(restarted.get_decisions(DecisionState.RESOLVED)) == 3
+    for decision in restarted.get_decisions(DecisionState.RESOLVED):
+        assert decision.voted_action.id_ == decision.actions[0].id_
+    assert [embed.title for embed in summaries(dm_channel)] == ['3 decisions were made while I was away']
+    assert [embed.title for embed in summaries(publish_channel)] == ['3 decisions were made while I was away']
+
+def test_a_decision_without_actions_and_a_missing_dm_channel_are_handled(tmp_path):
+    guild, state_management, publish_channel, _ = make_guild(tmp_path, 'a', 2, dm_channel=False)
+    state_management.get_state()['decisions'][0].actions = []
+    decisions = make_bot([(guild, state_management)])
+
+    resolved = asyncio.run(decisions.recover_overdue())
+    assert len(resolved) == 2
+    assert resolved[0].voted_action is None
+    assert 'No action was chosen.' in summaries(publish_channel)[0].description
+
+def test_a_failed_write_leaves_its_guild_published_and_the_others_resolved(tmp_path):
+    broken = make_guild(tmp_path, 'broken', 2)
+    working = make_guild(tmp_path, 'working', 2)
+    def fail(decisions):
+        raise OSError('disk full')
+    broken[1].update_decisions = fail
+    decisions = make_bot([broken[:2], working[:2]])
+
+    resolved = asyncio.run(decisions.recover_overdue())
+    assert {decision.guild_id for decision in resolved} == {working[0].id}
+    assert len(decisions.find_decisions(broken[0].id, decision_state=DecisionState.PUBLISHED)) == 2
+    assert all(decision.state == DecisionState.PUBLISHED
+               for decision in broken[1].get_state()['decisions'])
+    assert not summaries(broken[3])
+    assert len(decisions.find_decisions(working[0].id, decision_state=DecisionState.RESOLVED)) == 2
+
+def test_start_up_passes_do_not_open_guilds_without_state(tmp_path):
+    guild, state_management, *_ = make_guild(tmp_path, 'a', 1)
+    # The bot is in many more guilds that never used a command
+    others = [FakeGuild([], name=f'other{number}') for number in range(20)]
+    opened = []
+    def open_partition(guild_id):
+        opened.append(guild_id)
+        return state_management
+    partitions = GuildPartitionedPersistence(open_partition, lambda: [guild.id])
+    bot = FakeBot([guild] + others)
+    bot.cogs['Channels'] = Channels(bot, partitions)
+    tally = bot.cogs['Tally'] = Tally(bot)
+    decisions = bot.cogs['Decisions'] = Decisions(bot, partitions, GlobalOptions())
+    scheduler = bot.cogs['Scheduler'] = Scheduler(bot)
+
+    async def start_up():
+        await tally.on_ready()
+        tally.cog_unload()
+        scheduler.rebuild()
+        await decisions.check_time()
+        return await decisions.recover_overdue()
+
+    assert len(asyncio.run(start_up())) == 0
+    assert opened == [guild.id]
+    assert state_management.get_decisions(DecisionState.RESOLVED)
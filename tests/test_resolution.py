@@ -0,0 +1,207 @@
+"""
+    Due decisions resolve concurrently against a fake guild whose API calls take a fixed
+    latency, so a batch takes about as long as a single decision. Failed resolutions are
+    retried, and only the reactions still on an Action's glyph count as votes.
+"""
+import asyncio
+import datetime
+import time
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from benchmarks.campaign import generate_campaign
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild, FakeUser
+from cogs.channels import Channels
+from cogs.decisions import Decisions
+from cogs.scheduler import Scheduler
+from cogs.tally import Tally
+from file_persistence import file_persistence
+from globaloptions import GlobalOptions
+from model.decision import DecisionState
+from partitioned_persistence import GuildPartitionedPersistence
+
+LATENCY = 0.05
+
+async def publish_due(tmp_path, count):
+    """
+    Publish count decisions that are due in a fake guild.
+    returns: (the Decisions cog, the fake guild)
+    """
+    publish_channel = FakeChannel('publish')
+    dm_channel = FakeChannel('dm')
+    guild = FakeGuild([dm_channel, publish_channel])
+    bot = FakeBot([guild])
+    admin_state_file = tmp_path / f'admin-{count}.yaml'
+    admin_state_file.write_text('channels:\n  dm:\n  publish:\n')
+    state_management = file_persistence(admin_state_file=str(admin_state_file),
+                                        decision_state_file=str(tmp_path / f'decisions-{count}.json'))
+    state_management.write_admin_state({'channels': {'dm': dm_channel.id, 'publish': publish_channel.id}})
+    partitions = GuildPartitionedPersistence(lambda guild_id: state_management, lambda: [guild.id])
+    bot.cogs['Channels'] = Channels(bot, partitions)
+
+    campaign = generate_campaign(count)
+    for decision in campaign['decisions']:
+        decision.state = DecisionState.PUBLISHED
+        decision.guild_id = guild.id
+        decision.resolve_time = datetime.datetime.now() - datetime.timedelta(minutes=1)
+        message = await publish_channel.send()
+        await message.add_reaction(decision.actions[0].glyph)
+        decision.message_id = message.id
+    state_management.write_state(campaign)
+
+    decisions = bot.cogs['Decisions'] = Decisions(bot, partitions, GlobalOptions())
+    # Only the resolution pays the API latency
+    publish_channel.latency = dm_channel.latency = LATENCY
+    return decisions, guild
+
+async def resolve_due(tmp_path, count):
+    """
+    Publish count decisions that are due and run one check_time over them.
+    returns: (the Decisions cog, the fake guild, the seconds check_time took)
+    """
+    decisions, guild = await publish_due(tmp_path, count)
+    start = time.perf_counter()
+    await decisions.check_time()
+    return decisions, guild, time.perf_counter() - start
+
+def test_every_due_decision_is_resolved(tmp_path):
+    decisions, guild, _ = asyncio.run(resolve_due(tmp_path, 5))
+    assert not decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+    for decision in decisions.find_decisions(guild.id, decision_state=DecisionState.RESOLVED):
+        assert decision.voted_action is decision.actions[0]
+
+@pytest.mark.parametrize('count', [5, GlobalOptions().resolution_concurrency])
+def test_batch_resolves_in_about_the_time_of_one(tmp_path, count):
+    _, _, single = asyncio.run(resolve_due(tmp_path, 1))
+    _, _, batch = asyncio.run(resolve_due(tmp_path, count))
+    # One after another the batch would take count times as long
+    assert batch < 2 * single + LATENCY
+
+def test_a_guild_that_is_gone_does_not_fail_the_others(tmp_path):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 2)
+        due = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)
+        orphan = generate_campaign(1)['decisions'][0]
+        orphan.state = DecisionState.PUBLISHED
+        # The bot has left this guild
+        orphan.guild_id = -1
+        return due, await decisions.resolve_decisions([orphan] + due)
+
+    due, results = asyncio.run(resolve())
+    assert isinstance(results[0], LookupError)
+    assert results[1:] == [None, None]
+    assert all(decision.state == DecisionState.RESOLVED for decision in due)
+
+@pytest.mark.parametrize('with_tally', [False, True])
+def test_reactions_that_are_not_actions_are_not_votes(tmp_path, with_tally):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 1)
+        if with_tally:
+            decisions.bot.cogs['Tally'] = Tally(decisions.bot)
+        decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)[0]
+        message = await guild.channels[1].fetch_message(decision.message_id)
+        for _ in range(5):
+            message.react('\U0001F44D')
+        for _ in range(2):
+            message.react(decision.actions[1].glyph)
+        await decisions.check_time()
+        return decision
+
+    decision = asyncio.run(resolve())
+    assert decision.state == DecisionState.RESOLVED
+    assert decision.voted_action is decision.actions[1]
+
+@pytest.mark.parametrize('error, retried', [
+    (ConnectionResetError('Connection lost'), True),
+    (discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Message'), False)])
+def test_a_failed_resolution_is_retried_unless_the_message_is_gone(tmp_path, error, retried):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 1)
+        scheduler = decisions.bot.cogs['Scheduler'] = Scheduler(decisions.bot)
+        scheduler.rebuild()
+        decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)[0]
+        publish_channel = guild.channels[1]
+        fetch_message = publish_channel.fetch_message
+        async def fail_once(message_id):
+            publish_channel.fetch_message = fetch_message
+            raise error
+        publish_channel.fetch_message = fail_once
+
+        await scheduler.tick(datetime.datetime.now())
+        deadlines = list(scheduler.deadlines)
+        state = decision.state
+        # Run the retry, if there is one
+        await scheduler.tick(datetime.datetime.now() + datetime.timedelta(seconds=scheduler.retry_delay))
+        return decision, state, deadlines
+
+    decision, state, deadlines = asyncio.run(resolve())
+    assert state == DecisionState.PUBLISHED
+    if retried:
+        assert len(deadlines) == 1
+        assert deadlines[0][0] > datetime.datetime.now()
+        assert decision.state == DecisionState.RESOLVED
+    else:
+        assert deadlines == []
+        assert decision.state == DecisionState.PUBLISHED
+
+def test_a_missing_dm_channel_does_not_fail_the_resolution(tmp_path):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 1)
+        publish_channel = guild.channels[1]
+        decisions.state_management.for_guild(guild.id).write_admin_state(
+            {'channels': {'dm': None, 'publish': publish_channel.id}})
+        scheduler = decisions.bot.cogs['Scheduler'] = Scheduler(decisions.bot)
+        scheduler.rebuild()
+        decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)[0]
+        await scheduler.tick(datetime.datetime.now())
+        return decision, scheduler, publish_channel
+
+    decision, scheduler, publish_channel = asyncio.run(resolve())
+    assert decision.state == DecisionState.RESOLVED
+    assert scheduler.last_resolution_lag is not None
+    assert scheduler.deadlines == []
+    # The announcement still went to the publish channel
+    assert len(publish_channel.messages) == 2
+
+def test_votes_missed_between_gateway_sessions_are_reconciled(tmp_path):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 1)
+        tally = decisions.bot.cogs['Tally'] = Tally(decisions.bot)
+        await tally.on_ready()
+        decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)[0]
+        tally.track(decision)
+        # Votes cast while the bot reconnected, no event reaches it
+        message = await guild.channels[1].fetch_message(decision.message_id)
+        for _ in range(2):
+            message.react(decision.actions[1].glyph)
+        await tally.on_ready()
+        await decisions.check_time()
+        tally.cog_unload()
+        return decision
+
+    decision = asyncio.run(resolve())
+    assert decision.voted_action is decision.actions[1]
+
+@pytest.mark.parametrize('clear_one', [False, True])
+def test_cleared_reactions_are_not_votes(tmp_path, clear_one):
+    async def resolve():
+        decisions, guild = await publish_due(tmp_path, 1)
+        tally = decisions.bot.cogs['Tally'] = Tally(decisions.bot)
+        decision = decisions.find_decisions(guild.id, decision_state=DecisionState.PUBLISHED)[0]
+        tally.track(decision)
+        message = await guild.channels[1].fetch_message(decision.message_id)
+        for name in ['first', 'second']:
+            await tally.on_raw_reaction_add(SimpleNamespace(message_id=message.id, user_id=FakeUser(name).id,
+                                                            emoji=decision.actions[1].glyph))
+        # A moderator removes the reactions
+        if clear_one:
+            await tally.on_raw_reaction_clear_emoji(SimpleNamespace(message_id=message.id,
+                                                                    emoji=decision.actions[1].glyph))
+        else:
+            await tally.on_raw_reaction_clear(SimpleNamespace(message_id=message.id))
+        return tally.winner(decision), decision
+
+    winner, decision = asyncio.run(resolve())
+    assert winner is decision.actions[0]
@@ -0,0 +1,34 @@
+"""
+    Reads through WriteBehindPersistence see writes that have not been flushed yet.
+"""
+import asyncio
+import os
+
+from model.decision import Decision, DecisionState
+from sqlite_persistence import SqlitePersistence
+from write_behind import WriteBehindPersistence
+
+def test_pending_update_is_read_back_before_the_flush(tmp_path, monkeypatch):
+    # The admin template is read relative to the repository root
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    backend = SqlitePersistence(str(tmp_path / 'cyoa.db'))
+    decision = Decision('Title', 'Body')
+    backend.add_decision(decision)
+
+    async def update():
+        # Writes are only held back inside the event loop
+        store = WriteBehindPersistence(backend, flush_delay=60)
+        # SQLite hands out new objects, so the update only exists in the pending writes
+        published = store.get_decision(decision.id_)
+        published.state = DecisionState.PUBLISHED
+        published.message_id = 42
+        store.update_decision(published)
+
+        assert backend.get_decision(decision.id_).state == DecisionState.PREPARATION
+        assert store.get_decision(decision.id_).state == DecisionState.PUBLISHED
+        assert store.get_decision(decision.id_).message_id == 42
+        assert [d.id_ for d in store.get_decisions(DecisionState.PUBLISHED)] == [decision.id_]
+        store.flush()
+    asyncio.run(update())
+
+    assert backend.get_decision(decision.id_).message_id == 42
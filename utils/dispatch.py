@@ -0,0 +1,192 @@
+"""
+    Deliver outbound messages through per-channel queues, paced to Discord's rate limits.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+import discord
+
+from metrics import outbound_embeds, outbound_messages, outbound_rate_limits
+
+# Priority classes, lower goes out first
+ANNOUNCEMENT = 0
+PUBLICATION = 1
+PROMPT = 2
+PRIORITY_NAMES = {ANNOUNCEMENT: 'announcement', PUBLICATION: 'publication', PROMPT: 'prompt'}
+
+# Discord takes up to 10 embeds per message, 6000 characters across them
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+# Used when a 429 does not say how long to back off
+DEFAULT_RETRY_AFTER = 1.0
+
+class ChannelBucket():
+    """
+        Paces the requests of one route to a channel: at most rate requests per period,
+        and none until the retry_after of the last rate limit has passed.
+        params:
+            rate: The number of requests allowed per period
+            per: The period in seconds
+    """
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        # monotonic times of the requests made within the last period
+        self.sent = deque()
+        self.blocked_until = 0.0
+
+    async def acquire(self):
+        """
+            Wait until a request can be made, and count it
+        """
+        while True:
+            now = time.monotonic()
+            while self.sent and self.sent[0] <= now - self.per:
+                self.sent.popleft()
+            wait = self.blocked_until - now
+            if len(self.sent) >= self.rate:
+                wait = max(wait, self.sent[0] + self.per - now)
+            if wait <= 0:
+                self.sent.append(now)
+                return
+            await asyncio.sleep(wait)
+
+    def rate_limited(self, retry_after):
+        """
+            Hold every request until retry_after seconds from now
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+class _Outbound():
+    __slots__ = ('embed', 'priority', 'reactions', 'on_sent', 'future')
+
+    def __init__(self, embed, priority, reactions, on_sent, future):
+        self.embed = embed
+        self.priority = priority
+        self.reactions = reactions
+        self.on_sent = on_sent
+        self.future = future
+
+    @property
+    def coalesces(self):
+        # Messages that get reactions are the ones voted on, they stay on their own
+        return not self.reactions and self.on_sent is None
+
+class _ChannelQueue():
+    __slots__ = ('channel', 'pending', 'messages', 'reactions', 'worker')
+
+    def __init__(self, channel, dispatcher):
+        self.channel = channel
+        # heap of (priority, sequence, _Outbound)
+        self.pending = []
+        self.messages = ChannelBucket(dispatcher.rate, dispatcher.per)
+        self.reactions = ChannelBucket(dispatcher.reaction_rate, dispatcher.reaction_per)
+        self.worker = None
+
+class OutboundDispatcher():
+    """
+        Sends embeds through a queue per channel, highest priority first, so announcements
+        are not held up behind prompts. Requests are paced per channel to stay within the
+        rate limits, a 429 holds the channel for its retry_after and the request is retried.
+        Embeds without reactions waiting for the same channel go out together in one message.
+        params:
+            rate: Messages per period sent to one channel
+            per: The message period in seconds
+            reaction_rate: Reactions per period added in one channel
+            reaction_per: The reaction period in seconds
+    """
+
+    def __init__(self, rate = 5, per = 5.0, reaction_rate = 1, reaction_per = 0.25):
+        self.rate = rate
+        self.per = per
+        self.reaction_rate = reaction_rate
+        self.reaction_per = reaction_per
+        # channel id -> _ChannelQueue
+        self.channels = {}
+        self._sequence = itertools.count()
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.rate_limits = 0
+
+    async def send(self, channel, embed, priority = PROMPT, reactions = (), on_sent = None):
+        """
+            Queue an embed and return the message it went out in once it is delivered
+            params:
+                channel: The channel to send the embed to
+                embed: The embed to send
+                priority: ANNOUNCEMENT, PUBLICATION or PROMPT
+                reactions: Emoji to add to the message, in order
+                on_sent: Called with the sent message before its reactions are added
+        """
+        queue = self.channels.get(channel.id)
+        if queue is None:
+            queue = self.channels[channel.id] = _ChannelQueue(channel, self)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue.pending, (priority, next(self._sequence), _Outbound(embed, priority, tuple(reactions), on_sent, future)))
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(queue))
+        return await future
+
+    async def _drain(self, queue):
+        while queue.pending:
+            batch = self._next_batch(queue)
+            first = batch[0]
+            try:
+                if len(batch) == 1:
+                    message = await self._request(queue.messages, lambda: queue.channel.send(embed=first.embed))
+                else:
+                    embeds = [outbound.embed for outbound in batch]
+                    message = await self._request(queue.messages, lambda: queue.channel.send(embeds=embeds))
+                self.messages_sent += 1
+                self.embeds_sent += len(batch)
+                outbound_messages.inc(priority=PRIORITY_NAMES.get(first.priority, first.priority))
+                for outbound in batch:
+                    outbound_embeds.inc(priority=PRIORITY_NAMES.get(outbound.priority, outbound.priority))
+                if first.on_sent:
+                    first.on_sent(message)
+                for glyph in first.reactions:
+                    await self._request(queue.reactions, lambda: message.add_reaction(glyph))
+            except Exception as error:
+                for outbound in batch:
+                    if not outbound.future.done():
+                        outbound.future.set_exception(error)
+            else:
+                for outbound in batch:
+                    if not outbound.future.done():
+                        outbound.future.set_result(message)
+        queue.worker = None
+
+    def _next_batch(self, queue):
+        batch = [heapq.heappop(queue.pending)[2]]
+        if batch[0].coalesces:
+            length = len(batch[0].embed)
+            while queue.pending and len(batch) < MAX_EMBEDS:
+                outbound = queue.pending[0][2]
+                if not outbound.coalesces or length + len(outbound.embed) > MAX_EMBED_CHARACTERS:
+                    break
+                heapq.heappop(queue.pending)
+                batch.append(outbound)
+                length += len(outbound.embed)
+        return batch
+
+    async def _request(self, bucket, request):
+        while True:
+            await bucket.acquire()
+            try:
+                return await request()
+            except discord.RateLimited as error:
+                retry_after = error.retry_after
+            except discord.HTTPException as error:
+                if error.status != 429:
+                    raise
+                retry_after = DEFAULT_RETRY_AFTER
+            self.rate_limits += 1
+            outbound_rate_limits.inc()
+            print(f'Rate limited, retrying in {retry_after:.2f}s.')
+            bucket.rate_limited(retry_after)
+
+dispatcher = OutboundDispatcher()
@@ -2,52 +2,123 @@
     Send messages to channels using embeds a little easier.
 """
 import datetime
+from collections import OrderedDict
+
+from utils.dispatch import PROMPT, dispatcher
 from utils.embeds import CharacterEmbed, DefaultEmbed
 
+# Discord caps embed descriptions at 4096 characters, keep clear of it with room for a header
+MAX_DESCRIPTION_LENGTH = 3500
+
+def truncate_description(text, limit = MAX_DESCRIPTION_LENGTH):
+    """
+        Cut text that does not fit an embed description at the last whole line, marking the cut
+    """
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit('\n', 1)[0] + '\n…'
+
+def description_pages(lines, limit = MAX_DESCRIPTION_LENGTH):
+    """
+        Join lines into as few embed descriptions of at most limit characters as they fit in
+    """
+    pages = ['']
+    for line in lines:
+        if pages[-1] and len(pages[-1]) + len(line) + 1 > limit:
+            pages.append('')
+        pages[-1] += ('\n' if pages[-1] else '') + line
+    return pages
+
+class RenderCache():
+    """
+        Rendered Decision embeds by Decision id. An entry is only reused for the same Decision
+        object at the same version: the version is bumped every time a Decision is written,
+        and a Decision read back from state management (a reloaded snapshot, an SQLite read)
+        is a new object whose version restarts at 0.
+        params:
+            maxsize: The number of Decisions whose embed is kept, least recently shown first out
+    """
+
+    def __init__(self, maxsize = 256):
+        self.maxsize = maxsize
+        # decision id -> (Decision, version, embed)
+        self.embeds = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, decision, ctx = None):
+        """
+            Return the embed of a Decision, rendering it if it changed since it was last shown
+        """
+        cached = self.embeds.get(decision.id_)
+        if cached is not None and cached[0] is decision and cached[1] == decision.version:
+            self.embeds.move_to_end(decision.id_)
+            self.hits += 1
+            return cached[2]
+        self.misses += 1
+        embed = CharacterEmbed(ctx)
+        embed.description = render_decision(decision)
+        self.embeds[decision.id_] = (decision, decision.version, embed)
+        self.embeds.move_to_end(decision.id_)
+        if len(self.embeds) > self.maxsize:
+            self.embeds.popitem(last=False)
+        return embed
+
+    def invalidate(self, decision_id):
+        """
+            Drop the embed of a Decision
+        """
+        self.embeds.pop(decision_id, None)
+
+render_cache = RenderCache()
+
+def render_decision(decision):
+    """
+        Render the rich body of a Decision embed
+    """
+    parts = ['**', decision.title, '**\n', decision.body, '\n\n', '**Actions:**\n']
+    for action in decision.actions:
+        parts += [action.glyph, ' = ', action.description, '\n']
+    if decision.resolve_time:
+        resolve_time_pretty = datetime.datetime.strftime(decision.resolve_time, "%d %b at %-I:%M %p")
+        parts.append(f'\nVoting closes at {resolve_time_pretty} \n')
+    return ''.join(parts)
+
 class DecisionDisplayEmbed():
     """
         Display Decisions to a specific channel using Discord Embeds
     """
 
-    def __init__(self, decision, channel, ctx = None):
+    def __init__(self, decision, channel, ctx = None, priority = PROMPT):
         """
             Set up a DecisionDisplay using the context of the calling action
             params:
                 decision: The Decision to display
                 ctx: The Discord Context that this display was called from
                 channel: The channel intended to send the embed
+                priority: The dispatcher priority class of the message
         """
         self.ctx = ctx
         self.channel = channel
         self.decision = decision
+        self.priority = priority
+        # Unchanged Decisions reuse the embed rendered when they were last shown
+        self.embed = render_cache.get(decision, ctx)
 
-        rich_body = '**' + decision.title + '**\n' + decision.body + '\n\n'
-        rich_body+= '**Actions:**\n'
-        for action in decision.actions:
-            rich_body+=action.glyph + ' = ' + action.description + '\n'
-        if decision.resolve_time:
-            resolve_time_pretty = datetime.datetime.strftime(decision.resolve_time, "%d %b at %-I:%M %p")
-            rich_body+= f'\nVoting closes at {resolve_time_pretty} \n'
-
-        # create embed
-        self.embed = CharacterEmbed(ctx)
-        self.embed.description = rich_body
-
-    async def send_message(self):
+    async def send_message(self, on_sent = None):
         """
             Send a message to the Channel found in self.channel
+            params:
+                on_sent: Called with the sent message before its reactions are added
         """
-        # Send embed
-        decision_message = await self.channel.send(
-            # content=rich_body,
-            embed=self.embed)
-
-        # Add reactions to embed
         for action in self.decision.actions:
             print(action.glyph + ' ' + action.description)
-            await decision_message.add_reaction(action.glyph)
-        
-        return decision_message
+        # Send embed, the dispatcher adds the reactions
+        return await dispatcher.send(self.channel,
+                                     self.embed,
+                                     self.priority,
+                                     reactions=[action.glyph for action in self.decision.actions],
+                                     on_sent=on_sent)
 
 class GenericDisplayEmbed():
     """
@@ -57,18 +128,18 @@ class GenericDisplayEmbed():
             title: The title on the Discord Embed
             description: The description on the Discord Embed
             channel: The channel intended to send the embed
+            priority: The dispatcher priority class of the message
     """
 
-    def __init__(self, title, description, channel):
+    def __init__(self, title, description, channel, priority = PROMPT):
         self.channel = channel
         self.description = description
         self.title = title
+        self.priority = priority
         self.embed = DefaultEmbed(title=title, description=description)
 
     async def send_message(self):
         """
             Send a message to the Channel found in self.channel
         """
-        await self.channel.send(
-            # content=rich_body,
-            embed=self.embed)
\ No newline at end of file
+        await dispatcher.send(self.channel, self.embed, self.priority)
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+    Coordinate start-up work with the warm-up that loads every guild's state.
+"""
+import asyncio
+
+async def wait_for_warm_up(bot):
+    """
+    Wait for bot.warm_up, the task loading and indexing the guilds' state while the bot
+    connects, so its caller does not open that state a second time on the event loop.
+    A failed warm-up is reported and waited past, the state then opens on first use.
+    params:
+        bot: The bot, whose warm_up is None once it is done or when there is none.
+    """
+    warm_up = getattr(bot, 'warm_up', None)
+    if warm_up is None:
+        return
+    try:
+        await asyncio.shield(warm_up)
+    except Exception as error:
+        print(f'Loading the guilds\' state failed: {error!r}')
@@ -0,0 +1,146 @@
+"""
+    Coalesce persistence writes that arrive back-to-back into a single flush.
+"""
+import asyncio
+from collections import OrderedDict
+
+class WriteBehindPersistence:
+    """
+    Sits in front of a persistence backend, marking state dirty on every write and flushing
+    it after a short debounce window, or on shutdown via flush().
+    Reads are answered from the backend's resident state (or a pending write_state), so
+    callers see their own writes before they reach disk.
+    params:
+        backend: The persistence backend that writes are flushed to.
+        flush_delay: Seconds to wait after the first dirtying write before flushing.
+    """
+    def __init__(self, backend, flush_delay=0.25):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        # A whole replacement state from write_state, superseding any single-decision writes
+        self._pending_state = None
+        # Decision id -> (op, decision) of single-decision writes, last write wins
+        self._pending_decisions = OrderedDict()
+        self._pending_writes = 0
+        self._flush_handle = None
+        self.flushes = 0
+        self.logical_writes = 0
+
+    # Decisions
+    def get_state(self):
+        if self._pending_state is not None:
+            return self._pending_state
+        self._flush_pending_adds()
+        return self.backend.get_state()
+
+    def get_decision(self, id_):
+        if self._pending_state is not None:
+            return next((d for d in self._pending_state['decisions'] if d.id_ == id_), None)
+        self._flush_pending_adds()
+        # A pending update is newer than what the backend holds
+        pending = self._pending_decisions.get(id_)
+        if pending is not None:
+            return pending[1]
+        return self.backend.get_decision(id_)
+
+    def get_decisions(self, state):
+        if self._pending_state is not None:
+            return [d for d in self._pending_state['decisions'] if d.state == state]
+        self._flush_pending_adds()
+        # Pending updates may have moved decisions between states since the backend indexed them
+        decisions = [d for d in self.backend.get_decisions(state) if d.id_ not in self._pending_decisions]
+        decisions += [d for _, d in self._pending_decisions.values() if d.state == state]
+        return decisions
+
+    def page_decisions(self, state, title_prefix='', offset=0, limit=10):
+        # Pages are read from the backend's index, so it has to hold every write first
+        self.flush()
+        return self.backend.page_decisions(state, title_prefix, offset, limit)
+
+    def write_state(self, decisions):
+        self._pending_state = decisions
+        self._pending_decisions.clear()
+        self._mark_dirty()
+
+    def add_decision(self, decision):
+        if self._pending_state is not None:
+            self._pending_state['decisions'].append(decision)
+        else:
+            self._pending_decisions[decision.id_] = ('add', decision)
+        self._mark_dirty()
+
+    def update_decision(self, decision):
+        if self._pending_state is not None:
+            decisions = self._pending_state['decisions']
+            for i, obj in enumerate(decisions):
+                if obj.id_ == decision.id_:
+                    decisions[i] = decision
+                    break
+        else:
+            op, _ = self._pending_decisions.get(decision.id_, ('update', None))
+            self._pending_decisions[decision.id_] = (op, decision)
+        self._mark_dirty()
+
+    def update_decisions(self, decisions):
+        for decision in decisions:
+            self.update_decision(decision)
+
+    def flush(self):
+        """
+        Write everything pending to the backend now.
+        returns: The number of logical writes coalesced into this flush.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_writes:
+            return 0
+
+        if self._pending_state is not None:
+            self.backend.write_state(self._pending_state)
+            physical_writes = 1
+        else:
+            updates = []
+            for op, decision in self._pending_decisions.values():
+                if op == 'add':
+                    self.backend.add_decision(decision)
+                else:
+                    updates.append(decision)
+            if updates:
+                # Every pending update goes to the backend as one batch
+                self.backend.update_decisions(updates)
+            physical_writes = len(self._pending_decisions) - len(updates) + (1 if updates else 0)
+
+        coalesced = self._pending_writes
+        self._pending_state = None
+        self._pending_decisions.clear()
+        self._pending_writes = 0
+        self.flushes += 1
+        self.logical_writes += coalesced
+        print(f'Flushed {coalesced} write(s) as {physical_writes} ' +
+              f'({self.logical_writes} writes in {self.flushes} flushes so far).')
+        return coalesced
+
+    def _flush_pending_adds(self):
+        if any(op == 'add' for op, _ in self._pending_decisions.values()):
+            # New decisions only exist here until they are flushed to the backend
+            self.flush()
+
+    def _mark_dirty(self):
+        self._pending_writes += 1
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside the event loop there is nothing to debounce against, write through
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_delay, self.flush)
+
+    # Admin
+    def get_admin_state(self):
+        return self.backend.get_admin_state()
+
+    def write_admin_state(self, admin):
+        self.backend.write_admin_state(admin)